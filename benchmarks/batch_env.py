@@ -0,0 +1,32 @@
+"""Steps per second of the batched environment with random actions.
+
+    uv run --extra train python -m benchmarks.batch_env
+"""
+
+import time
+
+import numpy as np
+
+from src.domain.batch_env import BatchMinesweeperEnv
+
+CONFIGS = [("beginner", 9, 10), ("intermediate", 16, 40), ("expert", 22, 99)]
+
+
+def main(num_envs: int = 4096, steps: int = 200):
+    rng = np.random.default_rng(0)
+    print(f"{'board':<14}{'envs':>6}{'steps/s':>14}{'games/s':>10}")
+    for name, size, mines in CONFIGS:
+        env = BatchMinesweeperEnv(num_envs, size, mines, seed=0)
+        env.reset()
+        finished = 0
+        start = time.perf_counter()
+        for _ in range(steps):
+            # Reveals only, so that games finish at a realistic rate
+            result = env.step(rng.integers(0, size * size, num_envs))
+            finished += int(result.dones.sum())
+        elapsed = time.perf_counter() - start
+        print(f"{name:<14}{num_envs:>6}{num_envs * steps / elapsed:>14,.0f}{finished / elapsed:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Bytes on the wire versus compression time for full-board responses.
+
+    uv run python -m benchmarks.compression
+
+Boards are half revealed, like a game in progress. zstd and brotli rows only
+appear when ``zstandard`` / ``brotli`` are installed.
+"""
+
+import random
+import time
+
+from src.domain.minesweeper import MinesweeperGame
+from src.web.compression import CompressionSettings, available_codings
+from src.web.server import BoardResponse, _JSON_ENCODER, get_board_data
+
+SIZES = [9, 16, 30, 50, 100]
+LEVELS = {"gzip": [1, 5, 9], "br": [1, 4, 11], "zstd": [1, 3, 19]}
+
+
+def board_body(size: int) -> bytes:
+    random.seed(size)
+    game = MinesweeperGame(size, 0.15, username=None)
+    game.reveal_cell(size // 2, size // 2)
+    cells = [(row, col) for row in range(size) for col in range(size)]
+    for row, col in random.sample(cells, len(cells) // 2):
+        if not game.board[row][col].is_mine:
+            game.reveal_cell(row, col)
+    return _JSON_ENCODER.encode(
+        BoardResponse(
+            board=get_board_data(game), stats=game.get_game_stats(), game_state=game.game_state.value
+        )
+    )
+
+
+def settings_for(coding: str, level: int) -> CompressionSettings:
+    field = {"gzip": "gzip_level", "br": "brotli_quality", "zstd": "zstd_level"}[coding]
+    return CompressionSettings(**{field: level})
+
+
+def main(min_time: float = 0.2):
+    print(f"{'size':>5}{'json':>10}  {'coding':<8}{'level':>6}{'bytes':>10}{'ratio':>8}{'µs':>10}")
+    for size in SIZES:
+        body = board_body(size)
+        for coding in available_codings():
+            for level in LEVELS[coding]:
+                settings = settings_for(coding, level)
+                runs, start = 0, time.perf_counter()
+                while time.perf_counter() - start < min_time:
+                    encoded = settings.compress(coding, body)
+                    runs += 1
+                micros = (time.perf_counter() - start) / runs * 1e6
+                print(
+                    f"{size:>5}{len(body):>10}  {coding:<8}{level:>6}{len(encoded):>10}"
+                    f"{len(body) / len(encoded):>8.1f}{micros:>10.0f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
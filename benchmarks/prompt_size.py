@@ -0,0 +1,36 @@
+"""Compare the AI assistant's board encodings by size and build time.
+
+    uv run python -m benchmarks.prompt_size
+"""
+
+import random
+import time
+
+from src.domain.minesweeper import MinesweeperGame
+from src.domain.prompt_encoder import (
+    PROMPT_ENCODINGS,
+    board_sections,
+    estimate_tokens,
+    fit_sections,
+)
+
+BOARDS = [("beginner", 9, 10), ("intermediate", 16, 40), ("expert", 22, 99), ("custom", 60, 700)]
+
+
+def main(repeat: int = 20):
+    random.seed(0)
+    print(f"{'board':<14}{'encoding':<10}{'tokens':>8}{'build ms':>10}")
+    for name, size, mines in BOARDS:
+        game = MinesweeperGame(size, mines / (size * size), username=None)
+        game.mine_count = mines
+        game.reveal_cell(size // 2, size // 2)
+        for encoding in PROMPT_ENCODINGS:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                text = fit_sections(board_sections(game, encoding), None)
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+            print(f"{name:<14}{encoding:<10}{estimate_tokens(text):>8}{elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 import argparse
+import os
 import sys
-from .domain.minesweeper import MinesweeperGame
 
 
 def main():
@@ -9,13 +9,78 @@ def main():
     parser.add_argument('--host', default='127.0.0.1', help='Host for web server (default: 127.0.0.1)')
     parser.add_argument('--port', type=int, default=5000, help='Port for web server (default: 5000)')
     parser.add_argument('--debug', action='store_true', help='Enable debug mode for web server')
+    parser.add_argument('--migrate-saves', action='store_true',
+                        help='Re-encode all saved games in the compact save format and exit')
+    parser.add_argument('--workers', type=int, default=1, help='Number of web server worker processes (default: 1)')
+    parser.add_argument('--game-store', default=None,
+                        help='Where live games are kept: "memory" (default) or "sqlite[:///path.db]", required for --workers > 1')
+    parser.add_argument('--profile-slow-ms', type=float, default=None,
+                        help='Keep profiles of requests slower than this many milliseconds, see /api/debug/traces')
+    parser.add_argument('--idle-timeout', type=float, default=None,
+                        help='Drop games idle for this many seconds and record them as quit (default: 3600, 0 keeps them)')
+    parser.add_argument('--autosave-interval', type=float, default=None,
+                        help='Checkpoint games in memory every this many seconds and resume them after a restart (default: 10, 0 disables)')
+    parser.add_argument('--export', metavar='TABLE', choices=['sessions', 'saved_games', 'journals'],
+                        help='Stream a table (sessions, saved_games or journals) for analysis and exit')
+    parser.add_argument('--export-format', default='ndjson', choices=['ndjson', 'csv', 'parquet'],
+                        help='Export format (default: ndjson, parquet needs pyarrow)')
+    parser.add_argument('--since', default='',
+                        help='Only export rows finished or rewritten after this watermark, printed by the previous export')
+    parser.add_argument('--output', default='-', help='File to export to (default: stdout)')
     
     args = parser.parse_args()
     
-    if args.web:
+    if args.migrate_saves:
+        from .data.models import GameDatabase
+        from .domain.save_format import migrate_saved_games
+
+        db = GameDatabase()
+        print(f"Migrated {migrate_saved_games(db)} saved games")
+        db.close()
+    elif args.export:
+        from .data.export import export_bounds, export_table, get_export_table, parse_watermark
+        from .data.models import get_engine
+
+        try:
+            since = parse_watermark(args.since)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        engine = get_engine()
+        until = export_bounds(engine, get_export_table(args.export), since)
+        watermark = since if until is None else until
+        output = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+        try:
+            for chunk in export_table(engine, args.export, args.export_format, since, watermark):
+                output.write(chunk)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+        if watermark is None:
+            print("Nothing to export yet", file=sys.stderr)
+        else:
+            mark = watermark.isoformat()
+            print(f"Exported up to {mark}, pass --since {mark} to continue from here", file=sys.stderr)
+    elif args.web:
+        if args.profile_slow_ms is not None:
+            # Set before the server is imported; workers inherit it
+            os.environ["MINESWEEPER_PROFILE_SLOW_MS"] = str(args.profile_slow_ms)
+        if args.idle_timeout is not None:
+            os.environ["MINESWEEPER_IDLE_TIMEOUT"] = str(args.idle_timeout)
+        if args.autosave_interval is not None:
+            os.environ["MINESWEEPER_AUTOSAVE_INTERVAL"] = str(args.autosave_interval)
         try:
             from .web.server import start_web_server
-            start_web_server(host=args.host, port=args.port, debug=args.debug)
+            start_web_server(
+                host=args.host,
+                port=args.port,
+                debug=args.debug,
+                workers=args.workers,
+                game_store=args.game_store,
+            )
         except ImportError as e:
             print(f"Error: Could not import web server dependencies: {e}")
             print("Make sure Flask is installed: pip install flask")
@@ -33,9 +98,13 @@ def main():
         print("Usage:")
         print("  python -m src --web          # Launch web interface")
         print("  python -m src --web --port 8080  # Launch on custom port")
+        print("  python -m src --web --workers 4 --game-store sqlite  # Launch on several cores")
         print()
         print("Example game creation:")
-        game = MinesweeperGame(size=8, difficulty=0.15)
+        from .domain.minesweeper import MinesweeperGame
+
+        # No user, so the example doesn't touch the database
+        game = MinesweeperGame(size=8, difficulty=0.15, username=None)
         print(f"Created {game.size}x{game.size} board with {game.mine_count} mines")
         print(f"Game state: {game.game_state.value}")
         print()
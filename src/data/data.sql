@@ -34,7 +34,7 @@ CREATE TABLE IF NOT EXISTS saved_games (
     mine_count INTEGER NOT NULL,
     difficulty TEXT NOT NULL CHECK (difficulty IN ('beginner', 'intermediate', 'expert', 'custom')),
     game_state TEXT NOT NULL CHECK (game_state IN ('playing', 'won', 'lost')),
-    board_data TEXT NOT NULL,  -- JSON serialized board state
+    board_data TEXT NOT NULL,  -- encoded board state (legacy JSON or compact v2)
     revealed_count INTEGER DEFAULT 0,
     flag_count INTEGER DEFAULT 0,
     first_click BOOLEAN DEFAULT 1,
@@ -43,6 +43,38 @@ CREATE TABLE IF NOT EXISTS saved_games (
     UNIQUE(user_id, game_name)
 );
 
+-- Table to store the move journal of each game session
+CREATE TABLE IF NOT EXISTS game_journals (
+    session_id INTEGER PRIMARY KEY,
+    moves BLOB NOT NULL,  -- encoded move journal (see domain/journal.py)
+    move_count INTEGER DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (session_id) REFERENCES game_sessions (id)
+);
+
+-- Table to store results of shared-board challenges (first finished attempt per player)
+CREATE TABLE IF NOT EXISTS challenge_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    challenge_id TEXT NOT NULL,  -- e.g. daily-2025-01-31
+    user_id INTEGER NOT NULL,
+    session_id INTEGER,
+    result TEXT NOT NULL CHECK (result IN ('won', 'lost')),
+    duration_seconds REAL,
+    cells_revealed INTEGER DEFAULT 0,
+    finished_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id),
+    FOREIGN KEY (session_id) REFERENCES game_sessions (id),
+    UNIQUE(challenge_id, user_id)
+);
+
+-- Table to store in-progress games shared between server workers
+CREATE TABLE IF NOT EXISTS live_games (
+    game_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,  -- optimistic locking counter
+    state BLOB NOT NULL,  -- pickled game state
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Indexes for faster queries on common filters
 CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
 CREATE INDEX IF NOT EXISTS idx_game_sessions_user_id ON game_sessions(user_id);
@@ -52,6 +84,8 @@ CREATE INDEX IF NOT EXISTS idx_game_sessions_completed ON game_sessions(is_compl
 CREATE INDEX IF NOT EXISTS idx_game_sessions_start_time ON game_sessions(start_time);
 CREATE INDEX IF NOT EXISTS idx_saved_games_user_id ON saved_games(user_id);
 CREATE INDEX IF NOT EXISTS idx_saved_games_user_game ON saved_games(user_id, game_name);
+CREATE INDEX IF NOT EXISTS idx_saved_games_user_saved_at ON saved_games(user_id, saved_at);
+CREATE INDEX IF NOT EXISTS idx_challenge_results_ranking ON challenge_results(challenge_id, result, duration_seconds);
 
 -- Sample data for testing (optional)
 -- INSERT INTO game_sessions (board_size, mine_count, difficulty, result, duration_seconds, cells_revealed, flags_used, is_completed)
@@ -0,0 +1,231 @@
+"""Streaming export of the game tables for analysis.
+
+Rows are read with a server-side cursor in batches of ``batch_size``
+(``yield_per``) and written out batch by batch, so an export holds one batch
+in memory however large the table is.
+
+Exports are incremental. Every table has a watermark column, the time its
+rows were last written: sessions are exported once they finish (``end_time``),
+saves and journals whenever they are written again (``saved_at``,
+``updated_at``). Rows are ordered by it and only those written after
+``since`` are exported. ``export_bounds`` fixes the last watermark before the
+export starts; pass it as ``since`` next time to get only the rows finished or
+rewritten in between. A rewritten save or journal is exported again, keep the
+last row per key.
+
+Formats are ``ndjson``, ``csv`` and ``parquet`` (needs ``pyarrow``).
+"""
+
+import base64
+import csv
+import io
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from .models import GameJournal, GameSession, SavedGame
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+DEFAULT_BATCH_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class ExportTable:
+    model: type
+    watermark: str  # when a row was last written, NULL until it is ready to export
+    key: str  # orders rows written at the same time
+    columns: Tuple[str, ...]
+
+    def column(self, name: str):
+        return getattr(self.model, name)
+
+
+EXPORT_TABLES: Dict[str, ExportTable] = {
+    "sessions": ExportTable(
+        GameSession,
+        "end_time",
+        "id",
+        (
+            "id", "user_id", "board_size", "mine_count", "difficulty", "start_time", "end_time",
+            "duration_seconds", "result", "cells_revealed", "flags_used", "is_completed",
+        ),
+    ),
+    "saved_games": ExportTable(
+        SavedGame,
+        "saved_at",
+        "id",
+        (
+            "id", "user_id", "game_name", "board_size", "mine_count", "difficulty", "game_state",
+            "board_data", "revealed_count", "flag_count", "first_click", "saved_at",
+        ),
+    ),
+    # Moves are the encoded journal (domain/journal.py), base64 in text formats
+    "journals": ExportTable(
+        GameJournal, "updated_at", "session_id", ("session_id", "move_count", "updated_at", "moves")
+    ),
+}
+
+
+def get_export_table(name: str) -> ExportTable:
+    table = EXPORT_TABLES.get(name)
+    if table is None:
+        raise ValueError(f"Unknown table {name!r}, expected one of {', '.join(EXPORT_TABLES)}")
+    return table
+
+
+def export_bounds(engine, table: ExportTable, since: Optional[datetime] = None) -> Optional[datetime]:
+    """Last watermark an export started now would include, None if no row is newer than ``since``."""
+    with engine.connect() as conn:
+        last = conn.execute(select(func.max(table.column(table.watermark)))).scalar()
+    return last if last is not None and (since is None or last > since) else None
+
+
+def iter_batches(
+    engine, table: ExportTable, since: Optional[datetime] = None, until: Optional[datetime] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[List[tuple]]:
+    """Rows with ``since < watermark <= until`` in watermark order, ``batch_size`` at a time."""
+    watermark = table.column(table.watermark)
+    query = (
+        select(*(table.column(name) for name in table.columns))
+        .where(watermark.is_not(None))
+        .order_by(watermark, table.column(table.key))
+    )
+    if since is not None:
+        query = query.where(watermark > since)
+    if until is not None:
+        query = query.where(watermark <= until)
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(query)
+        for partition in result.partitions():
+            yield [tuple(row) for row in partition]
+
+
+def _text_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    return value
+
+
+def write_ndjson(table: ExportTable, batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(table.columns, map(_text_value, row)))) + "\n" for row in batch
+        ).encode()
+
+
+def write_csv(table: ExportTable, batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(table.columns)
+    for batch in batches:
+        writer.writerows(tuple(map(_text_value, row)) for row in batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _Drain(io.RawIOBase):
+    """Write-only file whose contents are taken out as they are written."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.data += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def take(self) -> bytes:
+        data = bytes(self.data)
+        self.data.clear()
+        return data
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise ValueError("Parquet export needs pyarrow: pip install minesweeper[export]") from None
+
+
+def _arrow_schema(table: ExportTable):
+    import pyarrow as pa
+    from sqlalchemy import Boolean, DateTime, Float, Integer, LargeBinary
+
+    def arrow_type(column_type):
+        if isinstance(column_type, Boolean):
+            return pa.bool_()
+        if isinstance(column_type, Integer):
+            return pa.int64()
+        if isinstance(column_type, Float):
+            return pa.float64()
+        if isinstance(column_type, DateTime):
+            return pa.timestamp("us")
+        if isinstance(column_type, LargeBinary):
+            return pa.binary()
+        return pa.string()
+
+    return pa.schema([(name, arrow_type(table.column(name).type)) for name in table.columns])
+
+
+def write_parquet(table: ExportTable, batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    """One row group per batch."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(table)
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema)
+    for batch in batches:
+        writer.write_batch(pa.RecordBatch.from_pydict(
+            {name: [row[i] for row in batch] for i, name in enumerate(table.columns)}, schema=schema
+        ))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+WRITERS = {"ndjson": write_ndjson, "csv": write_csv, "parquet": write_parquet}
+
+
+def parse_watermark(value: str) -> Optional[datetime]:
+    """The ``since`` of an export, an ISO timestamp or empty for everything."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid watermark {value!r}, expected an ISO timestamp") from None
+
+
+def export_table(
+    engine, name: str, format: str = "ndjson", since: Optional[datetime] = None,
+    until: Optional[datetime] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[bytes]:
+    """Chunks of the export of table ``name``, one per batch of rows."""
+    if format not in WRITERS:
+        raise ValueError(f"Unknown format {format!r}, expected one of {', '.join(WRITERS)}")
+    table = get_export_table(name)
+    if format == "parquet":
+        # Fail before the first chunk is sent
+        _require_pyarrow()
+    return WRITERS[format](table, iter_batches(engine, table, since, until, batch_size))
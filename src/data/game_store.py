@@ -0,0 +1,169 @@
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Generic, Iterator, List, MutableMapping, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class UnknownGameError(KeyError):
+    """Raised when a game id is not present in the store."""
+
+
+class StaleGameError(Exception):
+    """Raised when a game was modified by someone else since it was checked out."""
+
+
+class GameStore(Generic[T]):
+    """Keeps live games addressable by game id.
+
+    Mutations go through ``checkout`` so that backends shared between
+    processes can load a game, let the caller mutate it and write it back.
+    Both ``checkout`` and ``view`` hold a per-game lock, so requests for the
+    same game are serialized while different games proceed in parallel.
+    """
+
+    def __init__(self):
+        # A lock lives as long as someone holds or waits for it, lookups of
+        # unknown or deleted games leave nothing behind
+        self._locks: "weakref.WeakValueDictionary[str, threading.RLock]" = weakref.WeakValueDictionary()
+        self._locks_guard = threading.Lock()
+
+    def lock_for(self, game_id: str) -> threading.RLock:
+        with self._locks_guard:
+            lock = self._locks.get(game_id)
+            if lock is None:
+                lock = self._locks[game_id] = threading.RLock()
+            return lock
+
+    @contextmanager
+    def view(self, game_id: str) -> Iterator[T]:
+        """Read a game without writing it back, excluding concurrent mutations."""
+        with self.lock_for(game_id):
+            game = self.get(game_id)
+            if game is None:
+                raise UnknownGameError(game_id)
+            yield game
+
+    def get(self, game_id: str) -> Optional[T]:
+        raise NotImplementedError
+
+    def put(self, game_id: str, game: T):
+        raise NotImplementedError
+
+    def delete(self, game_id: str) -> bool:
+        raise NotImplementedError
+
+    def game_ids(self) -> List[str]:
+        raise NotImplementedError
+
+    def idle_game_ids(self, idle_seconds: float) -> List[str]:
+        """Games not stored or checked out for at least ``idle_seconds``."""
+        raise NotImplementedError
+
+    @contextmanager
+    def checkout(self, game_id: str) -> Iterator[T]:
+        raise NotImplementedError
+        yield
+
+    def __contains__(self, game_id: str) -> bool:
+        return self.get(game_id) is not None
+
+    def __getitem__(self, game_id: str) -> T:
+        game = self.get(game_id)
+        if game is None:
+            raise UnknownGameError(game_id)
+        return game
+
+    def __setitem__(self, game_id: str, game: T):
+        self.put(game_id, game)
+
+    def __delitem__(self, game_id: str):
+        if not self.delete(game_id):
+            raise UnknownGameError(game_id)
+
+    def __len__(self) -> int:
+        return len(self.game_ids())
+
+
+class InMemoryGameStore(GameStore[T]):
+    """Process-local store, only usable with a single server worker."""
+
+    def __init__(self):
+        super().__init__()
+        self._games: Dict[str, T] = {}
+        # game_id -> monotonic time of the last put or checkout
+        self._touched: Dict[str, float] = {}
+
+    def get(self, game_id: str) -> Optional[T]:
+        return self._games.get(game_id)
+
+    def put(self, game_id: str, game: T):
+        self._games[game_id] = game
+        self._touched[game_id] = time.monotonic()
+
+    def delete(self, game_id: str) -> bool:
+        self._touched.pop(game_id, None)
+        return self._games.pop(game_id, None) is not None
+
+    def game_ids(self) -> List[str]:
+        return list(self._games)
+
+    def idle_game_ids(self, idle_seconds: float) -> List[str]:
+        cutoff = time.monotonic() - idle_seconds
+        return [game_id for game_id, touched in list(self._touched.items()) if touched <= cutoff]
+
+    @contextmanager
+    def checkout(self, game_id: str) -> Iterator[T]:
+        with self.lock_for(game_id):
+            game = self._games.get(game_id)
+            if game is None:
+                raise UnknownGameError(game_id)
+            try:
+                yield game
+            finally:
+                self._touched[game_id] = time.monotonic()
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self._games
+
+    def __len__(self) -> int:
+        return len(self._games)
+
+
+def _sqlite_path(url: str) -> Optional[str]:
+    """The database of a ``sqlite`` store url, None for the default one."""
+    if url.startswith("sqlite:///") or url == "sqlite":
+        return url[len("sqlite:///"):] or None
+    raise ValueError(f"Unsupported game store: {url}")
+
+
+def create_game_store(url: str | None = None) -> GameStore:
+    """Build a game store from a url such as ``memory`` or ``sqlite:///path.db``."""
+    if not url or url == "memory":
+        return InMemoryGameStore()
+    path = _sqlite_path(url)
+    # Imported here so that SQLAlchemy only loads when a shared store is used
+    from .sqlite_game_store import SQLiteGameStore
+
+    return SQLiteGameStore(path) if path else SQLiteGameStore()
+
+
+def create_api_key_store(url: str | None = None) -> MutableMapping[str, str]:
+    """Where AI sessions' API keys are kept, shared between workers like the games at ``url``."""
+    if not url or url == "memory":
+        return {}
+    path = _sqlite_path(url)
+    from .sqlite_game_store import SQLiteAPIKeys
+
+    return SQLiteAPIKeys(path) if path else SQLiteAPIKeys()
+
+
+def __getattr__(name: str):
+    # SQLiteGameStore moved to its own module, keep importing it from here working
+    if name == "SQLiteGameStore":
+        from .sqlite_game_store import SQLiteGameStore
+
+        return SQLiteGameStore
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,10 +1,14 @@
+import threading
+import time
 from datetime import datetime
-from typing import Optional, List
-from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean, Text, ForeignKey, create_engine
+from typing import AbstractSet, Dict, Iterable, Optional, List, Tuple
+from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean, Text, LargeBinary, ForeignKey, Index, UniqueConstraint, and_, case, create_engine, delete, func, or_, select, update
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, relationship, load_only
 import json
 
+from ..profiling import timed
+
 Base = declarative_base()
 
 class User(Base):
@@ -40,6 +44,10 @@ class GameSession(Base):
     # Relationship with user
     user = relationship("User", back_populates="game_sessions")
     
+    __table_args__ = (
+        Index('idx_game_sessions_user_stats', 'user_id', 'is_completed', 'difficulty'),
+    )
+    
     def __repr__(self):
         return f"<GameSession(id={self.id}, user_id={self.user_id}, difficulty='{self.difficulty}', result='{self.result}')>"
 
@@ -53,7 +61,7 @@ class SavedGame(Base):
     mine_count = Column(Integer, nullable=False)
     difficulty = Column(String(20), nullable=False)
     game_state = Column(String(20), nullable=False)  # playing, won, lost
-    board_data = Column(Text, nullable=False)  # JSON serialized board state
+    board_data = Column(Text, nullable=False)  # encoded board state, see domain/save_format.py
     revealed_count = Column(Integer, default=0)
     flag_count = Column(Integer, default=0)
     first_click = Column(Boolean, default=True)
@@ -62,13 +70,155 @@ class SavedGame(Base):
     # Relationship with user
     user = relationship("User", back_populates="saved_games")
     
+    __table_args__ = (
+        Index('idx_saved_games_user_saved_at', 'user_id', 'saved_at'),
+    )
+    
     def __repr__(self):
         return f"<SavedGame(id={self.id}, user_id={self.user_id}, name='{self.game_name}')>"
 
+class GameJournal(Base):
+    __tablename__ = 'game_journals'
+    
+    session_id = Column(Integer, ForeignKey('game_sessions.id'), primary_key=True)
+    moves = Column(LargeBinary, nullable=False)  # encoded move journal, see domain/journal.py
+    move_count = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<GameJournal(session_id={self.session_id}, move_count={self.move_count})>"
+
+class ChallengeResult(Base):
+    __tablename__ = 'challenge_results'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    challenge_id = Column(String(32), nullable=False)  # e.g. daily-2025-01-31
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    session_id = Column(Integer, ForeignKey('game_sessions.id'), nullable=True)
+    result = Column(String(10), nullable=False)  # won, lost
+    duration_seconds = Column(Float, nullable=True)
+    cells_revealed = Column(Integer, default=0)
+    finished_at = Column(DateTime, default=datetime.utcnow)
+    
+    user = relationship("User")
+    
+    __table_args__ = (
+        UniqueConstraint('challenge_id', 'user_id'),
+        Index('idx_challenge_results_ranking', 'challenge_id', 'result', 'duration_seconds'),
+    )
+    
+    def __repr__(self):
+        return f"<ChallengeResult(challenge_id='{self.challenge_id}', user_id={self.user_id}, result='{self.result}')>"
+
+class LiveGame(Base):
+    __tablename__ = 'live_games'
+    
+    game_id = Column(String(36), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)  # bumped on every write, used for optimistic locking
+    state = Column(LargeBinary, nullable=False)  # pickled in-progress game
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<LiveGame(game_id='{self.game_id}', version={self.version})>"
+
+class SessionAPIKey(Base):
+    __tablename__ = 'api_keys'
+    
+    session_id = Column(String(36), primary_key=True)
+    api_key = Column(String(200), nullable=False)  # plain text, every worker must be able to use it
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<SessionAPIKey(session_id='{self.session_id}')>"
+
+class GameCheckpoint(Base):
+    __tablename__ = 'game_checkpoints'
+    
+    game_id = Column(String(36), primary_key=True)
+    version = Column(Integer, nullable=False)  # game version the state was taken at
+    username = Column(String(50), nullable=True)
+    state = Column(LargeBinary, nullable=False)  # pickled in-progress game, see web/autosave.py
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<GameCheckpoint(game_id='{self.game_id}', version={self.version})>"
+
+DEFAULT_DB_PATH = "src/data/minesweeper.db"
+
+# Engines are shared per database file so that games restored from a shared
+# game store do not each build their own connection pool and re-run DDL.
+_ENGINES = {}
+_ENGINES_LOCK = threading.Lock()
+
+def get_engine(db_path: str = DEFAULT_DB_PATH):
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(db_path)
+        if engine is None:
+            engine = create_engine(f"sqlite:///{db_path}")
+            Base.metadata.create_all(engine)
+            # create_all skips existing tables, add indexes declared since
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(engine, checkfirst=True)
+            _ENGINES[db_path] = engine
+        return engine
+
+
+class StatsCache:
+    """Aggregated statistics per (database, user), None for everyone.
+
+    Entries live for ``ttl`` seconds, or until a game of the user finishes in
+    this process; other processes see the change once the entry expires.
+    """
+
+    def __init__(self, ttl: float = 5.0):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, Optional[int]], Tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db_path: str, user_id: Optional[int]) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get((db_path, user_id))
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return None
+        return entry[1]
+
+    def put(self, db_path: str, user_id: Optional[int], stats: dict):
+        with self._lock:
+            self._entries[(db_path, user_id)] = (time.monotonic(), stats)
+
+    def invalidate(self, db_path: str, user_id: Optional[int] = None):
+        """Drop the user's and the global entry, or every entry without ``user_id``."""
+        with self._lock:
+            if user_id is None:
+                for key in [key for key in self._entries if key[0] == db_path]:
+                    del self._entries[key]
+            else:
+                self._entries.pop((db_path, user_id), None)
+                self._entries.pop((db_path, None), None)
+
+
+STATS_CACHE = StatsCache()
+
+
+def _summarize(games: int, wins: int, losses: int, quits: int, duration_total: Optional[float],
+               timed_games: int, best_duration: Optional[float], cells_total: Optional[int]) -> dict:
+    return {
+        'total_games': games,
+        'won_games': wins,
+        'lost_games': losses,
+        'quit_games': quits,
+        # Of the games played to the end, quits would drag it down with games nobody lost
+        'win_rate': round(wins / (wins + losses) * 100, 2) if wins + losses else 0,
+        'avg_duration_seconds': round(duration_total / timed_games, 2) if timed_games else None,
+        'best_duration_seconds': round(best_duration, 2) if best_duration is not None else None,
+        'avg_cells_revealed': round(cells_total / games, 2) if games else 0,
+    }
+
 class GameDatabase:
-    def __init__(self, db_path: str = "src/data/minesweeper.db"):
-        self.engine = create_engine(f"sqlite:///{db_path}")
-        Base.metadata.create_all(self.engine)
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self.engine = get_engine(db_path)
         Session = sessionmaker(bind=self.engine)
         self.session = Session()
     
@@ -89,6 +239,7 @@ class GameDatabase:
         return user
     
     # Game session management
+    @timed("db.create_game_session")
     def create_game_session(self, user_id: int, board_size: int, mine_count: int, difficulty: str) -> GameSession:
         session = GameSession(
             user_id=user_id,
@@ -100,6 +251,7 @@ class GameDatabase:
         self.session.commit()
         return session
     
+    @timed("db.update_game_session")
     def update_game_session(self, session_id: int, **kwargs) -> Optional[GameSession]:
         session = self.session.query(GameSession).filter_by(id=session_id).first()
         if session:
@@ -109,6 +261,7 @@ class GameDatabase:
             self.session.commit()
         return session
     
+    @timed("db.finish_game_session")
     def finish_game_session(self, session_id: int, result: str, cells_revealed: int, flags_used: int):
         end_time = datetime.utcnow()
         session = self.session.query(GameSession).filter_by(id=session_id).first()
@@ -123,11 +276,62 @@ class GameDatabase:
                 flags_used=flags_used,
                 is_completed=True
             )
+            STATS_CACHE.invalidate(self.db_path, session.user_id)
+    
+    @timed("db.quit_game_sessions")
+    def quit_game_sessions(self, session_ids: Iterable[int] = (), started_before: Optional[datetime] = None,
+                           keep: AbstractSet[int] = frozenset()) -> Tuple[int, int]:
+        """Mark unfinished sessions as quit, in one transaction.
+
+        Applies to the sessions in ``session_ids`` and, with ``started_before``,
+        every session started earlier except those in ``keep``. Sessions nobody
+        made a move in were never played and are deleted instead, so they don't
+        count as quit games. Returns how many were (quit, deleted).
+        """
+        conditions = []
+        session_ids = list(session_ids)
+        if session_ids:
+            conditions.append(GameSession.id.in_(session_ids))
+        if started_before is not None:
+            conditions.append(and_(GameSession.start_time < started_before, GameSession.id.not_in(list(keep))))
+        if not conditions:
+            return 0, 0
+
+        unfinished = and_(GameSession.is_completed == False, or_(*conditions))  # noqa: E712
+        played = or_(
+            GameSession.cells_revealed > 0,
+            GameSession.flags_used > 0,
+            # Saved games keep their journal, even before the first move
+            select(GameJournal.session_id).where(GameJournal.session_id == GameSession.id).exists(),
+        )
+        end_time = datetime.utcnow()
+        quit = self.session.execute(
+            update(GameSession)
+            .where(unfinished, played)
+            .values(
+                end_time=end_time,
+                duration_seconds=(func.julianday(end_time) - func.julianday(GameSession.start_time)) * 86400,
+                result='quit',
+                is_completed=True,
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        deleted = self.session.execute(
+            delete(GameSession).where(unfinished, ~played).execution_options(synchronize_session=False)
+        ).rowcount
+        self.session.commit()
+        if quit:
+            STATS_CACHE.invalidate(self.db_path)
+        return quit, deleted
     
     # Saved game management
+    @timed("db.save_game")
     def save_game(self, user_id: int, game_name: str, board_size: int, mine_count: int, 
-                  difficulty: str, game_state: str, board_data: dict, revealed_count: int, 
+                  difficulty: str, game_state: str, board_data: str | dict, revealed_count: int, 
                   flag_count: int, first_click: bool) -> SavedGame:
+        if isinstance(board_data, dict):
+            board_data = json.dumps(board_data)
+
         # Check if a saved game with this name already exists for the user
         existing_game = self.session.query(SavedGame).filter_by(
             user_id=user_id, game_name=game_name
@@ -139,7 +343,7 @@ class GameDatabase:
             existing_game.mine_count = mine_count
             existing_game.difficulty = difficulty
             existing_game.game_state = game_state
-            existing_game.board_data = json.dumps(board_data)
+            existing_game.board_data = board_data
             existing_game.revealed_count = revealed_count
             existing_game.flag_count = flag_count
             existing_game.first_click = first_click
@@ -154,7 +358,7 @@ class GameDatabase:
                 mine_count=mine_count,
                 difficulty=difficulty,
                 game_state=game_state,
-                board_data=json.dumps(board_data),
+                board_data=board_data,
                 revealed_count=revealed_count,
                 flag_count=flag_count,
                 first_click=first_click
@@ -169,8 +373,31 @@ class GameDatabase:
             user_id=user_id, game_name=game_name
         ).first()
     
-    def get_user_saved_games(self, user_id: int) -> List[SavedGame]:
-        return self.session.query(SavedGame).filter_by(user_id=user_id).all()
+    def get_user_saved_games(self, user_id: int, limit: Optional[int] = None,
+                             before: Optional[Tuple[datetime, int]] = None) -> List[SavedGame]:
+        """List a user's saves, newest first, without loading ``board_data``.
+        
+        ``before`` is the ``(saved_at, id)`` of the last save of the previous page.
+        """
+        query = self.session.query(SavedGame).options(
+            load_only(
+                SavedGame.id,
+                SavedGame.game_name,
+                SavedGame.difficulty,
+                SavedGame.game_state,
+                SavedGame.saved_at,
+            )
+        ).filter_by(user_id=user_id).order_by(SavedGame.saved_at.desc(), SavedGame.id.desc())
+        
+        if before:
+            saved_at, saved_id = before
+            query = query.filter(or_(
+                SavedGame.saved_at < saved_at,
+                and_(SavedGame.saved_at == saved_at, SavedGame.id < saved_id),
+            ))
+        if limit:
+            query = query.limit(limit)
+        return query.all()
     
     def delete_saved_game(self, user_id: int, game_name: str) -> bool:
         saved_game = self.session.query(SavedGame).filter_by(
@@ -182,34 +409,108 @@ class GameDatabase:
             return True
         return False
     
+    # Move journals
+    def save_game_journal(self, session_id: int, moves: bytes, move_count: int) -> GameJournal:
+        journal = self.session.get(GameJournal, session_id)
+        if journal:
+            journal.moves = moves
+            journal.move_count = move_count
+            journal.updated_at = datetime.utcnow()
+        else:
+            journal = GameJournal(session_id=session_id, moves=moves, move_count=move_count)
+            self.session.add(journal)
+        self.session.commit()
+        return journal
+    
+    def load_game_journal(self, session_id: int) -> Optional[GameJournal]:
+        return self.session.get(GameJournal, session_id)
+    
+    # Challenges
+    def record_challenge_result(self, challenge_id: str, user_id: int, result: str,
+                                cells_revealed: int, session_id: Optional[int] = None) -> ChallengeResult:
+        """Record a player's result; only the first finished attempt counts."""
+        existing = self.session.query(ChallengeResult).filter_by(
+            challenge_id=challenge_id, user_id=user_id
+        ).first()
+        if existing:
+            return existing
+        
+        duration = None
+        if session_id:
+            game_session = self.session.get(GameSession, session_id)
+            if game_session and game_session.start_time:
+                duration = (datetime.utcnow() - game_session.start_time).total_seconds()
+        
+        challenge_result = ChallengeResult(
+            challenge_id=challenge_id,
+            user_id=user_id,
+            session_id=session_id,
+            result=result,
+            duration_seconds=duration,
+            cells_revealed=cells_revealed,
+        )
+        self.session.add(challenge_result)
+        self.session.commit()
+        return challenge_result
+    
+    def get_challenge_results(self, challenge_id: str, limit: int = 50) -> List[Tuple[ChallengeResult, str]]:
+        """Results with usernames, wins first and fastest first."""
+        return self.session.query(ChallengeResult, User.username).join(
+            User, ChallengeResult.user_id == User.id
+        ).filter(ChallengeResult.challenge_id == challenge_id).order_by(
+            case((ChallengeResult.result == 'won', 0), else_=1),
+            ChallengeResult.duration_seconds.asc(),
+            ChallengeResult.cells_revealed.desc(),
+        ).limit(limit).all()
+    
     # Statistics
     def get_user_stats(self, user_id: int):
-        total_games = self.session.query(GameSession).filter_by(
-            user_id=user_id, is_completed=True
-        ).count()
-        won_games = self.session.query(GameSession).filter_by(
-            user_id=user_id, result='won'
-        ).count()
-        win_rate = (won_games / total_games * 100) if total_games > 0 else 0
-        
-        return {
-            'total_games': total_games,
-            'won_games': won_games,
-            'lost_games': total_games - won_games,
-            'win_rate': round(win_rate, 2)
-        }
+        return self._aggregate_stats(user_id)
     
     def get_game_stats(self):
-        total_games = self.session.query(GameSession).filter_by(is_completed=True).count()
-        won_games = self.session.query(GameSession).filter_by(result='won').count()
-        win_rate = (won_games / total_games * 100) if total_games > 0 else 0
+        return self._aggregate_stats(None)
+    
+    @timed("db.aggregate_stats")
+    def _aggregate_stats(self, user_id: Optional[int]) -> dict:
+        """Totals and a breakdown per difficulty of the finished games, in one query.
+
+        Win rates and durations are of won and lost games; quit games count in
+        the totals only, their duration is merely how long they were left
+        open. Best durations are of won games. Served from ``STATS_CACHE``.
+        """
+        cached = STATS_CACHE.get(self.db_path, user_id)
+        if cached is not None:
+            return cached
         
-        return {
-            'total_games': total_games,
-            'won_games': won_games,
-            'lost_games': total_games - won_games,
-            'win_rate': round(win_rate, 2)
-        }
+        won = GameSession.result == 'won'
+        decided = GameSession.result.in_(('won', 'lost'))
+        query = select(
+            GameSession.difficulty,
+            func.count(),
+            func.sum(case((won, 1), else_=0)),
+            func.sum(case((GameSession.result == 'lost', 1), else_=0)),
+            func.sum(case((GameSession.result == 'quit', 1), else_=0)),
+            func.sum(case((decided, GameSession.duration_seconds))),
+            func.count(case((decided, GameSession.duration_seconds))),
+            func.min(case((won, GameSession.duration_seconds))),
+            func.sum(GameSession.cells_revealed),
+        ).where(GameSession.is_completed == True).group_by(GameSession.difficulty)  # noqa: E712
+        if user_id is not None:
+            query = query.where(GameSession.user_id == user_id)
+        rows = self.session.execute(query).all()
+        
+        by_difficulty = [
+            {'difficulty': difficulty, **_summarize(*totals)} for difficulty, *totals in rows
+        ]
+        best = [row[7] for row in rows if row[7] is not None]
+        stats = _summarize(
+            *(sum(row[i] or 0 for row in rows) for i in range(1, 7)),
+            min(best) if best else None,
+            sum(row[8] or 0 for row in rows),
+        )
+        stats['by_difficulty'] = by_difficulty
+        STATS_CACHE.put(self.db_path, user_id, stats)
+        return stats
     
     def close(self):
         self.session.close()
\ No newline at end of file
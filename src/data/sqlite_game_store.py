@@ -0,0 +1,182 @@
+import pickle
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, MutableMapping, Optional, TypeVar
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import sessionmaker
+
+from ..profiling import span
+from .game_store import GameStore, StaleGameError, UnknownGameError
+from .models import DEFAULT_DB_PATH, LiveGame, SessionAPIKey, get_engine
+
+T = TypeVar("T")
+
+
+class SQLiteGameStore(GameStore[T]):
+    """Store games as pickled rows so that several workers can share them.
+
+    Every write bumps the row version; a checkout only writes back if the
+    version is still the one it loaded, otherwise ``StaleGameError`` is raised.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        super().__init__()
+        self.db_path = db_path
+        self.engine = get_engine(db_path)
+        self.Session = sessionmaker(bind=self.engine)
+
+    def _load(self, game_id: str):
+        with span("store.load"), self.Session() as session:
+            row = session.get(LiveGame, game_id)
+            if row is None:
+                return None
+            return pickle.loads(row.state), row.version
+
+    def get(self, game_id: str) -> Optional[T]:
+        loaded = self._load(game_id)
+        return loaded[0] if loaded else None
+
+    def put(self, game_id: str, game: T):
+        with self.Session() as session:
+            row = session.get(LiveGame, game_id)
+            if row is None:
+                session.add(LiveGame(game_id=game_id, version=0, state=pickle.dumps(game)))
+            else:
+                row.state = pickle.dumps(game)
+                row.version += 1
+                row.updated_at = datetime.utcnow()
+            session.commit()
+
+    def delete(self, game_id: str) -> bool:
+        with self.Session() as session:
+            result = session.execute(delete(LiveGame).where(LiveGame.game_id == game_id))
+            session.commit()
+            return result.rowcount > 0
+
+    def stored_sizes(self) -> Dict[str, int]:
+        """Pickled size of every game, without loading them."""
+        with self.Session() as session:
+            return dict(session.execute(select(LiveGame.game_id, func.length(LiveGame.state))).all())
+
+    def game_ids(self) -> List[str]:
+        with self.Session() as session:
+            return list(session.scalars(select(LiveGame.game_id)))
+
+    def idle_game_ids(self, idle_seconds: float) -> List[str]:
+        cutoff = datetime.utcnow() - timedelta(seconds=idle_seconds)
+        with self.Session() as session:
+            return list(session.scalars(select(LiveGame.game_id).where(LiveGame.updated_at <= cutoff)))
+
+    def __contains__(self, game_id: str) -> bool:
+        with self.Session() as session:
+            return session.get(LiveGame, game_id) is not None
+
+    @contextmanager
+    def view(self, game_id: str) -> Iterator[T]:
+        # Every read unpickles a fresh copy, release what it opened once done
+        with super().view(game_id) as game:
+            try:
+                yield game
+            finally:
+                close = getattr(game, "close", None)
+                if close:
+                    close()
+
+    @contextmanager
+    def checkout(self, game_id: str) -> Iterator[T]:
+        # The lock serializes requests within this process, the version check
+        # catches writes from other processes.
+        with self.lock_for(game_id):
+            loaded = self._load(game_id)
+            if loaded is None:
+                raise UnknownGameError(game_id)
+
+            game, version = loaded
+            # What the move records in the database (session stats, results,
+            # journals) waits for the version check, a move that lost the race
+            # must leave no trace
+            defers = hasattr(game, "defer_writes")
+            if defers:
+                game.defer_writes()
+            written = False
+            try:
+                yield game
+
+                with span("store.write"), self.Session() as session:
+                    result = session.execute(
+                        update(LiveGame)
+                        .where(LiveGame.game_id == game_id, LiveGame.version == version)
+                        .values(
+                            state=pickle.dumps(game),
+                            version=version + 1,
+                            updated_at=datetime.utcnow(),
+                        )
+                    )
+                    session.commit()
+                if result.rowcount != 1:
+                    raise StaleGameError(game_id)
+                written = True
+            finally:
+                try:
+                    if defers:
+                        game.flush_writes(apply=written)
+                finally:
+                    close = getattr(game, "close", None)
+                    if close:
+                        close()
+
+
+class SQLiteAPIKeys(MutableMapping[str, str]):
+    """API keys of AI sessions, in the database of a SQLite game store.
+
+    A key set through one worker must work for chats served by the others.
+    Reading a key records its use, ``expire`` drops the keys no worker used
+    for a while.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.engine = get_engine(db_path)
+        self.Session = sessionmaker(bind=self.engine)
+
+    def __getitem__(self, session_id: str) -> str:
+        with self.Session() as session:
+            row = session.get(SessionAPIKey, session_id)
+            if row is None:
+                raise KeyError(session_id)
+            api_key = row.api_key
+            row.last_used_at = datetime.utcnow()
+            session.commit()
+            return api_key
+
+    def __setitem__(self, session_id: str, api_key: str):
+        with self.Session() as session:
+            session.merge(SessionAPIKey(session_id=session_id, api_key=api_key, last_used_at=datetime.utcnow()))
+            session.commit()
+
+    def __delitem__(self, session_id: str):
+        with self.Session() as session:
+            result = session.execute(delete(SessionAPIKey).where(SessionAPIKey.session_id == session_id))
+            session.commit()
+        if result.rowcount == 0:
+            raise KeyError(session_id)
+
+    def __contains__(self, session_id: object) -> bool:
+        with self.Session() as session:
+            return session.get(SessionAPIKey, session_id) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        with self.Session() as session:
+            return iter(list(session.scalars(select(SessionAPIKey.session_id))))
+
+    def __len__(self) -> int:
+        with self.Session() as session:
+            return session.scalar(select(func.count()).select_from(SessionAPIKey))
+
+    def expire(self, idle_seconds: float) -> int:
+        """Drop the keys unused for ``idle_seconds``; returns how many."""
+        cutoff = datetime.utcnow() - timedelta(seconds=idle_seconds)
+        with self.Session() as session:
+            result = session.execute(delete(SessionAPIKey).where(SessionAPIKey.last_used_at <= cutoff))
+            session.commit()
+            return result.rowcount
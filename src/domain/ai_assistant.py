@@ -1,40 +1,296 @@
-import json
-from typing import Dict, List, Optional
-from openai import OpenAI
+import asyncio
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from ..profiling import span, timed
 from .minesweeper import MinesweeperGame
-from .model import CellState
+from .model import CellState, GameState
+from .prompt_encoder import PROMPT_ENCODINGS, board_sections, estimate_tokens, fit_sections
+from .solver import analyze
+
+# openai and httpx load when the first assistant or connection pool is created,
+# not when the server starts
+if TYPE_CHECKING:
+    import httpx
+
+CHAT_MODEL = "gpt-4"
+
+# Questions that only ask for the next move are answered from the visible board.
+# Each phrase names a move or a cell to play, general questions ("what should I
+# do to improve", "help me understand the rules") go to the model.
+HINT_QUESTION = re.compile(
+    r"\b(hints?"
+    r"|(next|best|safe|safest) (move|cell|square|tile|click|spot)"
+    r"|what (should|do|can) i (click|reveal|open|try|do) (next|now)"
+    r"|what (should|do|can) i (click|reveal|open)"
+    r"|where (should|do|can) i (click|go|start|reveal)"
+    r"|which (cell|square|tile)s? (should|to|is|are|can)"
+    r"|is it safe to (click|reveal|open)"
+    r"|help me (find|pick|choose) an? (safe )?(move|cell|square|tile))\b"
+)
+
+# One connection pool shared by every assistant, so concurrent chats reuse
+# keep-alive connections instead of opening a pool per session.
+_HTTP_CLIENT: Optional["httpx.AsyncClient"] = None
+
+
+def get_shared_http_client() -> "httpx.AsyncClient":
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed:
+        import httpx
+        from openai import DefaultAsyncHttpxClient
+
+        _HTTP_CLIENT = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
+    return _HTTP_CLIENT
+
+
+async def close_shared_http_client():
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is not None:
+        await _HTTP_CLIENT.aclose()
+        _HTTP_CLIENT = None
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(re.sub(r"[^\w\s,]", " ", question.lower()).split())
+
+
+def is_hint_question(question: str) -> bool:
+    return HINT_QUESTION.search(normalize_question(question)) is not None
+
+
+def local_hint(game: MinesweeperGame) -> str:
+    """Suggest the next move using only what the player can see."""
+    if game.game_state != GameState.PLAYING:
+        return "This game is over. Start a new game and I'll help you with your next move!"
+    if game.first_click:
+        return (
+            "Your first click is always safe. Start near the middle of the board, "
+            "it tends to open up a larger area."
+        )
+
+    analysis = analyze(game)
+    if analysis.safe:
+        row, col = min(analysis.safe)
+        hint = f"Cell ({row}, {col}) is guaranteed safe from the numbers you can see, reveal it next."
+        if len(analysis.safe) > 1:
+            hint += f" There are {len(analysis.safe) - 1} more provably safe cells on the board."
+        return hint
+
+    unflagged_mines = sorted(
+        (row, col) for row, col in analysis.mines
+        if game.board[row][col].state != CellState.FLAGGED
+    )
+    if unflagged_mines:
+        row, col = unflagged_mines[0]
+        return (
+            f"No cell can be proven safe right now, but the numbers force a mine at "
+            f"({row}, {col}). Flag it and look at its neighbors again."
+        )
+
+    unknown = game.size * game.size - game.revealed_count - len(analysis.mines)
+    density = (game.mine_count - len(analysis.mines)) / max(1, unknown)
+    return (
+        f"The visible numbers don't prove any cell safe, so you'll need to guess. "
+        f"About {density:.0%} of the undecided cells are mines; cells away from the "
+        f"numbers, such as corners, are usually the better gamble."
+    )
+
+
+def board_fingerprint(game: MinesweeperGame) -> str:
+    """Hash of everything the model is told about the board."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(game.game_state.value.encode())
+    digest.update(bytes(
+        (cell.state == CellState.REVEALED) << 2 | (cell.state == CellState.FLAGGED) << 1 | cell.is_mine
+        for row in game.board
+        for cell in row
+    ))
+    return digest.hexdigest()
+
+
+# board fingerprint, normalized question, digest of who asks in which conversation
+CacheKey = Tuple[str, str, str]
+
+
+class ResponseCache:
+    """LRU cache of model replies with single-flight for identical requests.
+
+    While a reply for a key is being computed, other callers asking for the
+    same key wait for that result instead of calling the model again. Keys
+    cover everything sent to the model, see ``MinesweeperAIAssistant.plan``.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[CacheKey, Tuple[float, str]] = OrderedDict()
+        self._in_flight: Dict[CacheKey, asyncio.Future] = {}
+
+    def get(self, key: CacheKey) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, reply = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return reply
+
+    def put(self, key: CacheKey, reply: str):
+        self._entries[key] = (time.monotonic() + self.ttl, reply)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def lookup(self, key: CacheKey) -> Optional[str]:
+        """The cached reply, or that of an identical request in flight; None if neither."""
+        reply = self.get(key)
+        if reply is None:
+            pending = self._in_flight.get(key)
+            if pending is None:
+                return None
+            reply = await asyncio.shield(pending)
+        self.hits += 1
+        return reply
+
+    @contextmanager
+    def computing(self, key: CacheKey) -> Iterator[Callable[[str], None]]:
+        """Mark ``key`` in flight for the block; the yielded function stores its reply.
+
+        Callers must have found nothing through ``lookup`` without awaiting
+        anything since, or two requests for the key may be in flight.
+        """
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+
+        def resolve(reply: str):
+            self.put(key, reply)
+            future.set_result(reply)
+
+        try:
+            yield resolve
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(
+                    e if isinstance(e, Exception) else RuntimeError("The identical request was abandoned")
+                )
+                future.exception()  # followers re-raise it, don't warn if there are none
+            raise
+        finally:
+            del self._in_flight[key]
+            if not future.done():
+                future.set_exception(RuntimeError("The identical request produced no reply"))
+                future.exception()
+
+    async def get_or_compute(
+        self, key: CacheKey, compute: Callable[[], Awaitable[str]]
+    ) -> str:
+        reply = await self.lookup(key)
+        if reply is not None:
+            return reply
+
+        with self.computing(key) as resolve:
+            reply = await compute()
+            resolve(reply)
+            return reply
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+RESPONSE_CACHE = ResponseCache()
+
+
+@dataclass
+class ChatPlan:
+    """How a question will be answered, decided while the game is locked."""
+
+    question: str
+    reply: Optional[str] = None  # set when answered locally
+    cache_key: Optional[CacheKey] = None
+    messages: List[Dict[str, str]] = field(default_factory=list)
 
 
 class MinesweeperAIAssistant:
     """AI Assistant for Minesweeper game using OpenAI's GPT models."""
     
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        prompt_encoding: str = "grid",
+        max_board_tokens: Optional[int] = 1500,
+        base_url: Optional[str] = None,
+        http_client: Optional["httpx.AsyncClient"] = None,
+        share_connection_pool: bool = True,
+        memory_tokens: int = 1000,
+        summary_tokens: int = 300,
+    ):
         """Initialize AI assistant with OpenAI API key.
         
         Args:
             api_key: OpenAI API key for authentication
+            prompt_encoding: How the board is described to the model, one of
+                "grid", "frontier" or "json" (the original per-cell dump)
+            max_board_tokens: Approximate token budget for the board description,
+                None for no limit
+            base_url: Alternative completions API endpoint, defaults to OpenAI
+            http_client: Connection pool to use, defaults to the shared pool
+            share_connection_pool: When False and no http_client is given, the
+                assistant opens its own pool and closes it in ``aclose``
+            memory_tokens: Approximate token budget for conversation turns kept verbatim
+            summary_tokens: Approximate token budget for the summary of older turns
         """
-        self.client = OpenAI(api_key=api_key)
+        from openai import AsyncOpenAI
+
+        if prompt_encoding not in PROMPT_ENCODINGS:
+            raise ValueError(f"Unknown prompt encoding: {prompt_encoding}")
+        if http_client is None and share_connection_pool:
+            http_client = get_shared_http_client()
+        self._owns_http_client = http_client is None
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=http_client,
+        )
+        self.prompt_encoding = prompt_encoding
+        self.max_board_tokens = max_board_tokens
+        self.memory_tokens = memory_tokens
+        self.summary_tokens = summary_tokens
         self.conversation_history: List[Dict[str, str]] = []
+        self.summary_lines: List[str] = []
+        # Replies are paid for with the key, only its holder gets them from the cache
+        self._key_owner = hashlib.blake2b(api_key.encode(), digest_size=16).digest()
     
     def get_game_state_prompt(self, game: MinesweeperGame) -> str:
         """Generate a detailed prompt with current game state information."""
         
-        # Build board representation with complete information
-        board_info = []
-        for row in range(game.size):
-            row_info = []
-            for col in range(game.size):
-                cell = game.board[row][col]
-                cell_info = {
-                    "position": f"({row},{col})",
-                    "state": cell.state.value,
-                    "is_mine": cell.is_mine,
-                    "adjacent_mines": cell.adjacent_mines if not cell.is_mine else None,
-                    "visible_to_user": cell.state == CellState.REVEALED
-                }
-                row_info.append(cell_info)
-            board_info.append(row_info)
+        board_description = fit_sections(
+            board_sections(game, self.prompt_encoding), self.max_board_tokens
+        )
         
         # Get game statistics
         stats = game.get_game_stats()
@@ -50,8 +306,7 @@ CURRENT GAME STATE:
 - Cells revealed: {stats.revealed_count}
 - Game status: {game.game_state.value}
 
-COMPLETE BOARD INFORMATION (HIDDEN FROM PLAYER):
-{json.dumps(board_info, indent=2)}
+{board_description}
 
 INSTRUCTIONS FOR AI ASSISTANT:
 1. You can see all mine locations and safe cells, but the player cannot
@@ -70,6 +325,138 @@ Player's question: """
         
         return prompt
     
+    def plan(self, game: MinesweeperGame, user_question: str) -> ChatPlan:
+        """Record the question and decide how to answer it.
+        
+        Next-move questions get a local answer straight away, anything else
+        becomes a model request. This only reads the game, so callers can hold
+        the game's lock for it and release it before waiting on the model.
+        """
+        # Add to conversation history
+        self._remember("user", user_question)
+        
+        if is_hint_question(user_question):
+            return ChatPlan(question=user_question, reply=local_hint(game))
+        
+        messages = [{"role": "system", "content": self.get_game_state_prompt(game)}]
+        if self.summary_lines:
+            messages.append({
+                "role": "system",
+                "content": "Summary of the earlier conversation:\n" + "\n".join(self.summary_lines)
+            })
+        
+        # Recent conversation history, ending with this question
+        return ChatPlan(
+            question=user_question,
+            cache_key=(
+                board_fingerprint(game),
+                normalize_question(user_question),
+                self._context_digest(),
+            ),
+            messages=messages + self.conversation_history,
+        )
+    
+    def _context_digest(self) -> str:
+        """Hash of the key owner, prompt settings and the conversation before this question."""
+        digest = hashlib.blake2b(self._key_owner, digest_size=16)
+        digest.update(f"{self.prompt_encoding}\0{self.max_board_tokens}\0".encode())
+        for line in self.summary_lines:
+            digest.update(b"s\0" + line.encode() + b"\0")
+        for message in self.conversation_history[:-1]:
+            digest.update(message["role"].encode() + b"\0" + message["content"].encode() + b"\0")
+        return digest.hexdigest()
+    
+    def _remember(self, role: str, content: str):
+        self.conversation_history.append({
+            "role": role,
+            "content": content
+        })
+        self._trim_memory()
+    
+    def _trim_memory(self):
+        """Fold the oldest turns into the summary until the history fits its budget.
+        
+        The latest message is always kept verbatim.
+        """
+        while (
+            len(self.conversation_history) > 1
+            and sum(estimate_tokens(m["content"]) for m in self.conversation_history) > self.memory_tokens
+        ):
+            oldest = self.conversation_history.pop(0)
+            speaker = "Player" if oldest["role"] == "user" else "You"
+            content = " ".join(oldest["content"].split())
+            if len(content) > 160:
+                content = content[:157] + "..."
+            self.summary_lines.append(f"{speaker}: {content}")
+        
+        while (
+            len(self.summary_lines) > 1
+            and sum(estimate_tokens(line) for line in self.summary_lines) > self.summary_tokens
+        ):
+            self.summary_lines.pop(0)
+    
+    @timed("openai.completion")
+    async def _request_completion(self, messages: List[Dict[str, str]]) -> str:
+        response = await self.client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=messages,
+            max_tokens=500,
+            temperature=0.7
+        )
+        return response.choices[0].message.content
+    
+    async def answer(self, plan: ChatPlan) -> str:
+        """Get the assistant's full reply for a planned question."""
+        if plan.reply is not None:
+            self._remember("assistant", plan.reply)
+            return plan.reply
+        
+        try:
+            reply = await RESPONSE_CACHE.get_or_compute(
+                plan.cache_key, lambda: self._request_completion(plan.messages)
+            )
+        except Exception as e:
+            return f"Sorry, I encountered an error while processing your request: {str(e)}"
+        
+        self._remember("assistant", reply)
+        return reply
+    
+    async def stream_answer(self, plan: ChatPlan) -> AsyncIterator[str]:
+        """Yield the assistant's reply piece by piece as the model produces it.
+        
+        Local and cached answers arrive as a single piece.
+        """
+        reply = plan.reply
+        if reply is None:
+            reply = await RESPONSE_CACHE.lookup(plan.cache_key)
+        if reply is not None:
+            self._remember("assistant", reply)
+            yield reply
+            return
+        
+        # Identical requests arriving meanwhile wait for this one's reply
+        with RESPONSE_CACHE.computing(plan.cache_key) as resolve:
+            chunks = []
+            with span("openai.connect"):
+                response = await self.client.chat.completions.create(
+                    model=CHAT_MODEL,
+                    messages=plan.messages,
+                    max_tokens=500,
+                    temperature=0.7,
+                    stream=True
+                )
+            async for chunk in response:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    chunks.append(delta)
+                    yield delta
+            
+            reply = "".join(chunks)
+            resolve(reply)
+        self._remember("assistant", reply)
+    
     async def get_assistance(self, game: MinesweeperGame, user_question: str) -> str:
         """Get AI assistance for the current game state and user question.
         
@@ -80,62 +467,84 @@ Player's question: """
         Returns:
             AI assistant's response
         """
-        try:
-            # Build the full prompt with game state
-            system_prompt = self.get_game_state_prompt(game)
-            full_prompt = system_prompt + user_question
-            
-            # Add to conversation history
-            self.conversation_history.append({
-                "role": "user",
-                "content": user_question
-            })
-            
-            # Prepare messages for OpenAI API
-            messages = [
-                {
-                    "role": "system",
-                    "content": system_prompt
-                },
-                {
-                    "role": "user", 
-                    "content": user_question
-                }
-            ]
-            
-            # Add recent conversation history (last 6 messages to keep context)
-            if len(self.conversation_history) > 2:
-                recent_history = self.conversation_history[-6:]
-                messages.extend(recent_history)
-            
-            # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=messages,
-                max_tokens=500,
-                temperature=0.7
-            )
-            
-            assistant_response = response.choices[0].message.content
-            
-            # Add response to conversation history
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": assistant_response
-            })
-            
-            return assistant_response
-            
-        except Exception as e:
-            return f"Sorry, I encountered an error while processing your request: {str(e)}"
+        return await self.answer(self.plan(game, user_question))
     
     def clear_conversation(self):
         """Clear the conversation history."""
         self.conversation_history = []
+        self.summary_lines = []
+    
+    async def aclose(self):
+        """Drop the conversation and close the connection pool if it is our own."""
+        self.clear_conversation()
+        if self._owns_http_client:
+            await self.client.close()
+
+
+class AssistantRegistry:
+    """Assistants per session, bounded by count and idle time.
+    
+    The least recently used assistant is evicted when the registry is full,
+    and assistants idle for longer than ``idle_ttl`` seconds are dropped on
+    the next access or ``evict_idle`` call. Evicted assistants are closed.
+    Not thread safe, use it on the event loop the assistants are closed on.
+    """
+    
+    def __init__(self, max_assistants: int = 256, idle_ttl: float = 3600.0):
+        self.max_assistants = max_assistants
+        self.idle_ttl = idle_ttl
+        self.evictions = 0
+        self._assistants: OrderedDict[str, Tuple[float, MinesweeperAIAssistant]] = OrderedDict()
+    
+    def get_or_create(self, session_id: str, api_key: str) -> MinesweeperAIAssistant:
+        self.evict_idle()
+        entry = self._assistants.pop(session_id, None)
+        assistant = entry[1] if entry else MinesweeperAIAssistant(api_key)
+        self._assistants[session_id] = (time.monotonic(), assistant)
+        while len(self._assistants) > self.max_assistants:
+            _, (_, evicted) = self._assistants.popitem(last=False)
+            self._close(evicted)
+        return assistant
+    
+    def remove(self, session_id: str) -> bool:
+        entry = self._assistants.pop(session_id, None)
+        if entry is None:
+            return False
+        self._close(entry[1])
+        return True
+    
+    def evict_idle(self) -> int:
+        """Drop the assistants idle for longer than ``idle_ttl``; returns how many."""
+        cutoff = time.monotonic() - self.idle_ttl
+        evicted = 0
+        while self._assistants:
+            session_id, (last_used, _) = next(iter(self._assistants.items()))
+            if last_used >= cutoff:
+                break
+            self.remove(session_id)
+            evicted += 1
+        return evicted
+    
+    def _close(self, assistant: MinesweeperAIAssistant):
+        self.evictions += 1
+        try:
+            asyncio.get_running_loop().create_task(assistant.aclose())
+        except RuntimeError:
+            # No event loop to close on, at least release the conversation
+            assistant.clear_conversation()
+    
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._assistants
+    
+    def __len__(self) -> int:
+        return len(self._assistants)
+    
+    def items(self):
+        return [(session_id, assistant) for session_id, (_, assistant) in self._assistants.items()]
 
 
-# In-memory storage for API keys and AI assistants per session
-AI_ASSISTANTS: Dict[str, MinesweeperAIAssistant] = {}
+# In-memory storage for AI assistants per session
+AI_ASSISTANTS = AssistantRegistry()
 
 
 def get_or_create_assistant(session_id: str, api_key: str) -> MinesweeperAIAssistant:
@@ -148,9 +557,7 @@ def get_or_create_assistant(session_id: str, api_key: str) -> MinesweeperAIAssis
     Returns:
         MinesweeperAIAssistant instance
     """
-    if session_id not in AI_ASSISTANTS:
-        AI_ASSISTANTS[session_id] = MinesweeperAIAssistant(api_key)
-    return AI_ASSISTANTS[session_id]
+    return AI_ASSISTANTS.get_or_create(session_id, api_key)
 
 
 def remove_assistant(session_id: str):
@@ -159,5 +566,4 @@ def remove_assistant(session_id: str):
     Args:
         session_id: Unique session identifier
     """
-    if session_id in AI_ASSISTANTS:
-        del AI_ASSISTANTS[session_id]
\ No newline at end of file
+    AI_ASSISTANTS.remove(session_id)
@@ -0,0 +1,207 @@
+"""Many Minesweeper boards stepped at once on stacked NumPy arrays.
+
+Meant for training bots: no database, no ``Cell`` objects, one vector of
+actions per step. The rules match ``MinesweeperGame``: mines are placed on the
+first reveal anywhere but the revealed cell, revealing a zero opens its
+hidden, unflagged neighbours, revealing a mine loses and revealing every safe
+cell wins.
+
+Requires the optional ``numpy`` dependency (``uv sync --extra train``).
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+
+REWARD_WIN = 1.0
+REWARD_LOSS = -1.0
+REWARD_PROGRESS = 0.1
+REWARD_INVALID = -0.05
+
+_OFFSETS = [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc]
+
+
+def _neighbour_sum(planes: np.ndarray) -> np.ndarray:
+    """Per cell, how many of its 8 neighbours are set in ``planes`` (N, S, S)."""
+    size = planes.shape[-1]
+    padded = np.pad(planes.astype(np.int8), ((0, 0), (1, 1), (1, 1)))
+    total = np.zeros(planes.shape, dtype=np.int8)
+    for dr, dc in _OFFSETS:
+        total += padded[:, 1 + dr:1 + dr + size, 1 + dc:1 + dc + size]
+    return total
+
+
+def _dilate(planes: np.ndarray) -> np.ndarray:
+    size = planes.shape[-1]
+    padded = np.pad(planes, ((0, 0), (1, 1), (1, 1)))
+    grown = planes.copy()
+    for dr, dc in _OFFSETS:
+        grown |= padded[:, 1 + dr:1 + dr + size, 1 + dc:1 + dc + size]
+    return grown
+
+
+@dataclass
+class StepResult:
+    observation: Dict[str, np.ndarray]
+    rewards: np.ndarray  # float32 (N,)
+    dones: np.ndarray  # bool (N,), boards that finished and were reset
+    won: np.ndarray  # bool (N,), which of the finished boards were won
+
+
+class BatchMinesweeperEnv:
+    """``num_envs`` boards of ``size`` x ``size`` with ``mine_count`` mines each.
+
+    Actions are cell indices: ``row * size + col`` reveals a cell and
+    ``size * size + row * size + col`` toggles its flag. Finished boards are
+    reset automatically, so the observation after a step already shows the
+    new board for those.
+    """
+
+    def __init__(
+        self,
+        num_envs: int,
+        size: int = 9,
+        mine_count: Optional[int] = None,
+        difficulty: float = 0.15,
+        seed: Optional[int] = None,
+    ):
+        if size < 3:
+            raise ValueError("Board size must be at least 3")
+        if mine_count is None:
+            mine_count = max(1, int(size * size * difficulty))
+        if not 0 < mine_count < size * size:
+            raise ValueError("Mine count must be between 1 and size * size - 1")
+
+        self.num_envs = num_envs
+        self.size = size
+        self.mine_count = mine_count
+        self.num_actions = 2 * size * size
+        self.rng = np.random.default_rng(seed)
+
+        shape = (num_envs, size, size)
+        self.mines = np.zeros(shape, dtype=bool)
+        self.adjacent = np.zeros(shape, dtype=np.int8)
+        self.revealed = np.zeros(shape, dtype=bool)
+        self.flagged = np.zeros(shape, dtype=bool)
+        self.placed = np.zeros(num_envs, dtype=bool)
+        self.revealed_count = np.zeros(num_envs, dtype=np.int32)
+
+    def reset(self, boards: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        if boards is None:
+            boards = np.arange(self.num_envs)
+        self.mines[boards] = False
+        self.adjacent[boards] = 0
+        self.revealed[boards] = False
+        self.flagged[boards] = False
+        self.placed[boards] = False
+        self.revealed_count[boards] = 0
+        return self.observation()
+
+    def observation(self) -> Dict[str, np.ndarray]:
+        """``numbers`` is the adjacent mine count of revealed cells and -1 elsewhere."""
+        return {
+            "numbers": np.where(self.revealed, self.adjacent, np.int8(-1)),
+            "hidden": ~self.revealed,
+            "flagged": self.flagged.copy(),
+        }
+
+    def step(self, actions) -> StepResult:
+        actions = np.asarray(actions, dtype=np.int64)
+        if actions.shape != (self.num_envs,):
+            raise ValueError(f"Expected {self.num_envs} actions, got shape {actions.shape}")
+        if ((actions < 0) | (actions >= self.num_actions)).any():
+            raise ValueError("Action out of range")
+
+        cells = self.size * self.size
+        boards = np.arange(self.num_envs)
+        is_flag = actions >= cells
+        rows, cols = np.divmod(actions % cells, self.size)
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        lost = np.zeros(self.num_envs, dtype=bool)
+        won = np.zeros(self.num_envs, dtype=bool)
+
+        # Flags: toggle on any unrevealed cell
+        flag = boards[is_flag]
+        fr, fc = rows[flag], cols[flag]
+        valid = ~self.revealed[flag, fr, fc]
+        self.flagged[flag[valid], fr[valid], fc[valid]] ^= True
+        rewards[flag[~valid]] = REWARD_INVALID
+
+        # Reveals: only hidden, unflagged cells
+        reveal = boards[~is_flag]
+        rr, rc = rows[reveal], cols[reveal]
+        valid = ~self.revealed[reveal, rr, rc] & ~self.flagged[reveal, rr, rc]
+        rewards[reveal[~valid]] = REWARD_INVALID
+        reveal, rr, rc = reveal[valid], rr[valid], rc[valid]
+
+        first = ~self.placed[reveal]
+        if first.any():
+            self._place_mines(reveal[first], rr[first], rc[first])
+
+        hit = self.mines[reveal, rr, rc]
+        self.revealed[reveal[hit], rr[hit], rc[hit]] = True
+        lost[reveal[hit]] = True
+
+        safe, sr, sc = reveal[~hit], rr[~hit], rc[~hit]
+        if len(safe):
+            opened = self._flood_fill(safe, sr, sc)
+            self.revealed[safe] |= opened
+            self.revealed_count[safe] += opened.sum(axis=(1, 2), dtype=np.int32)
+            rewards[safe] = REWARD_PROGRESS
+            won[safe] = self.revealed_count[safe] == cells - self.mine_count
+
+        rewards[won] = REWARD_WIN
+        rewards[lost] = REWARD_LOSS
+        dones = won | lost
+        if dones.any():
+            self.reset(boards[dones])
+        return StepResult(self.observation(), rewards, dones, won)
+
+    def _place_mines(self, boards: np.ndarray, rows: np.ndarray, cols: np.ndarray):
+        """Uniformly random layouts that leave the first revealed cell safe."""
+        count = len(boards)
+        keys = self.rng.random((count, self.size * self.size))
+        keys[np.arange(count), rows * self.size + cols] = 2.0
+        chosen = np.argpartition(keys, self.mine_count - 1, axis=1)[:, :self.mine_count]
+        layout = np.zeros(keys.shape, dtype=bool)
+        layout[np.arange(count)[:, None], chosen] = True
+        layout = layout.reshape(count, self.size, self.size)
+
+        self.mines[boards] = layout
+        self.adjacent[boards] = _neighbour_sum(layout)
+        self.placed[boards] = True
+
+    def _flood_fill(self, boards: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """Cells opened by revealing (row, col) on each board, as (len(boards), S, S)."""
+        count = len(boards)
+        opened = np.zeros((count, self.size, self.size), dtype=bool)
+        opened[np.arange(count), rows, cols] = True
+
+        # Boards whose revealed cell is not a zero open just that cell
+        spreading = np.flatnonzero(self.adjacent[boards, rows, cols] == 0)
+        if len(spreading):
+            sub = boards[spreading]
+            region = opened[spreading]
+            can_open = ~self.mines[sub] & ~self.flagged[sub] & ~self.revealed[sub]
+            zeros = self.adjacent[sub] == 0
+            # Grow every region one ring per pass, dropping boards that stopped growing
+            active = np.arange(len(sub))
+            sizes = np.ones(len(sub), dtype=np.int64)
+            while len(active):
+                part = region[active]
+                part |= _dilate(part & zeros[active]) & can_open[active]
+                region[active] = part
+                grown = part.sum(axis=(1, 2))
+                still = grown != sizes[active]
+                sizes[active] = grown
+                active = active[still]
+            opened[spreading] = region
+        return opened
+
+    def load_layout(self, board: int, mines: np.ndarray):
+        """Use a fixed mine layout on ``board``, e.g. one taken from a ``MinesweeperGame``."""
+        self.reset(np.array([board]))
+        self.mines[board] = mines
+        self.adjacent[board] = _neighbour_sum(mines[None])[0]
+        self.placed[board] = True
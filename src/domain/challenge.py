@@ -0,0 +1,285 @@
+"""Challenge games: many players on the same board.
+
+The immutable part of a challenge board, the mine positions, adjacency counts
+and zero regions, is built once per challenge as a ``MineLayout`` and shared
+by every ``ChallengeGame``. A player's game only owns a state plane with one
+byte per cell. ``ChallengeGame.board`` is a view over the two, so the rest of
+the code reads it like any other board.
+"""
+
+import datetime
+import hashlib
+import random
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple
+
+from .journal import JournalSnapshot, MoveJournal
+from .minesweeper import MinesweeperGame
+from .model import CellState, GameState
+
+if TYPE_CHECKING:
+    from ..data.models import GameDatabase
+
+DAILY_SIZE = 16
+DAILY_MINES = 40
+
+_STATE_CODES = {CellState.HIDDEN: 0, CellState.REVEALED: 1, CellState.FLAGGED: 2}
+_CODE_STATES = {code: state for state, code in _STATE_CODES.items()}
+_HIDDEN = _STATE_CODES[CellState.HIDDEN]
+_REVEALED = _STATE_CODES[CellState.REVEALED]
+
+
+@dataclass(frozen=True)
+class MineLayout:
+    challenge_id: str
+    size: int
+    mine_count: int
+    mines: bytes  # 1 per mine cell
+    adjacent: bytes  # adjacent mine count per cell
+    zero_region: Tuple[int, ...]  # region label of each zero cell, -1 elsewhere
+    openings: Tuple[Tuple[int, ...], ...]  # per region, the cells revealing it opens
+    start: int  # cell revealed for every player when the game starts
+    start_states: bytes  # state plane after opening the start cell
+
+    @classmethod
+    def generate(cls, challenge_id: str, size: int, mine_count: int) -> "MineLayout":
+        seed = int.from_bytes(hashlib.sha256(challenge_id.encode()).digest()[:8], "big")
+        cells = size * size
+        mines = bytearray(cells)
+        for index in random.Random(seed).sample(range(cells), mine_count):
+            mines[index] = 1
+
+        adjacent = bytearray(cells)
+        for index in range(cells):
+            if not mines[index]:
+                adjacent[index] = sum(mines[n] for n in _neighbours(index, size))
+
+        zero_region = [-1] * cells
+        openings = []
+        for index in range(cells):
+            if mines[index] or adjacent[index] or zero_region[index] != -1:
+                continue
+            label = len(openings)
+            zero_region[index] = label
+            opened, stack = {index}, [index]
+            while stack:
+                for neighbour in _neighbours(stack.pop(), size):
+                    if neighbour in opened:
+                        continue
+                    opened.add(neighbour)
+                    if adjacent[neighbour] == 0:
+                        zero_region[neighbour] = label
+                        stack.append(neighbour)
+            openings.append(tuple(sorted(opened)))
+
+        start_states = bytearray(cells)
+        if openings:
+            largest = max(range(len(openings)), key=lambda label: len(openings[label]))
+            start = zero_region.index(largest)
+            for index in openings[largest]:
+                start_states[index] = _REVEALED
+        else:
+            start = mines.index(0)
+            start_states[start] = _REVEALED
+
+        return cls(
+            challenge_id=challenge_id,
+            size=size,
+            mine_count=mine_count,
+            mines=bytes(mines),
+            adjacent=bytes(adjacent),
+            zero_region=tuple(zero_region),
+            openings=tuple(openings),
+            start=start,
+            start_states=bytes(start_states),
+        )
+
+
+def _neighbours(index: int, size: int) -> Iterator[int]:
+    row, col = divmod(index, size)
+    for dr in (-1, 0, 1):
+        for dc in (-1, 0, 1):
+            if (dr or dc) and 0 <= row + dr < size and 0 <= col + dc < size:
+                yield (row + dr) * size + col + dc
+
+
+def daily_challenge_id(day: Optional[datetime.date] = None) -> str:
+    return f"daily-{(day or datetime.date.today()).isoformat()}"
+
+
+@lru_cache(maxsize=32)
+def get_challenge_layout(challenge_id: str) -> MineLayout:
+    """The shared layout of a challenge, built on first use."""
+    if not challenge_id.startswith("daily-"):
+        raise ValueError(f"Unknown challenge: {challenge_id}")
+    datetime.date.fromisoformat(challenge_id.removeprefix("daily-"))
+    return MineLayout.generate(challenge_id, DAILY_SIZE, DAILY_MINES)
+
+
+class LayoutCell:
+    """A board cell read from the shared layout and the player's state plane."""
+
+    __slots__ = ("_board", "_index")
+
+    def __init__(self, board: "LayoutBoard", index: int):
+        self._board = board
+        self._index = index
+
+    @property
+    def is_mine(self) -> bool:
+        return bool(self._board.layout.mines[self._index])
+
+    @property
+    def adjacent_mines(self) -> int:
+        return self._board.layout.adjacent[self._index]
+
+    @property
+    def state(self) -> CellState:
+        return _CODE_STATES[self._board.states[self._index]]
+
+    @state.setter
+    def state(self, state: CellState):
+        self._board.states[self._index] = _STATE_CODES[state]
+
+
+class LayoutRow:
+    __slots__ = ("_board", "_offset")
+
+    def __init__(self, board: "LayoutBoard", row: int):
+        self._board = board
+        self._offset = row * board.layout.size
+
+    def __len__(self) -> int:
+        return self._board.layout.size
+
+    def __getitem__(self, col: int) -> LayoutCell:
+        if not 0 <= col < len(self):
+            raise IndexError(col)
+        return LayoutCell(self._board, self._offset + col)
+
+    def __iter__(self) -> Iterator[LayoutCell]:
+        return (LayoutCell(self._board, self._offset + col) for col in range(len(self)))
+
+
+class LayoutBoard:
+    """Read-only mines and adjacency from the layout, writable cell states."""
+
+    __slots__ = ("layout", "states")
+
+    def __init__(self, layout: MineLayout, states: bytearray):
+        self.layout = layout
+        self.states = states
+
+    def __len__(self) -> int:
+        return self.layout.size
+
+    def __getitem__(self, row: int) -> LayoutRow:
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return LayoutRow(self, row)
+
+    def __iter__(self) -> Iterator[LayoutRow]:
+        return (LayoutRow(self, row) for row in range(len(self)))
+
+
+class ChallengeGame(MinesweeperGame):
+    """A game on a challenge's shared layout; starts with the start cell open."""
+
+    def __init__(
+        self,
+        challenge_id: str,
+        username: str | None = None,
+        db: "GameDatabase | None" = None,
+    ):
+        self.layout = get_challenge_layout(challenge_id)
+        size = self.layout.size
+        # Chosen so that int(size * size * difficulty) == mine_count
+        super().__init__(size, (self.layout.mine_count + 0.5) / (size * size), username, db)
+        self._open_start()
+
+    @property
+    def challenge_id(self) -> str:
+        return self.layout.challenge_id
+
+    def __getstate__(self):
+        # The layout is shared, store the challenge id and reattach on load
+        state = super().__getstate__()
+        state["layout"] = self.layout.challenge_id
+        state["board"] = None
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self.layout = get_challenge_layout(self.layout)
+        self.board = LayoutBoard(self.layout, self.states)
+
+    def _initialize_board(self):
+        self.states = bytearray(self.layout.size * self.layout.size)
+        self.board = LayoutBoard(self.layout, self.states)
+
+    def _place_mines(self, exclude_row: int, exclude_col: int):
+        pass  # the layout is fixed
+
+    def _calculate_adjacent_mines(self):
+        pass  # precomputed in the layout
+
+    def reset(self):
+        super().reset()
+        self._open_start()
+
+    def _open_start(self):
+        # The opening is the same for every player, copy it instead of playing it.
+        # It is part of the board everyone gets, not an undoable move.
+        self.first_click = False
+        self.states[:] = self.layout.start_states
+        self.revealed_count = self.layout.start_states.count(_REVEALED)
+        self.version += 1
+        self.journal = MoveJournal(self.size, JournalSnapshot(
+            size=self.size,
+            mines=bytearray(self.layout.mines),
+            states=bytearray(self.states),
+            revealed_count=self.revealed_count,
+            first_click=False,
+        ))
+        self._update_session_stats()
+
+    def _reveal_cells_flood_fill(
+        self, row: int, col: int, changed: List[Tuple[int, int]] | None = None
+    ) -> List[Tuple[int, int]]:
+        index = row * self.size + col
+        label = self.layout.zero_region[index] if self._is_valid_position(row, col) else -1
+        if label == -1 or self.states[index] != _HIDDEN:
+            return super()._reveal_cells_flood_fill(row, col, changed)
+
+        opening = self.layout.openings[label]
+        region_untouched = all(
+            self.states[cell] == _HIDDEN
+            or (self.states[cell] == _REVEALED and self.layout.zero_region[cell] != label)
+            for cell in opening
+        )
+        if not region_untouched:
+            # Flags or earlier partial openings inside the region, walk it cell by cell
+            return super()._reveal_cells_flood_fill(row, col, changed)
+
+        # The whole region and its border open at once, as the flood fill would
+        if changed is None:
+            changed = []
+        for cell in opening:
+            if self.states[cell] == _HIDDEN:
+                self.states[cell] = _REVEALED
+                self.revealed_count += 1
+                changed.append(divmod(cell, self.size))
+        return changed
+
+    def _finish_game_session(self):
+        super()._finish_game_session()
+        if self.user and self.game_state != GameState.PLAYING:
+            self._write(
+                "record_challenge_result",
+                challenge_id=self.challenge_id,
+                user_id=self.user.id,
+                result=self.game_state.value,
+                cells_revealed=self.revealed_count,
+                session_id=self.session_id,
+            )
@@ -0,0 +1,380 @@
+"""Append-only move journal for a game.
+
+Every accepted ``reveal``, ``flag`` and ``cheat`` is appended as a compact
+binary entry: action, cell index, milliseconds since the previous entry, the
+game state before and after, and the cells the move changed. The move that
+places the mines also carries the mine bitmap. The changed cells double as
+the reverse delta, so undo does not need a copy of the board; an undo is
+itself appended as an entry, which keeps the journal append-only and makes
+undos visible in replays.
+
+Keyframes, full snapshots of the board every ``KEYFRAME_INTERVAL`` entries,
+are built lazily so seeking to any move is a bisect plus at most that many
+entries of replay.
+"""
+
+import bisect
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from .model import CellState, GameState
+
+KEYFRAME_INTERVAL = 64
+JOURNAL_FORMAT_VERSION = 2
+
+ACTIONS = ("reveal", "flag", "cheat", "undo", "chord", "autoclear")
+_ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+_ACTION_MASK = 0x0F
+_HAS_LAYOUT = 0x80
+# Version 1 had two action bits and the layout flag right above them
+_V1_ACTION_MASK = 0x03
+_V1_HAS_LAYOUT = 0x04
+
+_STATE_CODES = {CellState.HIDDEN: 0, CellState.REVEALED: 1, CellState.FLAGGED: 2}
+_CODE_STATES = {code: state for state, code in _STATE_CODES.items()}
+_GAME_STATE_CODES = {GameState.PLAYING: 0, GameState.WON: 1, GameState.LOST: 2}
+_CODE_GAME_STATES = {code: state for state, code in _GAME_STATE_CODES.items()}
+
+HIDDEN = _STATE_CODES[CellState.HIDDEN]
+REVEALED = _STATE_CODES[CellState.REVEALED]
+FLAGGED = _STATE_CODES[CellState.FLAGGED]
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def pack_mines(mines: bytearray) -> bytes:
+    bitmap = bytearray((len(mines) + 7) // 8)
+    for index, is_mine in enumerate(mines):
+        if is_mine:
+            bitmap[index >> 3] |= 1 << (index & 7)
+    return bytes(bitmap)
+
+
+def unpack_mines(bitmap: bytes, cells: int) -> bytearray:
+    return bytearray((bitmap[index >> 3] >> (index & 7)) & 1 for index in range(cells))
+
+
+@dataclass
+class JournalEntry:
+    action: str
+    # Cell the move was made on; for an undo, the index of the undone entry
+    cell: int
+    elapsed_ms: int  # since the previous entry
+    prev_state: GameState
+    next_state: GameState
+    prev_first_click: bool
+    changed: Tuple[int, ...] = ()
+    layout: Optional[bytes] = None  # mine bitmap, when this move placed the mines
+
+    def encode(self) -> bytes:
+        out = bytearray()
+        out.append(_ACTION_CODES[self.action] | (_HAS_LAYOUT if self.layout is not None else 0))
+        out.append(
+            _GAME_STATE_CODES[self.prev_state]
+            | _GAME_STATE_CODES[self.next_state] << 2
+            | int(self.prev_first_click) << 4
+        )
+        _write_varint(out, self.cell)
+        _write_varint(out, self.elapsed_ms)
+        _write_varint(out, len(self.changed))
+        previous = 0
+        for index in sorted(self.changed):
+            _write_varint(out, index - previous)
+            previous = index
+        if self.layout is not None:
+            out += self.layout
+        return bytes(out)
+
+    @classmethod
+    def decode(
+        cls, data: bytes, offset: int, cells: int, format_version: int = JOURNAL_FORMAT_VERSION
+    ) -> Tuple["JournalEntry", int]:
+        flags, states = data[offset], data[offset + 1]
+        if format_version == 1:
+            action_mask, has_layout = _V1_ACTION_MASK, _V1_HAS_LAYOUT
+        else:
+            action_mask, has_layout = _ACTION_MASK, _HAS_LAYOUT
+        offset += 2
+        cell, offset = _read_varint(data, offset)
+        elapsed_ms, offset = _read_varint(data, offset)
+        count, offset = _read_varint(data, offset)
+        changed, index = [], 0
+        for _ in range(count):
+            delta, offset = _read_varint(data, offset)
+            index += delta
+            changed.append(index)
+        layout = None
+        if flags & has_layout:
+            size = (cells + 7) // 8
+            layout = bytes(data[offset:offset + size])
+            offset += size
+        entry = cls(
+            action=ACTIONS[flags & action_mask],
+            cell=cell,
+            elapsed_ms=elapsed_ms,
+            prev_state=_CODE_GAME_STATES[states & 0x03],
+            next_state=_CODE_GAME_STATES[(states >> 2) & 0x03],
+            prev_first_click=bool(states & 0x10),
+            changed=tuple(changed),
+            layout=layout,
+        )
+        return entry, offset
+
+
+@dataclass
+class JournalSnapshot:
+    """Board position reconstructed from the journal."""
+
+    size: int
+    mines: bytearray
+    states: bytearray  # one state code per cell
+    revealed_count: int = 0
+    flag_count: int = 0
+    game_state: GameState = GameState.PLAYING
+    first_click: bool = True
+
+    @classmethod
+    def empty(cls, size: int) -> "JournalSnapshot":
+        return cls(size, bytearray(size * size), bytearray(size * size))
+
+    @classmethod
+    def from_game(cls, game) -> "JournalSnapshot":
+        cells = [cell for row in game.board for cell in row]
+        return cls(
+            size=game.size,
+            mines=bytearray(int(cell.is_mine) for cell in cells),
+            states=bytearray(_STATE_CODES[cell.state] for cell in cells),
+            revealed_count=game.revealed_count,
+            flag_count=game.flag_count,
+            game_state=game.game_state,
+            first_click=game.first_click,
+        )
+
+    def copy(self) -> "JournalSnapshot":
+        return JournalSnapshot(
+            self.size, bytearray(self.mines), bytearray(self.states), self.revealed_count,
+            self.flag_count, self.game_state, self.first_click,
+        )
+
+    def cells_in(self, state: int) -> List[Tuple[int, int]]:
+        return [divmod(index, self.size) for index, code in enumerate(self.states) if code == state]
+
+    def encode(self) -> bytes:
+        out = bytearray()
+        for value in (self.size, self.revealed_count, self.flag_count):
+            _write_varint(out, value)
+        out.append(_GAME_STATE_CODES[self.game_state] | int(self.first_click) << 2)
+        out += zlib.compress(bytes(code | mine << 2 for code, mine in zip(self.states, self.mines)))
+        return bytes(out)
+
+    @classmethod
+    def decode(cls, data: bytes) -> "JournalSnapshot":
+        size, offset = _read_varint(data, 0)
+        revealed_count, offset = _read_varint(data, offset)
+        flag_count, offset = _read_varint(data, offset)
+        flags = data[offset]
+        packed = zlib.decompress(data[offset + 1:])
+        return cls(
+            size=size,
+            mines=bytearray(value >> 2 for value in packed),
+            states=bytearray(value & 0x03 for value in packed),
+            revealed_count=revealed_count,
+            flag_count=flag_count,
+            game_state=_CODE_GAME_STATES[flags & 0x03],
+            first_click=bool(flags & 0x04),
+        )
+
+    def apply(self, entry: JournalEntry, lookup: Callable[[int], JournalEntry]):
+        """Play ``entry`` forward; ``lookup`` finds the move an undo refers to."""
+        if entry.action == "undo":
+            self.revert(lookup(entry.cell))
+            return
+        if entry.layout is not None:
+            self.mines = unpack_mines(entry.layout, self.size * self.size)
+            self.first_click = False
+        if entry.action == "flag":
+            if self.states[entry.cell] == FLAGGED:
+                self.states[entry.cell] = HIDDEN
+                self.flag_count -= 1
+            else:
+                self.states[entry.cell] = FLAGGED
+                self.flag_count += 1
+        else:
+            for cell in entry.changed:
+                self.states[cell] = REVEALED
+                if not self.mines[cell]:
+                    self.revealed_count += 1
+        self.game_state = entry.next_state
+
+    def revert(self, entry: JournalEntry):
+        if entry.action == "flag":
+            if self.states[entry.cell] == FLAGGED:
+                self.states[entry.cell] = HIDDEN
+                self.flag_count -= 1
+            else:
+                self.states[entry.cell] = FLAGGED
+                self.flag_count += 1
+        else:
+            for cell in entry.changed:
+                self.states[cell] = HIDDEN
+                if not self.mines[cell]:
+                    self.revealed_count -= 1
+        if entry.layout is not None:
+            self.mines = bytearray(len(self.mines))
+        self.game_state = entry.prev_state
+        self.first_click = entry.prev_first_click
+
+
+class MoveJournal:
+    def __init__(self, size: int, initial: Optional[JournalSnapshot] = None):
+        self.size = size
+        self.initial = initial or JournalSnapshot.empty(size)
+        self._data = bytearray()
+        self._offsets: List[int] = []
+        self._undo_stack: List[int] = []
+        self._last_time = time.time()
+        # (entry count, snapshot after that many entries), sorted by count
+        self._keyframes: List[Tuple[int, JournalSnapshot]] = [(0, self.initial)]
+
+    def __getstate__(self):
+        # Keyframes are derived data, rebuild them instead of storing them
+        state = self.__dict__.copy()
+        state["_keyframes"] = [(0, self.initial)]
+        return state
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo_stack)
+
+    def entry(self, index: int) -> JournalEntry:
+        return JournalEntry.decode(self._data, self._offsets[index], self.size * self.size)[0]
+
+    def entries(self, start: int = 0) -> Iterator[JournalEntry]:
+        for index in range(start, len(self)):
+            yield self.entry(index)
+
+    def record(
+        self,
+        action: str,
+        row: int,
+        col: int,
+        prev_state: GameState,
+        next_state: GameState,
+        prev_first_click: bool,
+        changed: List[Tuple[int, int]] = (),
+        mines: Optional[bytearray] = None,
+    ):
+        entry = JournalEntry(
+            action=action,
+            cell=row * self.size + col,
+            elapsed_ms=self._elapsed_ms(),
+            prev_state=prev_state,
+            next_state=next_state,
+            prev_first_click=prev_first_click,
+            changed=tuple(r * self.size + c for r, c in changed),
+            layout=pack_mines(mines) if mines is not None else None,
+        )
+        self._undo_stack.append(len(self))
+        self._append(entry)
+
+    def record_undo(self, prev_state: GameState, prev_first_click: bool) -> JournalEntry:
+        """Append an undo of the latest undoable move and return that move."""
+        target = self._undo_stack.pop()
+        undone = self.entry(target)
+        self._append(JournalEntry(
+            action="undo",
+            cell=target,
+            elapsed_ms=self._elapsed_ms(),
+            prev_state=prev_state,
+            next_state=undone.prev_state,
+            prev_first_click=prev_first_click,
+        ))
+        return undone
+
+    def snapshot_at(self, count: int) -> JournalSnapshot:
+        """Board position after the first ``count`` entries."""
+        count = max(0, min(count, len(self)))
+        self._build_keyframes(count)
+        position = bisect.bisect_right(self._keyframes, count, key=lambda keyframe: keyframe[0]) - 1
+        start, keyframe = self._keyframes[position]
+        snapshot = keyframe.copy()
+        for index in range(start, count):
+            snapshot.apply(self.entry(index), self.entry)
+        return snapshot
+
+    def to_bytes(self) -> bytes:
+        out = bytearray()
+        _write_varint(out, JOURNAL_FORMAT_VERSION)
+        initial = self.initial.encode()
+        _write_varint(out, len(initial))
+        out += initial
+        out += self._data
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "MoveJournal":
+        version, offset = _read_varint(data, 0)
+        if version not in (1, JOURNAL_FORMAT_VERSION):
+            raise ValueError(f"Unsupported journal format version: {version}")
+        length, offset = _read_varint(data, offset)
+        initial = JournalSnapshot.decode(data[offset:offset + length])
+        journal = cls(initial.size, initial)
+        entries = data[offset + length:]
+        cells = initial.size * initial.size
+        position = 0
+        while position < len(entries):
+            entry, end = JournalEntry.decode(entries, position, cells, version)
+            if entry.action == "undo":
+                journal._undo_stack.pop()
+            else:
+                journal._undo_stack.append(len(journal))
+            if version == JOURNAL_FORMAT_VERSION:
+                journal._offsets.append(position)
+            else:
+                # Older entries are re-encoded so the journal holds one format
+                journal._append(entry)
+            position = end
+        if version == JOURNAL_FORMAT_VERSION:
+            journal._data = bytearray(entries)
+        return journal
+
+    def _append(self, entry: JournalEntry):
+        self._offsets.append(len(self._data))
+        self._data += entry.encode()
+
+    def _elapsed_ms(self) -> int:
+        now = time.time()
+        elapsed, self._last_time = now - self._last_time, now
+        return max(0, int(elapsed * 1000))
+
+    def _build_keyframes(self, count: int):
+        start, snapshot = self._keyframes[-1]
+        if start + KEYFRAME_INTERVAL > count:
+            return
+        snapshot = snapshot.copy()
+        for index in range(start, count):
+            snapshot.apply(self.entry(index), self.entry)
+            if (index + 1) % KEYFRAME_INTERVAL == 0:
+                self._keyframes.append((index + 1, snapshot.copy()))
+
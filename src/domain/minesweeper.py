@@ -1,10 +1,15 @@
 import itertools
-import json
 import random
-from typing import List, Optional, Set, Tuple
+from typing import TYPE_CHECKING, List, Optional, Set, Tuple
 
-from ..data.models import GameDatabase
+from ..profiling import timed
+from .journal import JournalSnapshot, MoveJournal
 from .model import Cell, CellInfo, CellState, GameState, GameStats
+from .save_format import decode_board, encode_board
+from .solver import analyze
+
+if TYPE_CHECKING:
+    from ..data.models import GameDatabase
 
 
 class MinesweeperGame:
@@ -13,7 +18,7 @@ class MinesweeperGame:
         size: int,
         difficulty: float = 0.15,
         username: str = "anonymous",
-        db: GameDatabase | None = None,
+        db: "GameDatabase | None" = None,
     ):
         if size < 3:
             raise ValueError("Board size must be at least 3")
@@ -28,9 +33,17 @@ class MinesweeperGame:
         self.first_click = True
         self.revealed_count = 0
         self.flag_count = 0
-
-        # Database integration
-        self.db = db or GameDatabase()
+        # Bumped on every change to the board or game state, lets callers
+        # cache anything derived from the board
+        self.version = 0
+        # Highest client sequence number applied, see web.server.sequenced_move
+        self.move_seq = 0
+
+        # Database integration, opened on first use (see ``db``)
+        self._db = db
+        self._db_path: Optional[str] = None
+        # Writes of moves held back until the move is known to stick, see defer_writes
+        self._deferred_writes: Optional[List[Tuple[str, tuple, dict]]] = None
         self.user = None
         self.session_id = None
 
@@ -39,10 +52,88 @@ class MinesweeperGame:
             self.session_id = self._create_game_session()
 
         self._initialize_board()
+        self.journal = MoveJournal(size)
+
+    @classmethod
+    def from_saved(cls, db: "GameDatabase", username: str, game_name: str) -> "MinesweeperGame | None":
+        """The user's saved game resumed in a new session, None if there is no such save.
+
+        Unlike ``MinesweeperGame(username=...)`` followed by ``load_game`` this
+        records no session for a game that is never played.
+        """
+        user = db.get_user_by_username(username)
+        if user is None:
+            return None
+        game = cls(9, db=db, username=None)
+        game.user = user
+        return game if game.load_game(game_name) else None
+
+    @property
+    def db(self) -> "GameDatabase":
+        # Imported and connected lazily: games without a user never touch the
+        # database, so they don't pay for loading SQLAlchemy
+        if self._db is None:
+            from ..data.models import GameDatabase
+
+            self._db = GameDatabase(self._db_path) if self._db_path else GameDatabase()
+        return self._db
+
+    @property
+    def db_connected(self) -> bool:
+        return self._db is not None
+
+    def __getstate__(self):
+        # The database session cannot be pickled; keep just enough to reconnect.
+        state = self.__dict__.copy()
+        del state["_db"], state["_db_path"], state["_deferred_writes"]
+        state["db"] = self._db.db_path if self._db is not None else self._db_path
+        state["user"] = self.user.username if self.user else None
+        return state
+
+    def __setstate__(self, state):
+        db_path = state.pop("db")
+        username = state.pop("user")
+        state.setdefault("version", 0)
+        state.setdefault("move_seq", 0)
+        self.__dict__.update(state)
+        self._db = None
+        self._db_path = db_path
+        self._deferred_writes = None
+        self.user = None
+        if username:
+            self.user = self.db.get_user_by_username(username)
+            # Shared stores unpickle a copy on every read, don't hold a connection for it
+            self._db.close()
+        if "journal" not in state:
+            # Stored before games kept a journal, start it from the current position
+            self.journal = MoveJournal(self.size, JournalSnapshot.from_game(self))
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+
+    def defer_writes(self):
+        """Queue the database writes of the following moves until ``flush_writes``."""
+        self._deferred_writes = []
+
+    def flush_writes(self, apply: bool = True):
+        """Run the queued writes, or drop them, and write straight away again."""
+        writes, self._deferred_writes = self._deferred_writes or [], None
+        if apply:
+            for method, args, kwargs in writes:
+                getattr(self.db, method)(*args, **kwargs)
+
+    def _write(self, method: str, *args, **kwargs):
+        """Call a ``GameDatabase`` write method, or queue it while writes are deferred."""
+        if self._deferred_writes is not None:
+            self._deferred_writes.append((method, args, kwargs))
+        else:
+            getattr(self.db, method)(*args, **kwargs)
 
     def _initialize_board(self):
         self.board = [[Cell() for _ in range(self.size)] for _ in range(self.size)]
 
+    @timed("engine.place_mines")
     def _place_mines(self, exclude_row: int, exclude_col: int):
         available_positions = [
             (row, col)
@@ -90,18 +181,22 @@ class MinesweeperGame:
         if cell.state != CellState.HIDDEN:
             return False
 
+        prev_state, prev_first_click = self.game_state, self.first_click
         if self.first_click:
             self._place_mines(row, col)
             self.first_click = False
 
+        self.version += 1
         if cell.is_mine:
             cell.state = CellState.REVEALED
             self.game_state = GameState.LOST
+            self._record_move("reveal", row, col, prev_state, prev_first_click, [(row, col)])
             self._finish_game_session()
             return True
 
-        self._reveal_cells_flood_fill(row, col)
+        changed = self._reveal_cells_flood_fill(row, col)
         self._check_win_condition()
+        self._record_move("reveal", row, col, prev_state, prev_first_click, changed)
         self._update_session_stats()
 
         if self.game_state == GameState.WON:
@@ -109,20 +204,112 @@ class MinesweeperGame:
 
         return True
 
-    def _reveal_cells_flood_fill(self, row: int, col: int):
-        if not self._is_valid_position(row, col):
-            return
+    @timed("engine.flood_fill")
+    def _reveal_cells_flood_fill(
+        self, row: int, col: int, changed: List[Tuple[int, int]] | None = None
+    ) -> List[Tuple[int, int]]:
+        """Reveal a cell and, for zeros, its neighbours; returns the cells revealed.
+
+        Uses an explicit stack, an open area of a large board is deeper than
+        the recursion limit. Cells come out in depth-first order.
+        """
+        if changed is None:
+            changed = []
+        stack = [(row, col)]
+        while stack:
+            row, col = stack.pop()
+            if not self._is_valid_position(row, col):
+                continue
+
+            cell = self.board[row][col]
+            if cell.state != CellState.HIDDEN or cell.is_mine:
+                continue
+
+            cell.state = CellState.REVEALED
+            self.revealed_count += 1
+            changed.append((row, col))
+
+            if cell.adjacent_mines == 0:
+                stack.extend(reversed(self._get_neighbors(row, col)))
+        return changed
+
+    def chord(self, row: int, col: int) -> List[Tuple[int, int]] | None:
+        """Reveal every hidden neighbour of a number whose flags are all placed.
+
+        Returns the cells revealed, or None if the chord is not allowed. Wrong
+        flags make the chord hit a mine, just like clicking the cells would.
+        """
+        if self.game_state != GameState.PLAYING or not self._is_valid_position(row, col):
+            return None
 
         cell = self.board[row][col]
-        if cell.state != CellState.HIDDEN or cell.is_mine:
-            return
+        if cell.state != CellState.REVEALED or cell.is_mine or cell.adjacent_mines == 0:
+            return None
+
+        neighbors = self._get_neighbors(row, col)
+        flags = sum(1 for nr, nc in neighbors if self.board[nr][nc].state == CellState.FLAGGED)
+        hidden = [(nr, nc) for nr, nc in neighbors if self.board[nr][nc].state == CellState.HIDDEN]
+        if flags != cell.adjacent_mines or not hidden:
+            return None
 
-        cell.state = CellState.REVEALED
-        self.revealed_count += 1
+        self.version += 1
+        changed = self._reveal_many(hidden)
+        self._record_move("chord", row, col, GameState.PLAYING, False, changed)
+        self._finish_move()
+        return changed
 
-        if cell.adjacent_mines == 0:
-            for nr, nc in self._get_neighbors(row, col):
-                self._reveal_cells_flood_fill(nr, nc)
+    def auto_clear(self) -> List[Tuple[int, int]] | None:
+        """Reveal every cell the visible numbers prove safe, until none are left.
+
+        Flagged cells are left alone even when provably safe. All reveals are
+        one move and one database update. Returns the cells revealed, or None
+        if nothing could be cleared.
+        """
+        if self.game_state != GameState.PLAYING or self.first_click:
+            return None
+
+        changed: List[Tuple[int, int]] = []
+        while self.game_state == GameState.PLAYING:
+            safe = [
+                (row, col) for row, col in sorted(analyze(self).safe)
+                if self.board[row][col].state == CellState.HIDDEN
+            ]
+            if not safe:
+                break
+            self._reveal_many(safe, changed)
+
+        if not changed:
+            return None
+
+        self.version += 1
+        self._record_move("autoclear", *changed[0], GameState.PLAYING, False, changed)
+        self._finish_move()
+        return changed
+
+    def _reveal_many(
+        self, cells: List[Tuple[int, int]], changed: List[Tuple[int, int]] | None = None
+    ) -> List[Tuple[int, int]]:
+        """Reveal several cells with the normal rules, stopping at a mine."""
+        if changed is None:
+            changed = []
+        for row, col in cells:
+            cell = self.board[row][col]
+            if cell.state != CellState.HIDDEN:
+                continue
+            if cell.is_mine:
+                cell.state = CellState.REVEALED
+                self.game_state = GameState.LOST
+                changed.append((row, col))
+                return changed
+            self._reveal_cells_flood_fill(row, col, changed)
+        self._check_win_condition()
+        return changed
+
+    def _finish_move(self):
+        if self.game_state == GameState.PLAYING:
+            self._update_session_stats()
+        else:
+            self._finish_game_session()
 
     def toggle_flag(self, row: int, col: int) -> bool:
         if not self._is_valid_position(row, col):
@@ -140,9 +327,67 @@ class MinesweeperGame:
             cell.state = CellState.HIDDEN
             self.flag_count -= 1
 
+        self.version += 1
+        self._record_move("flag", row, col, self.game_state, self.first_click)
+        self._update_session_stats()
+        return True
+
+    def undo(self) -> bool:
+        """Take back the latest move that has not been undone yet.
+
+        Only games in progress can be undone, finished games are already
+        recorded in the player's statistics.
+        """
+        if self.game_state != GameState.PLAYING or not self.journal.can_undo:
+            return False
+
+        move = self.journal.record_undo(self.game_state, self.first_click)
+        if move.action == "flag":
+            row, col = divmod(move.cell, self.size)
+            cell = self.board[row][col]
+            if cell.state == CellState.FLAGGED:
+                cell.state = CellState.HIDDEN
+                self.flag_count -= 1
+            else:
+                cell.state = CellState.FLAGGED
+                self.flag_count += 1
+        else:
+            for index in move.changed:
+                row, col = divmod(index, self.size)
+                cell = self.board[row][col]
+                cell.state = CellState.HIDDEN
+                if not cell.is_mine:
+                    self.revealed_count -= 1
+
+        if move.layout is not None:
+            # The move placed the mines, the next first click places them again
+            for row in self.board:
+                for cell in row:
+                    cell.is_mine = False
+                    cell.adjacent_mines = 0
+
+        self.game_state = move.prev_state
+        self.first_click = move.prev_first_click
+        self.version += 1
         self._update_session_stats()
         return True
 
+    def _record_move(
+        self,
+        action: str,
+        row: int,
+        col: int,
+        prev_state: GameState,
+        prev_first_click: bool,
+        changed: List[Tuple[int, int]] = (),
+    ):
+        mines = None
+        if prev_first_click and not self.first_click:
+            mines = bytearray(int(cell.is_mine) for board_row in self.board for cell in board_row)
+        self.journal.record(
+            action, row, col, prev_state, self.game_state, prev_first_click, changed, mines
+        )
+
     def _is_valid_position(self, row: int, col: int) -> bool:
         return 0 <= row < self.size and 0 <= col < self.size
 
@@ -187,6 +432,8 @@ class MinesweeperGame:
         self.first_click = True
         self.revealed_count = 0
         self.flag_count = 0
+        self.version += 1
+        self.journal = MoveJournal(self.size)
 
         # Create new session if user is logged in
         if self.user:
@@ -218,7 +465,8 @@ class MinesweeperGame:
 
     def _update_session_stats(self):
         if self.session_id:
-            self.db.update_game_session(
+            self._write(
+                "update_game_session",
                 self.session_id,
                 cells_revealed=self.revealed_count,
                 flags_used=self.flag_count,
@@ -227,28 +475,22 @@ class MinesweeperGame:
     def _finish_game_session(self):
         if self.session_id and self.game_state != GameState.PLAYING:
             result = "won" if self.game_state == GameState.WON else "lost"
-            self.db.finish_game_session(
-                self.session_id, result, self.revealed_count, self.flag_count
+            self._write(
+                "finish_game_session", self.session_id, result, self.revealed_count, self.flag_count
+            )
+            self._save_journal()
+
+    def _save_journal(self):
+        if self.session_id:
+            self._write(
+                "save_game_journal", self.session_id, self.journal.to_bytes(), len(self.journal)
             )
 
     def save_game(self, game_name: str) -> bool:
         if not self.user:
             return False
 
-        # Serialize board state
-        board_data = {
-            "board": [
-                [
-                    {
-                        "is_mine": cell.is_mine,
-                        "state": cell.state.value,
-                        "adjacent_mines": cell.adjacent_mines,
-                    }
-                    for cell in row
-                ]
-                for row in self.board
-            ]
-        }
+        board_data = encode_board(self.board)
 
         self.db.save_game(
             user_id=self.user.id,
@@ -262,6 +504,7 @@ class MinesweeperGame:
             flag_count=self.flag_count,
             first_click=self.first_click,
         )
+        self._save_journal()
         return True
 
     def load_game(self, game_name: str) -> bool:
@@ -281,19 +524,11 @@ class MinesweeperGame:
         self.flag_count = saved_game.flag_count
         self.first_click = saved_game.first_click
 
-        # Deserialize board state
-        board_data = json.loads(saved_game.board_data)
-        self.board = []
-        for row_data in board_data["board"]:
-            row = []
-            for cell_data in row_data:
-                cell = Cell(
-                    is_mine=cell_data["is_mine"],
-                    state=CellState(cell_data["state"]),
-                    adjacent_mines=cell_data["adjacent_mines"],
-                )
-                row.append(cell)
-            self.board.append(row)
+        # Adjacent mine counts are not part of the save, derive them again
+        self.board = decode_board(saved_game.board_data)
+        self._calculate_adjacent_mines()
+        self.version += 1
+        self.journal = MoveJournal(self.size, JournalSnapshot.from_game(self))
 
         # Create new session for loaded game
         if self.game_state == GameState.PLAYING:
@@ -328,6 +563,7 @@ class MinesweeperGame:
         """
         if self.game_state != GameState.PLAYING:
             return None
+        prev_first_click = self.first_click
 
         # Find all hidden cells that are not mines
         safe_hidden_cells = []
@@ -362,8 +598,10 @@ class MinesweeperGame:
         row, col = random.choice(safe_hidden_cells)
         
         # Reveal the cell using flood fill
-        self._reveal_cells_flood_fill(row, col)
+        self.version += 1
+        changed = self._reveal_cells_flood_fill(row, col)
         self._check_win_condition()
+        self._record_move("cheat", row, col, GameState.PLAYING, prev_first_click, changed)
         self._update_session_stats()
 
         if self.game_state == GameState.WON:
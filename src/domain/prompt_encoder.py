@@ -0,0 +1,124 @@
+"""Board encodings used in the AI assistant's system prompt.
+
+``json`` is the original per-cell dump. ``grid`` draws the visible board as
+ASCII rows and lists mines separately, ``frontier`` only describes the cells
+next to revealed numbers plus the solver's deductions. The compact encodings
+are assembled from prioritised sections and trimmed to a token budget.
+"""
+
+import json
+from typing import Iterable, List, Tuple
+
+from .model import CellState
+from .solver import analyze
+
+PROMPT_ENCODINGS = ("grid", "frontier", "json")
+
+GRID_LEGEND = "# hidden, F flagged, . empty, 1-8 adjacent mines, * exploded mine"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, about four characters per token for this kind of text."""
+    return (len(text) + 3) // 4
+
+
+def _positions(cells: Iterable[Tuple[int, int]]) -> str:
+    return " ".join(f"{r},{c}" for r, c in sorted(cells)) or "none"
+
+
+def _cell_symbol(cell) -> str:
+    if cell.state == CellState.FLAGGED:
+        return "F"
+    if cell.state == CellState.HIDDEN:
+        return "#"
+    if cell.is_mine:
+        return "*"
+    return str(cell.adjacent_mines) if cell.adjacent_mines else "."
+
+
+def encode_grid(game) -> str:
+    header = "    " + "".join(str(col % 10) for col in range(game.size))
+    rows = [
+        f"{row:>3} " + "".join(_cell_symbol(cell) for cell in game.board[row])
+        for row in range(game.size)
+    ]
+    return "\n".join([header] + rows)
+
+
+def encode_json(game) -> str:
+    board_info = []
+    for row in range(game.size):
+        row_info = []
+        for col in range(game.size):
+            cell = game.board[row][col]
+            cell_info = {
+                "position": f"({row},{col})",
+                "state": cell.state.value,
+                "is_mine": cell.is_mine,
+                "adjacent_mines": cell.adjacent_mines if not cell.is_mine else None,
+                "visible_to_user": cell.state == CellState.REVEALED
+            }
+            row_info.append(cell_info)
+        board_info.append(row_info)
+    return json.dumps(board_info, indent=2)
+
+
+def _mine_positions(game) -> List[Tuple[int, int]]:
+    return [
+        (row, col)
+        for row in range(game.size)
+        for col in range(game.size)
+        if game.board[row][col].is_mine
+    ]
+
+
+def board_sections(game, encoding: str) -> List[Tuple[int, str, str]]:
+    """Build ``(priority, title, body)`` sections, lower priority is kept longer."""
+    if encoding == "json":
+        return [(0, "COMPLETE BOARD INFORMATION (HIDDEN FROM PLAYER)", encode_json(game))]
+
+    analysis = analyze(game)
+    facts = (
+        f"Provably safe (from visible numbers): {_positions(analysis.safe)}\n"
+        f"Provably mines (from visible numbers): {_positions(analysis.mines)}"
+    )
+    sections = [(1, "SOLVER FACTS (row,col)", facts)]
+
+    if encoding == "frontier":
+        constraints = "\n".join(
+            f"{_positions([constraint.cell])}={constraint.count}: {_positions(constraint.unknown)}"
+            for constraint in sorted(analysis.constraints, key=lambda c: c.cell)
+        )
+        sections.append((2, "VISIBLE NUMBERS -> UNREVEALED NEIGHBORS", constraints or "none"))
+        frontier_mines = [p for p in analysis.frontier if game.board[p[0]][p[1]].is_mine]
+        sections.append(
+            (3, "MINES ON THE FRONTIER (HIDDEN FROM PLAYER)", _positions(frontier_mines))
+        )
+    else:
+        sections.append((2, f"VISIBLE BOARD ({GRID_LEGEND})", encode_grid(game)))
+        sections.append(
+            (3, "ALL MINE POSITIONS (HIDDEN FROM PLAYER)", _positions(_mine_positions(game)))
+        )
+    return sections
+
+
+def fit_sections(sections: List[Tuple[int, str, str]], max_tokens: int | None) -> str:
+    """Join sections, dropping and then truncating by priority to fit the budget."""
+    def render(parts):
+        return "\n\n".join(f"{title}:\n{body}" for _, title, body in parts)
+
+    kept = sorted(sections, key=lambda section: section[0])
+    text = render(kept)
+    if max_tokens is None:
+        return text
+
+    while len(kept) > 1 and estimate_tokens(text) > max_tokens:
+        kept.pop()
+        text = render(kept)
+
+    if estimate_tokens(text) > max_tokens:
+        priority, title, body = kept[-1]
+        allowed = max(0, max_tokens * 4 - len(render(kept[:-1])) - len(title) - 20)
+        kept[-1] = (priority, title, body[:allowed] + "\n[truncated]")
+        text = render(kept)
+    return text
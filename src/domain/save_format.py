@@ -0,0 +1,125 @@
+"""Encoding of saved boards stored in ``SavedGame.board_data``.
+
+Version 1 is the original JSON document with one dict per cell. Version 2
+packs a mine bitmap and a 2-bit state plane, compresses them and stores the
+result as ``"v2:" + base64``. Adjacent mine counts are not stored, callers
+recompute them after decoding.
+"""
+
+import base64
+import json
+import struct
+import zlib
+from typing import List
+
+from .model import Cell, CellState
+
+SAVE_FORMAT_VERSION = 2
+
+_V2_PREFIX = "v2:"
+_V2_HEADER = struct.Struct(">H")  # board size
+
+_STATE_CODES = {CellState.HIDDEN: 0, CellState.REVEALED: 1, CellState.FLAGGED: 2}
+_CODE_STATES = {code: state for state, code in _STATE_CODES.items()}
+
+
+def save_format_version(board_data: str) -> int:
+    if board_data.startswith(_V2_PREFIX):
+        return 2
+    if board_data.lstrip().startswith("{"):
+        return 1
+    raise ValueError("Unknown saved board format")
+
+
+def encode_board(board: List[List[Cell]]) -> str:
+    """Encode a board using the current save format."""
+    size = len(board)
+    cells = [cell for row in board for cell in row]
+
+    mines = bytearray((len(cells) + 7) // 8)
+    states = bytearray((len(cells) + 3) // 4)
+    for index, cell in enumerate(cells):
+        if cell.is_mine:
+            mines[index >> 3] |= 1 << (index & 7)
+        states[index >> 2] |= _STATE_CODES[cell.state] << ((index & 3) * 2)
+
+    payload = zlib.compress(_V2_HEADER.pack(size) + mines + states, 9)
+    return _V2_PREFIX + base64.b64encode(payload).decode("ascii")
+
+
+def decode_board(board_data: str) -> List[List[Cell]]:
+    """Decode a board saved in any supported format.
+
+    ``adjacent_mines`` is left at 0 for every cell.
+    """
+    version = save_format_version(board_data)
+    if version == 1:
+        return _decode_v1(board_data)
+    return _decode_v2(board_data)
+
+
+def _decode_v1(board_data: str) -> List[List[Cell]]:
+    return [
+        [
+            Cell(is_mine=cell_data["is_mine"], state=CellState(cell_data["state"]))
+            for cell_data in row_data
+        ]
+        for row_data in json.loads(board_data)["board"]
+    ]
+
+
+def _decode_v2(board_data: str) -> List[List[Cell]]:
+    payload = zlib.decompress(base64.b64decode(board_data[len(_V2_PREFIX):]))
+    (size,) = _V2_HEADER.unpack_from(payload)
+    cell_count = size * size
+    mines_start = _V2_HEADER.size
+    states_start = mines_start + (cell_count + 7) // 8
+    mines = payload[mines_start:states_start]
+    states = payload[states_start:]
+
+    board = []
+    for row in range(size):
+        row_cells = []
+        for col in range(size):
+            index = row * size + col
+            row_cells.append(
+                Cell(
+                    is_mine=bool(mines[index >> 3] >> (index & 7) & 1),
+                    state=_CODE_STATES[states[index >> 2] >> ((index & 3) * 2) & 3],
+                )
+            )
+        board.append(row_cells)
+    return board
+
+
+def migrate_saved_games(db, batch_size: int = 100) -> int:
+    """Re-encode every saved game that is not in the current format.
+
+    Saves are read ``batch_size`` at a time by id; each batch is committed
+    and dropped from the session before the next one is read, so neither
+    the transaction nor the session grows with the table.
+
+    Returns the number of migrated saves.
+    """
+    from ..data.models import SavedGame
+
+    migrated = 0
+    last_id = 0
+    while True:
+        batch = (
+            db.session.query(SavedGame)
+            .filter(SavedGame.id > last_id)
+            .order_by(SavedGame.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            return migrated
+        last_id = batch[-1].id
+        for saved_game in batch:
+            if save_format_version(saved_game.board_data) == SAVE_FORMAT_VERSION:
+                continue
+            saved_game.board_data = encode_board(decode_board(saved_game.board_data))
+            migrated += 1
+        db.session.commit()
+        db.session.expunge_all()
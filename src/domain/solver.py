@@ -0,0 +1,109 @@
+"""Deterministic deductions from the part of the board a player can see.
+
+Only revealed numbers are trusted. Flags are player guesses, so flagged cells
+are treated like any other unrevealed cell.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, Tuple
+
+from .model import CellState
+
+Position = Tuple[int, int]
+
+
+@dataclass
+class Constraint:
+    """A revealed number and the unrevealed neighbors it counts mines among."""
+
+    cell: Position
+    count: int
+    unknown: Set[Position]
+
+
+@dataclass
+class BoardAnalysis:
+    constraints: List[Constraint] = field(default_factory=list)
+    frontier: Set[Position] = field(default_factory=set)
+    safe: Set[Position] = field(default_factory=set)
+    mines: Set[Position] = field(default_factory=set)
+
+
+def visible_constraints(game) -> List[Constraint]:
+    constraints = []
+    for row in range(game.size):
+        for col in range(game.size):
+            cell = game.board[row][col]
+            if cell.state != CellState.REVEALED or cell.is_mine:
+                continue
+            unknown = {
+                (nr, nc)
+                for nr, nc in game._get_neighbors(row, col)
+                if game.board[nr][nc].state != CellState.REVEALED
+            }
+            if unknown:
+                constraints.append(Constraint((row, col), cell.adjacent_mines, unknown))
+    return constraints
+
+
+def analyze(game) -> BoardAnalysis:
+    """Find unrevealed cells that are provably safe or provably mines.
+
+    Applies the single-constraint rule (a number already satisfied or fully
+    saturated) and the subset rule between overlapping constraints until
+    nothing new can be deduced.
+    """
+    constraints = visible_constraints(game)
+    analysis = BoardAnalysis(constraints=constraints)
+    for constraint in constraints:
+        analysis.frontier |= constraint.unknown
+
+    # Working copies: (remaining unknown cells, mines still unaccounted for)
+    open_constraints: List[Tuple[Set[Position], int]] = [
+        (set(c.unknown), c.count) for c in constraints
+    ]
+
+    changed = True
+    while changed:
+        changed = False
+        reduced = []
+        for unknown, count in open_constraints:
+            count -= len(unknown & analysis.mines)
+            unknown = unknown - analysis.mines - analysis.safe
+            if not unknown:
+                continue
+            if count == 0:
+                analysis.safe |= unknown
+                changed = True
+            elif count == len(unknown):
+                analysis.mines |= unknown
+                changed = True
+            else:
+                reduced.append((unknown, count))
+        open_constraints = reduced
+        if changed:
+            continue
+
+        by_cell: Dict[Position, List[int]] = {}
+        for index, (unknown, _) in enumerate(open_constraints):
+            for position in unknown:
+                by_cell.setdefault(position, []).append(index)
+
+        for index, (unknown, count) in enumerate(open_constraints):
+            neighbors = {j for position in unknown for j in by_cell[position] if j != index}
+            for j in neighbors:
+                other, other_count = open_constraints[j]
+                if not unknown < other:
+                    continue
+                rest = other - unknown
+                rest_count = other_count - count
+                if rest_count == 0:
+                    analysis.safe |= rest
+                    changed = True
+                elif rest_count == len(rest):
+                    analysis.mines |= rest
+                    changed = True
+            if changed:
+                break
+
+    return analysis
@@ -0,0 +1,119 @@
+"""Memory accounting for live objects.
+
+``deep_sizeof`` walks an object graph and adds up ``sys.getsizeof`` of every
+object reachable from it once. Classes, modules, functions and enum members
+are shared by everything and never counted, callers pass the ids of other
+shared objects (a challenge layout, a connection pool) in ``shared``.
+
+``AllocationTracker`` compares tracemalloc snapshots between two calls, to
+see which lines allocated what in between. Tracing slows every allocation
+down, so it only runs between ``diff`` and ``stop``.
+"""
+
+import gc
+import sys
+import tracemalloc
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+from typing import AbstractSet, List, Optional
+
+_OPAQUE = (type, ModuleType, FunctionType, BuiltinFunctionType, MethodType, Enum)
+_ATOMIC = (str, bytes, bytearray, memoryview, int, float, complex, bool, type(None), range)
+_CONTAINERS = (list, tuple, set, frozenset, deque)
+
+# SQLAlchemy bookkeeping points at mappers shared by every row
+SKIPPED_ATTRIBUTES = frozenset({"_sa_instance_state"})
+
+
+def deep_sizeof(
+    obj, shared: AbstractSet[int] = frozenset(), skip: AbstractSet[str] = SKIPPED_ATTRIBUTES
+) -> int:
+    """Bytes held by ``obj`` and everything it references, each object once.
+
+    Objects whose id is in ``shared`` and attributes named in ``skip`` are
+    left out, with everything only reachable through them.
+    """
+    seen = set(shared)
+    stack = [obj]
+    total = 0
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _OPAQUE):
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+
+        if isinstance(current, _ATOMIC):
+            continue
+        if isinstance(current, dict):
+            for key, value in current.items():
+                if key not in skip:
+                    stack.append(key)
+                    stack.append(value)
+        elif isinstance(current, _CONTAINERS):
+            stack.extend(current)
+        else:
+            # get_referents reads attributes without materializing the
+            # __dict__ of objects that keep their values inline
+            skipped = {id(getattr(current, name)) for name in skip if hasattr(current, name)}
+            stack.extend(ref for ref in gc.get_referents(current) if id(ref) not in skipped)
+    return total
+
+
+@dataclass
+class AllocationDiff:
+    location: str
+    size: int
+    size_diff: int
+    count_diff: int
+
+
+class AllocationTracker:
+    def __init__(self, frames: int = 1):
+        self.frames = frames
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def tracing(self) -> bool:
+        return self._baseline is not None
+
+    def diff(self, top: int = 10) -> List[AllocationDiff]:
+        """Allocations that grew the most since the previous call.
+
+        The first call starts tracing and returns nothing.
+        """
+        if not self.tracing:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+            self._baseline = self._snapshot()
+            return []
+
+        snapshot = self._snapshot()
+        stats = snapshot.compare_to(self._baseline, "lineno")
+        self._baseline = snapshot
+        stats.sort(key=lambda stat: abs(stat.size_diff), reverse=True)
+        return [
+            AllocationDiff(
+                location=f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                size=stat.size,
+                size_diff=stat.size_diff,
+                count_diff=stat.count_diff,
+            )
+            for stat in stats[:top]
+        ]
+
+    def traced_memory(self) -> Optional[int]:
+        return tracemalloc.get_traced_memory()[0] if self.tracing else None
+
+    def stop(self):
+        self._baseline = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
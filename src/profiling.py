@@ -0,0 +1,340 @@
+"""Opt-in profiling of slow requests.
+
+``ProfilingMiddleware`` traces every request while profiling is enabled and
+keeps the traces of requests slower than ``slow_ms`` in a bounded ring
+buffer. A trace holds:
+
+- timing spans: ``span`` / ``timed`` mark the engine and database hot paths
+  and cost a context variable lookup when nothing is being traced. Self
+  time is recorded per span path, recursive calls count as one span,
+- stack samples taken every ``interval`` seconds (``mode="sample"``) or a
+  cProfile run (``mode="cprofile"``) of the threads doing the request's
+  blocking work. Handlers run in the thread pool, sampling the event loop
+  would only show it waiting, so the worker enters ``profile_thread`` (or
+  runs the work through ``Profiler.call``) while the request is traced.
+
+Traces export as folded stacks (``frame;frame;frame weight`` per line), the
+input format of flamegraph.pl, speedscope and most flame graph viewers, and
+cProfile runs also as a ``pstats`` dump.
+
+Enable it with ``MINESWEEPER_PROFILE_SLOW_MS=<threshold>`` or by calling
+``PROFILER.configure``.
+"""
+
+import cProfile
+import functools
+import inspect
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+PROFILE_ENV = "MINESWEEPER_PROFILE_SLOW_MS"
+PROFILE_MODES = ("sample", "cprofile")
+
+# Deepest stack kept per sample, frames above it are dropped
+MAX_STACK_DEPTH = 128
+
+
+@dataclass
+class RequestTrace:
+    label: str
+    started_at: datetime = field(default_factory=datetime.now)
+    trace_id: int = 0
+    status: int = 0
+    duration_ms: float = 0.0
+    mode: str = "sample"
+    # span path -> [self time ns, calls]
+    spans: Dict[Tuple[str, ...], List[int]] = field(default_factory=dict)
+    # folded stack -> samples
+    samples: Counter = field(default_factory=Counter)
+    pstats: Optional[bytes] = None
+    _open: List[list] = field(default_factory=list, repr=False)
+    _profiles: List[cProfile.Profile] = field(default_factory=list, repr=False)
+
+    def enter(self, name: str):
+        self._open.append([name, time.perf_counter_ns(), 0])
+
+    def exit(self):
+        name, start, children = self._open.pop()
+        elapsed = time.perf_counter_ns() - start
+        path = tuple(entry[0] for entry in self._open) + (name,)
+        totals = self.spans.setdefault(path, [0, 0])
+        totals[0] += elapsed - children
+        totals[1] += 1
+        if self._open:
+            self._open[-1][2] += elapsed
+
+    def span_summary(self) -> Dict[str, Dict[str, float]]:
+        """Per span name, total self time in ms and number of calls."""
+        summary: Dict[str, Dict[str, float]] = {}
+        for path, (self_ns, calls) in self.spans.items():
+            entry = summary.setdefault(path[-1], {"ms": 0.0, "calls": 0})
+            entry["ms"] += self_ns / 1e6
+            entry["calls"] += calls
+        return summary
+
+    def folded(self, source: str = "samples") -> str:
+        """Folded stacks rooted at the request label.
+
+        ``samples`` are weighted by sample count, ``spans`` by self time in µs.
+        """
+        if source == "spans":
+            lines = (
+                (";".join((self.label, *path)), self_ns // 1000)
+                for path, (self_ns, _) in self.spans.items()
+            )
+        else:
+            lines = ((f"{self.label};{stack}", count) for stack, count in self.samples.items())
+        return "".join(f"{stack} {weight}\n" for stack, weight in sorted(lines) if weight)
+
+
+_ACTIVE: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a block as part of the request being traced, if any."""
+    trace = _ACTIVE.get()
+    # Recursive calls are folded into the outermost one
+    if trace is None or (trace._open and trace._open[-1][0] == name):
+        yield
+        return
+    trace.enter(name)
+    try:
+        yield
+    finally:
+        trace.exit()
+
+
+def timed(name: str) -> Callable:
+    """Decorator form of ``span`` for plain and async functions."""
+
+    def decorate(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _ACTIVE.get() is None:
+                    return await func(*args, **kwargs)
+                with span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _ACTIVE.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _fold_stack(frame) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _StackSampler(threading.Thread):
+    """One thread sampling the stacks of every thread registered with it.
+
+    It sleeps while no thread is registered.
+    """
+
+    def __init__(self, interval: float):
+        super().__init__(name="request-sampler", daemon=True)
+        self.interval = interval
+        self._threads: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def add(self, thread_id: int, samples: Counter):
+        with self._lock:
+            self._threads[thread_id] = samples
+            self._wake.set()
+
+    def remove(self, thread_id: int):
+        # Under the lock, no sample lands in the counter once this returns
+        with self._lock:
+            self._threads.pop(thread_id, None)
+
+    def run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._threads:
+                    self._wake.clear()
+                    continue
+                frames = sys._current_frames()
+                for thread_id, samples in self._threads.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[_fold_stack(frame)] += 1
+
+
+class Profiler:
+    def __init__(
+        self,
+        slow_ms: Optional[float] = None,
+        mode: str = "sample",
+        interval: float = 0.002,
+        max_traces: int = 50,
+    ):
+        self.slow_ms = slow_ms
+        self.mode = mode
+        self.interval = interval
+        self.traces: Deque[RequestTrace] = deque(maxlen=max_traces)
+        self.traced = 0
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._sampler: Optional[_StackSampler] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.slow_ms is not None
+
+    def configure(
+        self,
+        slow_ms: Optional[float],
+        mode: Optional[str] = None,
+        interval: Optional[float] = None,
+        max_traces: Optional[int] = None,
+    ):
+        """Set the threshold (None disables profiling) and capture options."""
+        if mode is not None and mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.slow_ms = slow_ms
+        self.mode = mode or self.mode
+        self.interval = interval or self.interval
+        if self._sampler is not None:
+            self._sampler.interval = self.interval
+        if max_traces is not None:
+            with self._lock:
+                self.traces = deque(self.traces, maxlen=max_traces)
+
+    @contextmanager
+    def trace(self, label: str) -> Iterator[RequestTrace]:
+        """Trace the block; keep the trace if it took longer than ``slow_ms``.
+
+        Records spans, samples come from the threads in ``profile_thread``.
+        """
+        trace = RequestTrace(label, mode=self.mode)
+        token = _ACTIVE.set(trace)
+        start = time.perf_counter()
+        try:
+            yield trace
+        finally:
+            trace.duration_ms = (time.perf_counter() - start) * 1000
+            _ACTIVE.reset(token)
+
+            self.traced += 1
+            if self.slow_ms is not None and trace.duration_ms >= self.slow_ms:
+                if trace._profiles:
+                    stats = pstats.Stats(trace._profiles[0])
+                    for profile in trace._profiles[1:]:
+                        stats.add(profile)
+                    trace.pstats = marshal.dumps(stats.stats)
+                self._keep(trace)
+
+    @contextmanager
+    def profile_thread(self) -> Iterator[None]:
+        """Sample or cProfile the calling thread into the request being traced, if any."""
+        trace = _ACTIVE.get()
+        if trace is None:
+            yield
+            return
+
+        if trace.mode == "cprofile":
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:  # another thread is being profiled, spans only
+                yield
+                return
+            try:
+                yield
+            finally:
+                profile.disable()
+                trace._profiles.append(profile)
+            return
+
+        thread_id = threading.get_ident()
+        with self._lock:
+            if self._sampler is None:
+                self._sampler = _StackSampler(self.interval)
+                self._sampler.start()
+            sampler = self._sampler
+        sampler.add(thread_id, trace.samples)
+        try:
+            yield
+        finally:
+            sampler.remove(thread_id)
+
+    def call(self, func: Callable, *args, **kwargs):
+        """Call ``func`` with the calling thread profiled, see ``profile_thread``."""
+        with self.profile_thread():
+            return func(*args, **kwargs)
+
+    def _keep(self, trace: RequestTrace):
+        with self._lock:
+            trace.trace_id = self._next_id
+            self._next_id += 1
+            self.traces.append(trace)
+
+    def get(self, trace_id: int) -> Optional[RequestTrace]:
+        with self._lock:
+            return next((trace for trace in self.traces if trace.trace_id == trace_id), None)
+
+    def clear(self):
+        with self._lock:
+            self.traces.clear()
+
+
+def _slow_ms_from_env() -> Optional[float]:
+    value = os.environ.get(PROFILE_ENV)
+    return float(value) if value else None
+
+
+PROFILER = Profiler(slow_ms=_slow_ms_from_env())
+
+
+class ProfilingMiddleware:
+    def __init__(self, app, profiler: Profiler = PROFILER):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        with self.profiler.trace(f"{scope['method']} {scope['path']}") as trace:
+
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    trace.status = message["status"]
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
@@ -0,0 +1,311 @@
+"""Admission control for the expensive endpoints.
+
+Creating games allocates a board and an engine, chatting holds an LLM call
+open for seconds. ``AdmissionMiddleware`` guards each class of such
+endpoints with:
+
+- a token bucket per client address, holding ``ADDRESS_CLIENTS`` clients'
+  worth of tokens, so that rotating usernames does not buy a fresh quota,
+- on top of it a token bucket per client, keyed by the ``username`` or
+  ``session_id`` of the request body, or the address when there is neither,
+- a concurrency gate shared by all clients: ``concurrency`` requests run at
+  once, up to ``max_queue`` more wait for a slot for ``queue_timeout``
+  seconds.
+
+Requests over a limit are answered ``429 Too Many Requests`` with a
+``Retry-After`` header. Other paths pass through untouched, so moves never
+pay for any of this.
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+import msgspec
+from lihil import HTTPException
+from lihil.problems import ErrorResponse
+
+# Bodies are read to find the client, larger ones are keyed by address
+MAX_IDENTITY_BODY = 64 * 1024
+# Idle clients' buckets are dropped once there are this many
+MAX_BUCKETS = 10_000
+# Players behind one address (NAT, a school) share its bucket
+ADDRESS_CLIENTS = 4
+
+
+class TooManyRequestsError(HTTPException):
+    """Too Many Requests"""
+
+    __status__ = 429
+
+
+@dataclass(frozen=True)
+class AdmissionPolicy:
+    paths: Tuple[str, ...]  # a path ending in "/" covers everything below it
+    rate: float  # requests per second per client, sustained
+    burst: int  # requests per client at once
+    concurrency: int
+    max_queue: int
+    queue_timeout: float  # seconds a request waits for a slot
+    retry_after: int = 1  # seconds suggested when the queue is full
+
+
+ADMISSION_POLICIES: Dict[str, AdmissionPolicy] = {
+    "new_game": AdmissionPolicy(
+        paths=("/api/new_game", "/api/new_game_with_user", "/api/challenge/new"),
+        rate=2.0,
+        burst=30,
+        concurrency=4,
+        max_queue=32,
+        queue_timeout=5.0,
+    ),
+    "chat": AdmissionPolicy(
+        paths=("/api/chat", "/api/chat/stream"),
+        rate=0.5,
+        burst=10,
+        concurrency=8,
+        max_queue=16,
+        queue_timeout=10.0,
+        retry_after=5,
+    ),
+    # Exports stream whole tables, a couple at a time is plenty
+    "export": AdmissionPolicy(
+        paths=("/api/export/",),
+        rate=0.2,
+        burst=5,
+        concurrency=2,
+        max_queue=2,
+        queue_timeout=1.0,
+        retry_after=30,
+    ),
+}
+
+
+class TokenBuckets:
+    """One token bucket per client key."""
+
+    def __init__(self, rate: float, burst: int, max_keys: int = MAX_BUCKETS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # key -> (tokens, monotonic time of the last update)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: str) -> float:
+        """Take a token for ``key``; 0 if there was one, else seconds until there is."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return (1 - tokens) / self.rate
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return 0.0
+
+    def _prune(self, now: float):
+        # A bucket that has refilled is the same as no bucket
+        full = [
+            key
+            for key, (tokens, updated) in self._buckets.items()
+            if tokens + (now - updated) * self.rate >= self.burst
+        ]
+        for key in full:
+            del self._buckets[key]
+
+
+class ConcurrencyGate:
+    """Lets ``limit`` holders in at once and queues a bounded number more."""
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Optional[str]:
+        """Take a slot; returns None once held, else why not: "queue_full" or "queue_timeout"."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # release() hands its slot over by resolving the waiter
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as e:
+            # Handed a slot just as it gave up, pass the slot on
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            if isinstance(e, asyncio.TimeoutError):
+                return "queue_timeout"
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        return None
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+@dataclass
+class AdmissionStats:
+    endpoint_class: str
+    admitted: int = 0
+    rate_limited: int = 0
+    queue_full: int = 0
+    queue_timeout: int = 0
+    active: int = 0
+    queued: int = 0
+    clients: int = 0
+    addresses: int = 0
+
+
+class AdmissionController:
+    def __init__(self, policies: Dict[str, AdmissionPolicy] = ADMISSION_POLICIES):
+        self.policies = policies
+        self._classes = {path: name for name, policy in policies.items() for path in policy.paths}
+        self._prefixes = [(path, name) for path, name in self._classes.items() if path.endswith("/")]
+        self.buckets = {
+            name: TokenBuckets(policy.rate, policy.burst) for name, policy in policies.items()
+        }
+        self.address_buckets = {
+            name: TokenBuckets(policy.rate * ADDRESS_CLIENTS, policy.burst * ADDRESS_CLIENTS)
+            for name, policy in policies.items()
+        }
+        self.gates = {
+            name: ConcurrencyGate(policy.concurrency, policy.max_queue, policy.queue_timeout)
+            for name, policy in policies.items()
+        }
+        self.stats = {name: AdmissionStats(name) for name in policies}
+
+    def take(self, name: str, scope, body: bytes) -> float:
+        """Take a token for the request's address and client; 0 if both had one, else seconds to wait."""
+        address = client_address(scope)
+        wait = self.address_buckets[name].take(address)
+        if wait:
+            return wait
+        return self.buckets[name].take(client_identity(body) or address)
+
+    def endpoint_class(self, path: str) -> Optional[str]:
+        name = self._classes.get(path)
+        if name is None:
+            name = next((name for prefix, name in self._prefixes if path.startswith(prefix)), None)
+        return name
+
+    def report(self) -> List[AdmissionStats]:
+        for name, stats in self.stats.items():
+            stats.active = self.gates[name].active
+            stats.queued = self.gates[name].queued
+            stats.clients = len(self.buckets[name])
+            stats.addresses = len(self.address_buckets[name])
+        return list(self.stats.values())
+
+
+ADMISSION = AdmissionController()
+
+
+def client_address(scope) -> str:
+    client = scope.get("client")
+    return f"address:{client[0]}" if client else "address:unknown"
+
+
+def client_identity(body: bytes) -> Optional[str]:
+    """The user or session a request claims to be made for, None if it names neither."""
+    if body and len(body) <= MAX_IDENTITY_BODY:
+        try:
+            payload = msgspec.json.decode(body)
+        except msgspec.DecodeError:
+            payload = None
+        if isinstance(payload, dict):
+            for field in ("username", "session_id"):
+                value = payload.get(field)
+                if isinstance(value, str) and value:
+                    return f"{field}:{value}"
+    return None
+
+
+async def _read_body(receive) -> Tuple[bytes, List[dict]]:
+    messages, chunks = [], []
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks), messages
+
+
+def _rejection(scope, detail: str, retry_after: float) -> ErrorResponse:
+    seconds = max(1, math.ceil(retry_after))
+    error = TooManyRequestsError(detail, headers={"Retry-After": str(seconds)})
+    return ErrorResponse(error.__problem_detail__(scope["path"]), 429, headers=error.headers)
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, controller: AdmissionController = ADMISSION):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        name = self.controller.endpoint_class(scope["path"]) if scope["type"] == "http" else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        policy = self.controller.policies[name]
+        stats = self.controller.stats[name]
+        body, messages = await _read_body(receive)
+
+        wait = self.controller.take(name, scope, body)
+        if wait:
+            stats.rate_limited += 1
+            await _rejection(scope, "Rate limit exceeded", wait)(scope, receive, send)
+            return
+
+        gate = self.controller.gates[name]
+        refused = await gate.acquire()
+        if refused is not None:
+            setattr(stats, refused, getattr(stats, refused) + 1)
+            await _rejection(scope, "Server busy, try again later", policy.retry_after)(
+                scope, receive, send
+            )
+            return
+
+        stats.admitted += 1
+        replay = deque(messages)
+
+        async def replay_receive():
+            return replay.popleft() if replay else await receive()
+
+        try:
+            # Streamed responses hold their slot until the last chunk
+            await self.app(scope, replay_receive, send)
+        finally:
+            gate.release()
@@ -0,0 +1,173 @@
+"""In-memory cache of the static files and the index page.
+
+Everything is read once when the app is created. Each asset keeps its raw
+bytes plus gzip (and brotli, when the ``brotli`` package is installed)
+variants, a strong ETag per variant and a content-hashed URL such as
+``/static/js/game.3f2a9c1b0d4e.js``. Hashed URLs never change content, so
+they are served as immutable; plain URLs are revalidated with the ETag.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+# Smaller bodies are not worth the Content-Encoding overhead
+MIN_COMPRESS_SIZE = 256
+
+_MEDIA_TYPES = {
+    ".css": "text/css",
+    ".js": "application/javascript",
+    ".html": "text/html; charset=utf-8",
+}
+
+
+def media_type_for(path: Path) -> str:
+    return _MEDIA_TYPES.get(path.suffix) or mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+
+def accepted_encodings(accept_encoding: str) -> Dict[str, float]:
+    """Parse an Accept-Encoding header into {coding: q}."""
+    encodings = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        match = re.search(r"q=([0-9.]+)", params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        encodings[coding.strip().lower()] = q
+    return encodings
+
+
+@dataclass
+class StaticAsset:
+    body: bytes
+    media_type: str
+    digest: str
+    # Content-Encoding -> compressed body, only kept when smaller than body
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+    @classmethod
+    def from_bytes(cls, body: bytes, media_type: str) -> "StaticAsset":
+        asset = cls(body, media_type, hashlib.sha256(body).hexdigest()[:12])
+        if len(body) >= MIN_COMPRESS_SIZE:
+            variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants["br"] = brotli.compress(body, quality=11)
+            asset.encoded = {
+                coding: data for coding, data in variants.items() if len(data) < len(body)
+            }
+        return asset
+
+    def etag(self, coding: Optional[str] = None) -> str:
+        return f'"{self.digest}-{coding}"' if coding else f'"{self.digest}"'
+
+    def choose_encoding(self, accept_encoding: str) -> Optional[str]:
+        accepted = accepted_encodings(accept_encoding)
+        for coding in ("br", "gzip"):
+            if coding in self.encoded and accepted.get(coding, accepted.get("*", 0)) > 0:
+                return coding
+        return None
+
+    def matches(self, if_none_match: str) -> bool:
+        if if_none_match.strip() == "*":
+            return True
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return any(self.etag(coding) in tags for coding in (None, *self.encoded))
+
+    def response(self, request: Request, cache_control: str) -> Response:
+        headers = {"Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        coding = self.choose_encoding(request.headers.get("accept-encoding", ""))
+        headers["ETag"] = self.etag(coding)
+
+        if self.matches(request.headers.get("if-none-match", "")):
+            return Response(status_code=304, headers=headers)
+
+        body = self.body
+        if coding:
+            body = self.encoded[coding]
+            headers["Content-Encoding"] = coding
+        return Response(body, media_type=self.media_type, headers=headers)
+
+
+class StaticAssetCache:
+    """Static files keyed by their URL path below ``/static``, e.g. ``js/game.js``."""
+
+    def __init__(self, static_dir: Path, index_template: Path):
+        self.static_dir = static_dir
+        self.index_template = index_template
+        self.assets: Dict[str, StaticAsset] = {}
+        self.hashed: Dict[str, str] = {}  # hashed name -> plain name
+        self.index: Optional[StaticAsset] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.index is not None
+
+    def load(self):
+        assets, hashed = {}, {}
+        for path in sorted(self.static_dir.rglob("*")):
+            if not path.is_file():
+                continue
+            name = path.relative_to(self.static_dir).as_posix()
+            asset = StaticAsset.from_bytes(path.read_bytes(), media_type_for(path))
+            assets[name] = asset
+            hashed[self._hashed_name(name, asset.digest)] = name
+
+        index_html = self.index_template.read_text(encoding="utf-8")
+        for name, asset in assets.items():
+            index_html = index_html.replace(
+                f'"/static/{name}"', f'"{self._url(name, asset.digest)}"'
+            )
+
+        self.assets, self.hashed = assets, hashed
+        self.index = StaticAsset.from_bytes(index_html.encode("utf-8"), _MEDIA_TYPES[".html"])
+
+    def url_for(self, name: str) -> str:
+        return self._url(name, self.assets[name].digest)
+
+    def lookup(self, name: str) -> Optional[Tuple[StaticAsset, bool]]:
+        """Return (asset, immutable) for a plain or hashed name."""
+        if name in self.assets:
+            return self.assets[name], False
+        plain = self.hashed.get(name)
+        if plain is not None:
+            return self.assets[plain], True
+        return None
+
+    def serve(self, request: Request, name: str) -> Optional[Response]:
+        found = self.lookup(name)
+        if found is None:
+            return None
+        asset, immutable = found
+        return asset.response(request, IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE)
+
+    def serve_index(self, request: Request) -> Response:
+        return self.index.response(request, REVALIDATE_CACHE)
+
+    @staticmethod
+    def _hashed_name(name: str, digest: str) -> str:
+        stem, dot, suffix = name.rpartition(".")
+        return f"{stem}.{digest}.{suffix}" if dot else f"{name}.{digest}"
+
+    def _url(self, name: str, digest: str) -> str:
+        return f"/static/{self._hashed_name(name, digest)}"
@@ -0,0 +1,162 @@
+"""Background checkpoints of the games in the in-memory store.
+
+Moves only mark their game dirty. Every ``interval`` seconds ``flush`` pickles
+the dirty games that changed since their last checkpoint, each under its lock
+just long enough to pickle it, and writes them in one transaction. However many
+moves a game gets in between, it is written once per interval, and never on the
+request path. Finished and dropped games lose their checkpoint.
+
+After a restart ``recover`` puts the checkpointed games back into the store.
+The SQLite store keeps every game in the database already and needs none of it.
+"""
+
+import pickle
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from ..data.game_store import GameStore, UnknownGameError
+from ..domain.model import GameState
+
+DEFAULT_AUTOSAVE_INTERVAL = 10.0
+
+
+@dataclass
+class AutosaveReport:
+    written: int
+    unchanged: int
+    removed: int
+    duration_ms: float
+
+
+class Autosaver:
+    def __init__(self, db_path: Optional[str] = None, interval: float = 0):
+        self.db_path = db_path
+        self.interval = interval  # seconds between flushes, 0 is off
+        self._dirty: Set[str] = set()
+        self._saved: Dict[str, int] = {}  # game_id -> version of its checkpoint
+        self._lock = threading.Lock()
+        # The periodic flush and the one at shutdown must not interleave
+        self._flush_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    @property
+    def dirty(self) -> int:
+        return len(self._dirty)
+
+    def mark_dirty(self, game_id: str):
+        if self.enabled:
+            with self._lock:
+                self._dirty.add(game_id)
+
+    def _engine(self):
+        # SQLAlchemy loads when the first checkpoint is taken, not at import
+        from ..data.models import DEFAULT_DB_PATH, get_engine
+
+        return get_engine(self.db_path or DEFAULT_DB_PATH)
+
+    def flush(self, store: GameStore, usernames: Dict[str, str]) -> AutosaveReport:
+        """Checkpoint the dirty games; those that fail to be written stay dirty."""
+        start = time.perf_counter()
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+
+            pending: List[Tuple[str, int, bytes]] = []
+            gone: List[str] = []
+            unchanged = 0
+            for game_id in dirty:
+                try:
+                    with store.view(game_id) as game:
+                        if game.game_state != GameState.PLAYING:
+                            gone.append(game_id)
+                        elif self._saved.get(game_id) == game.version:
+                            unchanged += 1
+                        else:
+                            pending.append((game_id, game.version, pickle.dumps(game)))
+                except UnknownGameError:
+                    gone.append(game_id)
+
+            removed = 0
+            if pending or gone:
+                try:
+                    removed = self._write(pending, gone, usernames)
+                except Exception:
+                    with self._lock:
+                        self._dirty |= dirty
+                    raise
+            for game_id, version, _ in pending:
+                self._saved[game_id] = version
+            for game_id in gone:
+                self._saved.pop(game_id, None)
+
+        return AutosaveReport(
+            written=len(pending),
+            unchanged=unchanged,
+            removed=removed,
+            duration_ms=round((time.perf_counter() - start) * 1000, 3),
+        )
+
+    def _write(self, pending: List[Tuple[str, int, bytes]], gone: List[str], usernames: Dict[str, str]) -> int:
+        from sqlalchemy import delete
+        from sqlalchemy.dialects.sqlite import insert
+
+        from ..data.models import GameCheckpoint
+
+        now = datetime.utcnow()
+        with self._engine().begin() as conn:
+            if pending:
+                upsert = insert(GameCheckpoint)
+                conn.execute(
+                    upsert.on_conflict_do_update(
+                        index_elements=[GameCheckpoint.game_id],
+                        set_={
+                            "version": upsert.excluded.version,
+                            "username": upsert.excluded.username,
+                            "state": upsert.excluded.state,
+                            "updated_at": upsert.excluded.updated_at,
+                        },
+                    ),
+                    [
+                        dict(
+                            game_id=game_id,
+                            version=version,
+                            username=usernames.get(game_id),
+                            state=state,
+                            updated_at=now,
+                        )
+                        for game_id, version, state in pending
+                    ],
+                )
+            removed = 0
+            if gone:
+                result = conn.execute(delete(GameCheckpoint).where(GameCheckpoint.game_id.in_(gone)))
+                removed = result.rowcount
+        return removed
+
+    def recover(self, store: GameStore) -> Dict[str, Optional[str]]:
+        """Put the checkpointed games that are not live into ``store``; returns game_id -> username."""
+        from sqlalchemy import select
+
+        from ..data.models import GameCheckpoint
+
+        columns = (GameCheckpoint.game_id, GameCheckpoint.version, GameCheckpoint.username, GameCheckpoint.state)
+        restored: Dict[str, Optional[str]] = {}
+        with self._engine().connect() as conn:
+            for game_id, version, username, state in conn.execute(select(*columns)):
+                if game_id in store:
+                    continue
+                try:
+                    game = pickle.loads(state)
+                except Exception:
+                    # Written by an incompatible version of the game, nothing to resume
+                    continue
+                store.put(game_id, game)
+                self._saved[game_id] = version
+                restored[game_id] = username
+        return restored
@@ -0,0 +1,242 @@
+"""Content-negotiated compression of dynamic responses.
+
+``CompressionMiddleware`` compresses response bodies with the best coding the
+client accepts: zstd and brotli when the ``zstandard`` / ``brotli`` packages
+are installed, gzip always. Small bodies, media types that don't compress and
+responses that already chose their encoding (those sending ``Vary:
+Accept-Encoding``, like the static assets) are passed through.
+
+Handlers that cache their bodies can skip the per-request work:
+``negotiated_encoding`` tells them which coding the middleware would pick, so
+they can cache the compressed bytes next to the plain ones and send them
+with ``Content-Encoding`` set themselves.
+"""
+
+import gzip
+import zlib
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .assets import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+# Server preference when the client accepts several codings equally
+CODINGS = ("zstd", "br", "gzip")
+
+
+def available_codings() -> Tuple[str, ...]:
+    missing = {"zstd": zstandard is None, "br": brotli is None}
+    return tuple(coding for coding in CODINGS if not missing.get(coding))
+
+
+@dataclass(frozen=True)
+class CompressionSettings:
+    # Levels favour speed, these bodies are compressed on every change
+    minimum_size: int = 512
+    gzip_level: int = 5
+    brotli_quality: int = 4
+    zstd_level: int = 3
+    media_types: Tuple[str, ...] = (
+        "application/json",
+        "application/x-ndjson",
+        "application/javascript",
+        "text/",
+    )
+    codings: Tuple[str, ...] = available_codings()
+
+    def compressible(self, content_type: str) -> bool:
+        return content_type.startswith(self.media_types)
+
+    def choose(self, accept_encoding: str) -> Optional[str]:
+        """The coding to use for a request, None for identity."""
+        accepted = accepted_encodings(accept_encoding)
+        best, best_q = None, 0.0
+        for coding in self.codings:
+            q = accepted.get(coding, accepted.get("*", 0.0))
+            if q > best_q:
+                best, best_q = coding, q
+        return best
+
+    def compress(self, coding: str, body: bytes) -> bytes:
+        if coding == "gzip":
+            return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+        if coding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        if coding == "zstd":
+            return zstandard.ZstdCompressor(level=self.zstd_level).compress(body)
+        raise ValueError(f"Unsupported coding: {coding}")
+
+    def stream_encoder(self, coding: str) -> "StreamEncoder":
+        if coding == "gzip":
+            # wbits 16 + 15 writes the gzip header and trailer
+            encoder = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+            return StreamEncoder(
+                lambda chunk: encoder.compress(chunk) + encoder.flush(zlib.Z_SYNC_FLUSH),
+                encoder.flush,
+            )
+        if coding == "br":
+            encoder = brotli.Compressor(quality=self.brotli_quality)
+            return StreamEncoder(
+                lambda chunk: encoder.process(chunk) + encoder.flush(), encoder.finish
+            )
+        if coding == "zstd":
+            encoder = zstandard.ZstdCompressor(level=self.zstd_level).compressobj()
+            return StreamEncoder(
+                lambda chunk: encoder.compress(chunk)
+                + encoder.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+                encoder.flush,
+            )
+        raise ValueError(f"Unsupported coding: {coding}")
+
+
+@dataclass
+class StreamEncoder:
+    """Compresses a streamed body chunk by chunk, flushing after each one so
+    streamed lines reach the client as soon as they are produced."""
+
+    chunk: Callable[[bytes], bytes]
+    finish: Callable[[], bytes]
+
+
+# (settings, Accept-Encoding) of the request being handled
+_NEGOTIATION: ContextVar[Optional[Tuple[CompressionSettings, str]]] = ContextVar(
+    "compression_negotiation", default=None
+)
+
+
+def negotiated_encoding(size: int) -> Optional[Tuple[CompressionSettings, str]]:
+    """(settings, coding) the middleware would use for a body of ``size`` bytes.
+
+    None outside the middleware, for small bodies and for clients that don't
+    accept any of the codings.
+    """
+    negotiation = _NEGOTIATION.get()
+    if negotiation is None:
+        return None
+    settings, accept_encoding = negotiation
+    if size < settings.minimum_size:
+        return None
+    coding = settings.choose(accept_encoding)
+    return (settings, coding) if coding else None
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> str:
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return ""
+
+
+def _set_header(headers: List[Tuple[bytes, bytes]], name: bytes, value: Optional[str]):
+    headers[:] = [(key, val) for key, val in headers if key.lower() != name]
+    if value is not None:
+        headers.append((name, value.encode("latin-1")))
+
+
+def _add_vary(headers: List[Tuple[bytes, bytes]]):
+    vary = _header(headers, b"vary")
+    _set_header(headers, b"vary", f"{vary}, Accept-Encoding" if vary else "Accept-Encoding")
+
+
+class CompressionMiddleware:
+    def __init__(self, app, settings: CompressionSettings = CompressionSettings()):
+        self.app = app
+        self.settings = settings
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for key, value in scope["headers"]:
+            if key == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+
+        token = _NEGOTIATION.set((self.settings, accept_encoding))
+        try:
+            responder = _CompressingSender(send, self.settings, self.settings.choose(accept_encoding))
+            await self.app(scope, receive, responder)
+        finally:
+            _NEGOTIATION.reset(token)
+
+
+class _CompressingSender:
+    def __init__(self, send, settings: CompressionSettings, coding: Optional[str]):
+        self.send = send
+        self.settings = settings
+        self.coding = coding
+        self.start: Optional[Dict] = None
+        self.mode: Optional[str] = None  # "identity" or "stream" once decided
+        self.encoder: Optional[StreamEncoder] = None
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.mode is None:
+            await self._first_body(body, more_body)
+        elif self.mode == "stream":
+            data = self.encoder.chunk(body) if body else b""
+            if not more_body:
+                data += self.encoder.finish()
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+        else:
+            await self.send(message)
+
+    async def _first_body(self, body: bytes, more_body: bool):
+        start = self.start
+        headers = list(start.get("headers", []))
+
+        negotiable = not (
+            start["status"] in (204, 304)
+            or _header(headers, b"content-encoding")
+            or "accept-encoding" in _header(headers, b"vary").lower()
+            or not self.settings.compressible(_header(headers, b"content-type"))
+        )
+        if negotiable:
+            # The body depends on Accept-Encoding even when sent as is
+            _add_vary(headers)
+
+        if negotiable and self.coding is not None and not more_body:
+            if len(body) >= self.settings.minimum_size:
+                compressed = self.settings.compress(self.coding, body)
+                if len(compressed) < len(body):
+                    _set_header(headers, b"content-encoding", self.coding)
+                    _set_header(headers, b"content-length", str(len(compressed)))
+                    body = compressed
+            negotiable = False
+
+        if not negotiable or self.coding is None:
+            self.mode = "identity"
+            await self.send({**start, "headers": headers})
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        # Streamed body, compress as it goes
+        self.mode = "stream"
+        self.encoder = self.settings.stream_encoder(self.coding)
+        _set_header(headers, b"content-encoding", self.coding)
+        _set_header(headers, b"content-length", None)
+        await self.send({**start, "headers": headers})
+        await self.send(
+            {"type": "http.response.body", "body": self.encoder.chunk(body), "more_body": True}
+        )
@@ -0,0 +1,66 @@
+"""Cache of serialized board responses.
+
+Renders are keyed by game id and the game's ``version``, so a cached body is
+valid for as long as the game has not changed. Only renders of the latest
+version are kept per game, and the least recently used games are dropped
+once ``max_games`` is reached.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Tuple
+
+
+class BoardRenderCache:
+    def __init__(self, max_games: int = 1024):
+        self.max_games = max_games
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # game_id -> (version, {render key: encoded body})
+        self._renders: OrderedDict[str, Tuple[int, Dict[Hashable, bytes]]] = OrderedDict()
+
+    def get_or_render(
+        self, game_id: str, version: int, key: Hashable, render: Callable[[], bytes]
+    ) -> bytes:
+        with self._lock:
+            entry = self._renders.get(game_id)
+            if entry is not None and entry[0] == version and key in entry[1]:
+                self._renders.move_to_end(game_id)
+                self.hits += 1
+                return entry[1][key]
+            self.misses += 1
+
+        body = render()
+
+        with self._lock:
+            entry = self._renders.get(game_id)
+            if entry is None or entry[0] < version:
+                entry = (version, {})
+            if entry[0] == version:
+                entry[1][key] = body
+                self._renders[game_id] = entry
+                self._renders.move_to_end(game_id)
+                while len(self._renders) > self.max_games:
+                    self._renders.popitem(last=False)
+        return body
+
+    def cached_bytes(self) -> int:
+        """Total size of the cached bodies."""
+        with self._lock:
+            return sum(
+                len(body) for _, renders in self._renders.values() for body in renders.values()
+            )
+
+    def forget(self, game_id: str):
+        with self._lock:
+            self._renders.pop(game_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._renders.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._renders)
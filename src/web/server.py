@@ -1,15 +1,63 @@
+import asyncio
+import functools
+import json
+import os
+import sys
+import time
 import uuid
 import webbrowser
-from dataclasses import dataclass
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List
-
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Container,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    MutableMapping,
+    Set,
+    Tuple,
+)
+
+import msgspec
 from lihil import HTTPException, Lihil, Route
-from starlette.responses import FileResponse, HTMLResponse
-
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+
+from ..data.game_store import (
+    GameStore,
+    StaleGameError,
+    UnknownGameError,
+    create_api_key_store,
+    create_game_store,
+)
+from ..domain.challenge import ChallengeGame, daily_challenge_id
+from ..domain.journal import FLAGGED, REVEALED, MoveJournal
 from ..domain.minesweeper import MinesweeperGame
 from ..domain.model import GameState, GameStats
-from ..domain.ai_assistant import get_or_create_assistant, remove_assistant
+from ..memory import SKIPPED_ATTRIBUTES, AllocationDiff, AllocationTracker, deep_sizeof
+from ..profiling import PROFILER, ProfilingMiddleware, timed
+from ..domain.ai_assistant import (
+    AI_ASSISTANTS,
+    ChatPlan,
+    MinesweeperAIAssistant,
+    close_shared_http_client,
+    get_or_create_assistant,
+    remove_assistant,
+)
+from .admission import ADMISSION, AdmissionController, AdmissionMiddleware, AdmissionStats
+from .assets import StaticAssetCache
+from .autosave import DEFAULT_AUTOSAVE_INTERVAL, AutosaveReport, Autosaver
+from .compression import CompressionMiddleware, CompressionSettings, negotiated_encoding
+from .render_cache import BoardRenderCache
+
+if TYPE_CHECKING:
+    from ..data.models import GameDatabase
 
 
 class FileNotFoundError(HTTPException):
@@ -38,6 +86,10 @@ class CellActionRequest:
     game_id: str
     row: int
     col: int
+    # Per-game client sequence number, makes the move idempotent and ordered
+    seq: int | None = None
+    # Answer an applied move with only the cells it changed, for large boards
+    delta: bool = False
 
 
 @dataclass
@@ -62,6 +114,22 @@ class CheatRequest:
     game_id: str
 
 
+@dataclass
+class UndoRequest:
+    game_id: str
+
+
+@dataclass
+class AutoClearRequest:
+    game_id: str
+
+
+@dataclass
+class ChallengeRequest:
+    username: str = ""
+    challenge_id: str = ""  # defaults to today's daily challenge
+
+
 @dataclass
 class SetAPIKeyRequest:
     api_key: str
@@ -81,10 +149,29 @@ class ChatResponse:
 
 
 @dataclass
-class UserStatsResponse:
+class DifficultyStats:
+    difficulty: str
     total_games: int
     won_games: int
+    lost_games: int
+    quit_games: int
     win_rate: float
+    avg_duration_seconds: float | None
+    best_duration_seconds: float | None  # of won games
+    avg_cells_revealed: float
+
+
+@dataclass
+class StatsResponse:
+    total_games: int
+    won_games: int
+    win_rate: float
+    lost_games: int = 0
+    quit_games: int = 0
+    avg_duration_seconds: float | None = None
+    best_duration_seconds: float | None = None
+    avg_cells_revealed: float = 0.0
+    by_difficulty: List[DifficultyStats] = field(default_factory=list)
 
 
 @dataclass
@@ -95,6 +182,12 @@ class SavedGameInfo:
     game_state: str
 
 
+@dataclass
+class SavedGamesPage:
+    games: List[SavedGameInfo]
+    next_cursor: str | None = None
+
+
 @dataclass
 class CellData:
     row: int
@@ -119,6 +212,73 @@ class LoadGameResponse:
     game_state: str
 
 
+@dataclass
+class ChallengeGameResponse:
+    game_id: str
+    challenge_id: str
+    stats: dict
+    board: List[List[CellData]]
+    game_state: str
+
+
+@dataclass
+class ChallengeResultInfo:
+    username: str
+    result: str
+    duration_seconds: float | None
+    cells_revealed: int
+
+
+@dataclass
+class TraceInfo:
+    trace_id: int
+    label: str
+    status: int
+    duration_ms: float
+    started_at: str
+    mode: str
+    samples: int
+    spans: Dict[str, Dict[str, float]]
+
+
+@dataclass
+class GameMemory:
+    game_id: str  # prefix only, a full id would let anyone play the game
+    kind: str
+    bytes: int
+    board: int
+    journal: int
+    db: int
+
+
+@dataclass
+class MemoryReport:
+    games: int
+    games_bytes: int
+    games_resident: bool  # False when the store keeps games outside the process
+    assistants: int
+    assistants_bytes: int
+    api_keys: int
+    api_keys_bytes: int
+    renders: int
+    renders_bytes: int
+    largest_games: List[GameMemory]
+    traced_bytes: int | None
+    allocations: List[AllocationDiff]
+
+
+@dataclass
+class SweepReport:
+    swept_at: str
+    games: int  # idle games dropped from the store
+    sessions_quit: int
+    sessions_dropped: int  # never played, deleted rather than quit
+    user_games: int
+    api_keys: int
+    assistants: int
+    duration_ms: float
+
+
 @dataclass
 class BoardResponse:
     board: List[List[CellData]]
@@ -126,68 +286,291 @@ class BoardResponse:
     game_state: str
 
 
+@dataclass
+class BoardDeltaResponse:
+    changed: List[CellData]  # only the cells that changed
+    stats: GameStats
+    game_state: str
+
+
+def get_cell_data(
+    game: MinesweeperGame, row: int, col: int, hit_row: int | None = None, hit_col: int | None = None
+) -> CellData:
+    cell = game.board[row][col]
+
+    state = cell.state.value
+    # If game is lost, reveal all mines
+    if game.game_state == GameState.LOST and cell.is_mine:
+        state = "revealed"
+
+    return CellData(
+        row=row,
+        col=col,
+        state=state,
+        is_mine=cell.is_mine,
+        adjacent_mines=cell.adjacent_mines,
+        mine_hit=(
+            hit_row is not None
+            and hit_col is not None
+            and row == hit_row
+            and col == hit_col
+            and cell.is_mine
+        ),
+    )
+
+
+@timed("render.board_data")
 def get_board_data(
     game: MinesweeperGame, hit_row: int | None = None, hit_col: int | None = None
 ) -> List[List[CellData]]:
-    board_data = []
-    for row in range(game.size):
-        row_data = []
-        for col in range(game.size):
-            cell = game.board[row][col]
-
-            state = cell.state.value
-            # If game is lost, reveal all mines
-            if game.game_state == GameState.LOST and cell.is_mine:
-                state = "revealed"
-
-            cell_data = CellData(
-                row=row,
-                col=col,
-                state=state,
-                is_mine=cell.is_mine,
-                adjacent_mines=cell.adjacent_mines,
-                mine_hit=(
-                    hit_row is not None
-                    and hit_col is not None
-                    and row == hit_row
-                    and col == hit_col
-                    and cell.is_mine
-                ),
-            )
+    return [
+        [get_cell_data(game, row, col, hit_row, hit_col) for col in range(game.size)]
+        for row in range(game.size)
+    ]
 
-            row_data.append(cell_data)
-        board_data.append(row_data)
-    return board_data
+
+def board_delta(game: MinesweeperGame, changed: List[Tuple[int, int]]) -> BoardDeltaResponse:
+    """The cells a move changed; on a loss also every mine, as the board shows them all."""
+    cells = list(dict.fromkeys(changed))
+    hit = next(((row, col) for row, col in cells if game.board[row][col].is_mine), (None, None))
+    if game.game_state == GameState.LOST:
+        cells += [
+            (row, col)
+            for row in range(game.size)
+            for col in range(game.size)
+            if game.board[row][col].is_mine and (row, col) != hit
+        ]
+    return BoardDeltaResponse(
+        changed=[get_cell_data(game, row, col, *hit) for row, col in cells],
+        stats=get_game_stats(game),
+        game_state=game.game_state.value,
+    )
 
 
 def get_game_stats(game: MinesweeperGame):
     return game.get_game_stats()
 
 
+BOARD_RENDERS = BoardRenderCache()
+COMPRESSION = CompressionSettings()
+_JSON_ENCODER = msgspec.json.Encoder()
+
+
+def board_response(
+    game_id: str, game: MinesweeperGame, hit_row: int | None = None, hit_col: int | None = None
+) -> Response:
+    """Serialized BoardResponse for the game, cached until the game changes."""
+    hit = None
+    if hit_row is not None and hit_col is not None and game.board[hit_row][hit_col].is_mine:
+        hit = (hit_row, hit_col)
+
+    @timed("render.board")
+    def render() -> bytes:
+        return _JSON_ENCODER.encode(
+            BoardResponse(
+                board=get_board_data(game, *(hit or (None, None))),
+                stats=get_game_stats(game),
+                game_state=game.game_state.value,
+            )
+        )
+
+    body = BOARD_RENDERS.get_or_render(game_id, game.version, (hit, "json"), render)
+    negotiated = negotiated_encoding(len(body))
+    if negotiated is None:
+        return Response(body, media_type="application/json")
+
+    # Compressed once per game version too, the middleware passes it through
+    settings, coding = negotiated
+    compress = timed("render.compress")(lambda: settings.compress(coding, body))
+    encoded = BOARD_RENDERS.get_or_render(game_id, game.version, (hit, f"json+{coding}"), compress)
+    return Response(
+        encoded,
+        media_type="application/json",
+        headers={"Content-Encoding": coding, "Vary": "Accept-Encoding"},
+    )
+
+
 # Static files - serve CSS and JS directly
 STATIC_PATH = Path(__file__).parent / "static"
-GAMES: Dict[str, MinesweeperGame] = {}
+TEMPLATES_PATH = Path(__file__).parent / "templates"
+STATIC_ASSETS = StaticAssetCache(STATIC_PATH, TEMPLATES_PATH / "index.html")
+GAME_STORE_ENV = "MINESWEEPER_GAME_STORE"
+GAMES: GameStore[MinesweeperGame] = create_game_store(os.environ.get(GAME_STORE_ENV))
 USER_GAMES: Dict[str, str] = {}  # Maps game_id to username
-API_KEYS: Dict[str, str] = {}  # Maps session_id to API key (in memory only)
+# Maps session_id to API key, shared between workers like the games
+API_KEYS: MutableMapping[str, str] = create_api_key_store(os.environ.get(GAME_STORE_ENV))
+# Checkpoints in-memory games in the background, started by start_web_server
+AUTOSAVE_ENV = "MINESWEEPER_AUTOSAVE_INTERVAL"
+AUTOSAVE = Autosaver()
+MAX_SAVED_GAMES_PAGE = 100
+# The largest custom board the client offers; one request must not allocate more
+MAX_BOARD_SIZE = 300
+
+def open_database() -> "GameDatabase":
+    # SQLAlchemy loads on the first request that needs the database
+    from ..data.models import GameDatabase
+
+    return GameDatabase()
+
+
+def validate_board(size, mines):
+    if not isinstance(size, int) or not 3 <= size <= MAX_BOARD_SIZE:
+        raise HTTPException(
+            problem_status=400, detail=f"Board size must be between 3 and {MAX_BOARD_SIZE}"
+        )
+    if not isinstance(mines, int) or not 1 <= mines < size * size:
+        raise HTTPException(
+            problem_status=400, detail="Mines must be at least 1 and leave a cell without a mine"
+        )
+
+
+def in_thread(handler):
+    """Run a blocking handler in the thread pool.
+
+    lihil's ``to_thread`` does not help here: endpoints are built at import
+    time, when no event loop runs yet, and the flag is then silently ignored.
+    Handlers that wait for a game's lock or the database must not block the
+    loop, the sweeper and autosave threads hold those locks too.
+    """
+
+    @functools.wraps(handler)
+    async def threaded(**params):
+        return await run_in_thread(handler, **params)
+
+    return threaded
+
+
+async def run_in_thread(func: Callable, *args, **kwargs):
+    """``asyncio.to_thread`` with the worker profiled into the request's trace."""
+    return await asyncio.to_thread(PROFILER.call, func, *args, **kwargs)
+
+
+def lookup_game(game_id: str) -> MinesweeperGame:
+    game = GAMES.get(game_id)
+    if game is None:
+        raise GameNotFoundError()
+    return game
+
+
+@contextmanager
+def view_game(game_id: str) -> Iterator[MinesweeperGame]:
+    """Read a game while holding its lock, without writing it back."""
+    try:
+        with GAMES.view(game_id) as game:
+            yield game
+    except UnknownGameError:
+        raise GameNotFoundError()
+
+
+@contextmanager
+def checkout_game(game_id: str) -> Iterator[MinesweeperGame]:
+    """Load a game for mutation and write it back to the store afterwards.
+
+    Holds the game's lock for the whole block, so moves on one game are applied
+    one at a time even though handlers run in the thread pool.
+    """
+    try:
+        # Held past the store's own hold, so that boards rendered from a move
+        # that lost to another worker are dropped before anyone can read them
+        with GAMES.lock_for(game_id):
+            try:
+                with GAMES.checkout(game_id) as game:
+                    yield game
+            except StaleGameError:
+                BOARD_RENDERS.forget(game_id)
+                raise
+        AUTOSAVE.mark_dirty(game_id)
+    except UnknownGameError:
+        raise GameNotFoundError()
+    except StaleGameError:
+        raise HTTPException(
+            problem_status=409, detail="Game was modified by another request, please retry"
+        )
+
+
+MOVE_ORDER_TIMEOUT = 2.0
+MOVE_ORDER_POLL = 0.01
+
+
+async def wait_for_turn(game_id: str, seq: int):
+    """Wait until the moves numbered below ``seq`` were applied.
+
+    Gives up after MOVE_ORDER_TIMEOUT, e.g. when an earlier move was lost, and
+    lets the move through; the lost one is then dropped as a duplicate. Polls
+    the store, so moves applied by other worker processes are seen too.
+    """
+    deadline = time.monotonic() + MOVE_ORDER_TIMEOUT
+    while time.monotonic() < deadline:
+        if seq <= await run_in_thread(applied_move_seq, game_id) + 1:
+            return
+        await asyncio.sleep(MOVE_ORDER_POLL)
+
+
+def applied_move_seq(game_id: str) -> int:
+    with view_game(game_id) as game:
+        return game.move_seq
+
+
+@contextmanager
+def sequenced_move(game_id: str, seq: int | None) -> Iterator[Tuple[MinesweeperGame, bool]]:
+    """Check out a game for a client move, yielding (game, is_duplicate).
+
+    Moves with a sequence number are applied at most once. A repeated number
+    is reported as a duplicate so the handler can answer with the current
+    board instead of applying the move again.
+    """
+    with checkout_game(game_id) as game:
+        duplicate = seq is not None and seq <= game.move_seq
+        if seq is not None and not duplicate:
+            game.move_seq = seq
+        yield game, duplicate
+
+
+async def apply_in_order(
+    move: Callable[[CellActionRequest], Response], request: CellActionRequest
+) -> Response:
+    """Apply a client move in the thread pool, after the moves numbered before it."""
+    if request.seq is not None:
+        await wait_for_turn(request.game_id, request.seq)
+    return await run_in_thread(move, request)
+
+
+def last_move_response(game: MinesweeperGame) -> Response:
+    """BoardDeltaResponse for the move the game recorded last."""
+    entry = game.journal.entry(len(game.journal) - 1)
+    changed = [divmod(index, game.size) for index in entry.changed]
+    return Response(
+        _JSON_ENCODER.encode(board_delta(game, changed or [divmod(entry.cell, game.size)])),
+        media_type="application/json",
+    )
+
+
+def with_move_status(response: Response, game: MinesweeperGame, status: str) -> Response:
+    """Tell the client which of its moves the response reflects and what became of it."""
+    response.headers["X-Move-Seq"] = str(game.move_seq)
+    response.headers["X-Move-Status"] = status
+    return response
+
 
 # Static file routes
 static_routes = Route("/static")
 
 
+def serve_static(request: Request, name: str):
+    response = STATIC_ASSETS.serve(request, name)
+    if response is None:
+        raise HTTPException(problem_status=404, detail="File not found")
+    return response
+
+
 @static_routes.sub("/css/{filename}").get(to_thread=False)
-def serve_css(filename: str):
-    css_path = STATIC_PATH / "css" / filename
-    if css_path.exists():
-        return FileResponse(css_path, media_type="text/css")
-    raise FileNotFoundError()
+def serve_css(request: Request, filename: str):
+    return serve_static(request, f"css/{filename}")
 
 
 @static_routes.sub("/js/{filename}").get(to_thread=False)
-def serve_js(filename: str):
-    js_path = STATIC_PATH / "js" / filename
-    if js_path.exists():
-        return FileResponse(js_path, media_type="application/javascript")
-    raise FileNotFoundError()
+def serve_js(request: Request, filename: str):
+    return serve_static(request, f"js/{filename}")
 
 
 root = Route()
@@ -195,11 +578,8 @@ root = Route()
 
 # Main page
 @root.get(to_thread=False)
-def index():
-    template_path = Path(__file__).parent / "templates" / "index.html"
-    with open(template_path, "r") as f:
-        content = f.read()
-    return HTMLResponse(content)
+def index(request: Request):
+    return STATIC_ASSETS.serve_index(request)
 
 
 # API routes
@@ -215,45 +595,83 @@ def login(request: LoginRequest) -> dict:
     return {"success": True, "username": username}
 
 
-@api.sub("/user_stats/{username}").get(to_thread=False)
-def get_user_stats(username: str) -> UserStatsResponse:
-    # Create a temporary game instance to access database
-    game = MinesweeperGame(size=9, difficulty=0.15, username=username)
-    stats = game.get_user_stats()
-    game.db.close()
+def stats_response(stats: dict) -> StatsResponse:
+    by_difficulty = [DifficultyStats(**row) for row in stats["by_difficulty"]]
+    return StatsResponse(**{**stats, "by_difficulty": by_difficulty})
 
-    if stats:
-        return UserStatsResponse(
-            total_games=stats["total_games"],
-            won_games=stats["won_games"],
-            win_rate=stats["win_rate"],
-        )
-    else:
-        return UserStatsResponse(total_games=0, won_games=0, win_rate=0.0)
 
+@api.sub("/user_stats/{username}").get()
+@in_thread
+def get_user_stats(username: str) -> StatsResponse:
+    db = open_database()
+    try:
+        user = db.get_user_by_username(username)
+        stats = db.get_user_stats(user.id) if user else None
+    finally:
+        db.close()
+
+    if stats is None:
+        return StatsResponse(total_games=0, won_games=0, win_rate=0.0)
+    return stats_response(stats)
 
-@api.sub("/saved_games/{username}").get(to_thread=False)
-def get_saved_games(username: str) -> List[SavedGameInfo]:
-    # Create a temporary game instance to access database
-    game = MinesweeperGame(size=9, difficulty=0.15, username=username)
-    saved_games = game.db.get_user_saved_games(game.user.id)
-    game.db.close()
 
-    return [
-        SavedGameInfo(
-            game_name=sg.game_name,
-            difficulty=sg.difficulty,
-            saved_at=sg.saved_at.isoformat(),
-            game_state=sg.game_state,
-        )
-        for sg in saved_games
-    ]
+@api.sub("/stats").get()
+@in_thread
+def get_global_stats() -> StatsResponse:
+    """Finished games of every player, in total and per difficulty."""
+    db = open_database()
+    try:
+        return stats_response(db.get_game_stats())
+    finally:
+        db.close()
+
+
+@api.sub("/saved_games/{username}").get()
+@in_thread
+def get_saved_games(username: str, limit: int = 20, cursor: str = "") -> SavedGamesPage:
+    before = None
+    if cursor:
+        try:
+            saved_at, saved_id = cursor.rsplit("_", 1)
+            before = (datetime.fromisoformat(saved_at), int(saved_id))
+        except ValueError:
+            raise HTTPException(problem_status=400, detail="Invalid cursor")
+    limit = max(1, min(limit, MAX_SAVED_GAMES_PAGE))
+
+    db = open_database()
+    try:
+        user = db.get_user_by_username(username)
+        # Fetch one extra row to know whether there is a next page
+        saved_games = db.get_user_saved_games(user.id, limit + 1, before) if user else []
+    finally:
+        db.close()
+
+    next_cursor = None
+    if len(saved_games) > limit:
+        saved_games = saved_games[:limit]
+        last = saved_games[-1]
+        next_cursor = f"{last.saved_at.isoformat()}_{last.id}"
+
+    return SavedGamesPage(
+        games=[
+            SavedGameInfo(
+                game_name=sg.game_name,
+                difficulty=sg.difficulty,
+                saved_at=sg.saved_at.isoformat(),
+                game_state=sg.game_state,
+            )
+            for sg in saved_games
+        ],
+        next_cursor=next_cursor,
+    )
 
 
-@api.sub("/new_game").post(to_thread=False)
+@api.sub("/new_game").post()
+@in_thread
 def new_game(request: NewGameRequest) -> GameResponse:
     size = request.size
     mines = request.mines
+    validate_board(size, mines)
 
     # Calculate difficulty from mines and size
     difficulty = mines / (size * size)
@@ -269,7 +687,8 @@ def new_game(request: NewGameRequest) -> GameResponse:
     return GameResponse(game_id=game_id, stats=get_game_stats(game))
 
 
-@api.sub("/new_game_with_user").post(to_thread=False)
+@api.sub("/new_game_with_user").post()
+@in_thread
 def new_game_with_user(request: dict) -> GameResponse:
     size = request.get("size", 9)
     mines = request.get("mines", 10)
@@ -277,6 +696,7 @@ def new_game_with_user(request: dict) -> GameResponse:
 
     if not username:
         raise HTTPException(problem_status=400, detail="Username is required")
+    validate_board(size, mines)
 
     # Calculate difficulty from mines and size
     difficulty = mines / (size * size)
@@ -293,69 +713,114 @@ def new_game_with_user(request: dict) -> GameResponse:
     return GameResponse(game_id=game_id, stats=get_game_stats(game))
 
 
-@api.sub("/reveal_cell").post(to_thread=False)
-def reveal_cell(request: CellActionRequest) -> BoardResponse:
+@api.sub("/challenge/new").post()
+@in_thread
+def new_challenge_game(request: ChallengeRequest) -> ChallengeGameResponse:
+    challenge_id = request.challenge_id or daily_challenge_id()
+    try:
+        game = ChallengeGame(challenge_id, username=request.username or None)
+    except ValueError:
+        raise HTTPException(problem_status=404, detail="Challenge not found")
+
+    game_id = str(uuid.uuid4())
+    GAMES[game_id] = game
+    if request.username:
+        USER_GAMES[game_id] = request.username
+
+    return ChallengeGameResponse(
+        game_id=game_id,
+        challenge_id=challenge_id,
+        stats=get_game_stats(game),
+        board=get_board_data(game),
+        game_state=game.game_state.value,
+    )
+
+
+@api.sub("/challenge/{challenge_id}/results").get()
+@in_thread
+def get_challenge_results(challenge_id: str, limit: int = 20) -> List[ChallengeResultInfo]:
+    db = open_database()
+    try:
+        results = db.get_challenge_results(challenge_id, max(1, min(limit, 100)))
+    finally:
+        db.close()
+
+    return [
+        ChallengeResultInfo(
+            username=username,
+            result=result.result,
+            duration_seconds=result.duration_seconds,
+            cells_revealed=result.cells_revealed,
+        )
+        for result, username in results
+    ]
+
+
+def apply_reveal(request: CellActionRequest) -> Response:
     game_id = request.game_id
     row = request.row
     col = request.col
 
-    if game_id not in GAMES:
-        raise GameNotFoundError()
+    with sequenced_move(game_id, request.seq) as (game, duplicate):
+        if duplicate:
+            return with_move_status(board_response(game_id, game, row, col), game, "duplicate")
 
-    game = GAMES[game_id]
-    success = game.reveal_cell(row, col)
+        success = game.reveal_cell(row, col)
 
-    if not success:
-        raise InvalidMoveError()
+        if not success:
+            if request.seq is None:
+                raise InvalidMoveError()
+            # Sequenced clients get the authoritative board to correct their guess
+            return with_move_status(board_response(game_id, game), game, "rejected")
 
-    board_data = get_board_data(game, row, col)
+        if request.delta:
+            return with_move_status(last_move_response(game), game, "applied")
+        return with_move_status(board_response(game_id, game, row, col), game, "applied")
 
-    return BoardResponse(
-        board=board_data,
-        stats=get_game_stats(game),
-        game_state=game.game_state.value,
-    )
 
+@api.sub("/reveal_cell").post()
+async def reveal_cell(request: CellActionRequest) -> BoardResponse:
+    return await apply_in_order(apply_reveal, request)
 
-@api.sub("/toggle_flag").post(to_thread=False)
-def toggle_flag(request: CellActionRequest) -> BoardResponse:
+
+def apply_flag(request: CellActionRequest) -> Response:
     game_id = request.game_id
     row = request.row
     col = request.col
 
-    if game_id not in GAMES:
-        raise GameNotFoundError()
+    with sequenced_move(game_id, request.seq) as (game, duplicate):
+        if duplicate:
+            return with_move_status(board_response(game_id, game), game, "duplicate")
 
-    game = GAMES[game_id]
-    success = game.toggle_flag(row, col)
+        success = game.toggle_flag(row, col)
 
-    if not success:
-        raise InvalidMoveError()
+        if not success:
+            if request.seq is None:
+                raise InvalidMoveError()
+            return with_move_status(board_response(game_id, game), game, "rejected")
 
-    board_data = get_board_data(game)
+        if request.delta:
+            return with_move_status(last_move_response(game), game, "applied")
+        return with_move_status(board_response(game_id, game), game, "applied")
 
-    return BoardResponse(
-        board=board_data,
-        stats=get_game_stats(game),
-        game_state=game.game_state.value,
-    )
 
+@api.sub("/toggle_flag").post()
+async def toggle_flag(request: CellActionRequest) -> BoardResponse:
+    return await apply_in_order(apply_flag, request)
 
-@api.sub("/save_game").post(to_thread=False)
+
+@api.sub("/save_game").post()
+@in_thread
 def save_game(request: SaveGameRequest) -> dict:
     game_id = request.game_id
     game_name = request.game_name
 
-    if game_id not in GAMES:
-        raise GameNotFoundError()
-
-    game = GAMES[game_id]
-
-    # Only allow saving if game has a user
-    if not game.user:
-        raise HTTPException(problem_status=400, detail="Game must have a user to save")
+    with view_game(game_id) as game:
+        # Only allow saving if game has a user
+        if not game.user:
+            raise HTTPException(problem_status=400, detail="Game must have a user to save")
 
-    success = game.save_game(game_name)
+        success = game.save_game(game_name)
 
     if success:
         return {"success": True, "message": f"Game '{game_name}' saved successfully"}
@@ -363,17 +828,17 @@ def save_game(request: SaveGameRequest) -> dict:
         raise HTTPException(problem_status=500, detail="Failed to save game")
 
 
-@api.sub("/load_game").post(to_thread=False)
+@api.sub("/load_game").post()
+@in_thread
 def load_game(request: LoadGameRequest) -> LoadGameResponse:
     username = request.username
     game_name = request.game_name
 
-    # Create a temporary game instance to load the game
-    temp_game = MinesweeperGame(size=9, difficulty=0.15, username=username)
-    success = temp_game.load_game(game_name)
+    db = open_database()
+    temp_game = MinesweeperGame.from_saved(db, username, game_name)
 
-    if not success:
-        temp_game.db.close()
+    if temp_game is None:
+        db.close()
         raise HTTPException(problem_status=404, detail="Saved game not found")
 
     # Create a new game session with loaded state
@@ -392,22 +857,15 @@ def load_game(request: LoadGameRequest) -> LoadGameResponse:
     )
 
 
-@api.sub("/get_board/{game_id}").get(to_thread=False)
+@api.sub("/get_board/{game_id}").get()
+@in_thread
 def get_board(game_id: str) -> BoardResponse:
-    if game_id not in GAMES:
-        raise GameNotFoundError()
-
-    game = GAMES[game_id]
-    board_data = get_board_data(game)
-
-    return BoardResponse(
-        board=board_data,
-        stats=get_game_stats(game),
-        game_state=game.game_state.value,
-    )
+    with view_game(game_id) as game:
+        return board_response(game_id, game)
 
 
-@api.sub("/delete_saved_game").post(to_thread=False)
+@api.sub("/delete_saved_game").post()
+@in_thread
 def delete_saved_game(request: dict) -> dict:
     username = request.get("username", "")
     game_name = request.get("game_name", "")
@@ -417,10 +875,12 @@ def delete_saved_game(request: dict) -> dict:
             problem_status=400, detail="Username and game name are required"
         )
 
-    # Create a temporary game instance to access database
-    game = MinesweeperGame(size=9, difficulty=0.15, username=username)
-    success = game.delete_saved_game(game_name)
-    game.db.close()
+    db = open_database()
+    try:
+        user = db.get_user_by_username(username)
+        success = user is not None and db.delete_saved_game(user.id, game_name)
+    finally:
+        db.close()
 
     if success:
         return {"success": True, "message": f"Game '{game_name}' deleted successfully"}
@@ -428,30 +888,135 @@ def delete_saved_game(request: dict) -> dict:
         raise HTTPException(problem_status=404, detail="Saved game not found")
 
 
-@api.sub("/cheat").post(to_thread=False)
+@api.sub("/cheat").post()
+@in_thread
 def cheat(request: CheatRequest) -> BoardResponse:
     game_id = request.game_id
 
-    if game_id not in GAMES:
-        raise GameNotFoundError()
+    with checkout_game(game_id) as game:
+        result = game.cheat()
 
-    game = GAMES[game_id]
-    result = game.cheat()
+        if result is None:
+            raise HTTPException(problem_status=400, detail="No safe cells available or game not in progress")
 
-    if result is None:
-        raise HTTPException(problem_status=400, detail="No safe cells available or game not in progress")
+        return board_response(game_id, game)
 
-    revealed_row, revealed_col = result
-    board_data = get_board_data(game)
 
-    return BoardResponse(
-        board=board_data,
-        stats=get_game_stats(game),
-        game_state=game.game_state.value,
-    )
+def apply_chord(request: CellActionRequest) -> Response:
+    game_id = request.game_id
+
+    with sequenced_move(game_id, request.seq) as (game, duplicate):
+        if duplicate:
+            return with_move_status(board_response(game_id, game), game, "duplicate")
+
+        changed = game.chord(request.row, request.col)
+
+        if changed is None:
+            if request.seq is None:
+                raise HTTPException(
+                    problem_status=400, detail="Chord needs a revealed number with all its flags placed"
+                )
+            return with_move_status(board_response(game_id, game), game, "rejected")
+
+        if request.delta:
+            return with_move_status(last_move_response(game), game, "applied")
+        # A chord that loses stops at the mine it hit, the last cell it revealed
+        return with_move_status(board_response(game_id, game, *changed[-1]), game, "applied")
+
+
+@api.sub("/chord").post()
+async def chord(request: CellActionRequest) -> BoardResponse:
+    return await apply_in_order(apply_chord, request)
+
+
+@api.sub("/auto_clear").post()
+@in_thread
+def auto_clear(request: AutoClearRequest) -> BoardDeltaResponse:
+    with checkout_game(request.game_id) as game:
+        changed = game.auto_clear()
+
+        if changed is None:
+            raise HTTPException(problem_status=400, detail="No cells can be proven safe")
+
+        return board_delta(game, changed)
+
+
+@api.sub("/undo").post()
+@in_thread
+def undo(request: UndoRequest) -> BoardResponse:
+    with checkout_game(request.game_id) as game:
+        if not game.undo():
+            raise HTTPException(problem_status=400, detail="Nothing to undo or game not in progress")
+
+        return board_response(request.game_id, game)
+
+
+def replay_lines(journal: MoveJournal, start: int) -> Iterator[bytes]:
+    """NDJSON replay: the position after ``start`` moves, then one line per move.
+
+    The final mine layout is only included once the game is over.
+    """
+    size = journal.size
+    final = journal.snapshot_at(len(journal))
+    show_mines = final.game_state != GameState.PLAYING
+    position = journal.snapshot_at(start)
+
+    yield json.dumps({
+        "type": "position",
+        "move": start,
+        "size": size,
+        "game_state": position.game_state.value,
+        "revealed": position.cells_in(REVEALED),
+        "flagged": position.cells_in(FLAGGED),
+        "mines": [divmod(i, size) for i, mine in enumerate(final.mines) if mine] if show_mines else None,
+    }).encode() + b"\n"
+
+    elapsed_ms = sum(journal.entry(index).elapsed_ms for index in range(start))
+    for index, entry in enumerate(journal.entries(start), start):
+        elapsed_ms += entry.elapsed_ms
+        move = journal.entry(entry.cell) if entry.action == "undo" else entry
+        yield json.dumps({
+            "type": "move",
+            "move": index + 1,
+            "action": entry.action,
+            "row": move.cell // size,
+            "col": move.cell % size,
+            "changed": [divmod(i, size) for i in move.changed] or [(move.cell // size, move.cell % size)],
+            "game_state": entry.next_state.value,
+            "elapsed_ms": elapsed_ms,
+        }).encode() + b"\n"
+
+
+def replay_response(journal: MoveJournal, start: int) -> StreamingResponse:
+    start = max(0, min(start, len(journal)))
+    return StreamingResponse(replay_lines(journal, start), media_type="application/x-ndjson")
+
+
+@api.sub("/replay/{game_id}").get()
+@in_thread
+def replay_game(game_id: str, start: int = 0):
+    with view_game(game_id) as game:
+        journal = MoveJournal.from_bytes(game.journal.to_bytes())
+    return replay_response(journal, start)
+
+
+@api.sub("/replay/session/{session_id}").get()
+@in_thread
+def replay_session(session_id: int, start: int = 0):
+    db = open_database()
+    try:
+        record = db.load_game_journal(session_id)
+        moves = record.moves if record else None
+    finally:
+        db.close()
 
+    if moves is None:
+        raise HTTPException(problem_status=404, detail="No journal recorded for this session")
+    return replay_response(MoveJournal.from_bytes(moves), start)
 
-@api.sub("/set_api_key").post(to_thread=False)
+
+@api.sub("/set_api_key").post()
+@in_thread
 def set_api_key(request: SetAPIKeyRequest) -> dict:
     api_key = request.api_key.strip()
     
@@ -468,65 +1033,535 @@ def set_api_key(request: SetAPIKeyRequest) -> dict:
     return {"success": True, "session_id": session_id, "message": "API key set successfully"}
 
 
-@api.sub("/remove_api_key").post(to_thread=False)
-def remove_api_key(request: dict) -> dict:
+def forget_api_key(session_id: str) -> bool:
+    try:
+        del API_KEYS[session_id]
+    except KeyError:
+        return False
+    return True
+
+
+@api.sub("/remove_api_key").post()
+async def remove_api_key(request: dict) -> dict:
     session_id = request.get("session_id", "")
     
-    if session_id in API_KEYS:
-        del API_KEYS[session_id]
+    if await run_in_thread(forget_api_key, session_id):
+        # On the event loop: the registry is only used there, and the
+        # assistant's connections are closed on it
         remove_assistant(session_id)
         return {"success": True, "message": "API key removed successfully"}
     
     return {"success": False, "message": "Session not found"}
 
 
-@api.sub("/chat").post()
-async def chat(request: ChatRequest) -> ChatResponse:
-    game_id = request.game_id
-    message = request.message.strip()
-    session_id = request.session_id
-    
-    if not message:
+def plan_chat(
+    game_id: str, assistant: MinesweeperAIAssistant, message: str
+) -> ChatPlan:
+    with view_game(game_id) as game:
+        return assistant.plan(game, message)
+
+
+def chat_api_key(request: ChatRequest) -> str:
+    if not request.message.strip():
         raise HTTPException(problem_status=400, detail="Message cannot be empty")
-    
-    if game_id not in GAMES:
+
+    if request.game_id not in GAMES:
         raise GameNotFoundError()
-    
-    if session_id not in API_KEYS:
+
+    api_key = API_KEYS.get(request.session_id)
+    if api_key is None:
         raise HTTPException(problem_status=400, detail="No API key found for this session")
-    
+    return api_key
+
+
+async def get_chat_assistant(request: ChatRequest) -> MinesweeperAIAssistant:
+    # The game and the key may live in the shared store, look them up in the thread pool
+    api_key = await run_in_thread(chat_api_key, request)
+
+    # Get or create AI assistant for this session
+    return get_or_create_assistant(request.session_id, api_key)
+
+
+@api.sub("/chat").post()
+async def chat(request: ChatRequest) -> ChatResponse:
+    assistant = await get_chat_assistant(request)
+
     try:
-        game = GAMES[game_id]
-        api_key = API_KEYS[session_id]
-        
-        # Get or create AI assistant for this session
-        assistant = get_or_create_assistant(session_id, api_key)
-        
-        # Get AI response
-        response = await assistant.get_assistance(game, message)
-        
+        # Read the board in the thread pool, under the game's lock
+        plan = await run_in_thread(
+            plan_chat, request.game_id, assistant, request.message.strip()
+        )
+
+        # Get AI response without blocking the event loop
+        response = await assistant.answer(plan)
+
         return ChatResponse(response=response, success=True)
-        
+
     except Exception as e:
         return ChatResponse(response=f"Error: {str(e)}", success=False)
 
 
-def create_minesweeper_app() -> Lihil:
-    app = Lihil(root)
+@api.sub("/chat/stream").post()
+async def chat_stream(request: ChatRequest):
+    """Stream the assistant's reply as server-sent events.
+
+    Each event carries ``{"delta": text}``, the last one ``{"done": true}``
+    or ``{"error": message}``.
+    """
+    assistant = await get_chat_assistant(request)
+    plan = await run_in_thread(
+        plan_chat, request.game_id, assistant, request.message.strip()
+    )
+
+    async def events():
+        try:
+            async for delta in assistant.stream_answer(plan):
+                yield f"data: {json.dumps({'delta': delta})}\n\n"
+            yield f"data: {json.dumps({'done': True})}\n\n"
+        except Exception as e:
+            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Debug routes, only answer while profiling is enabled
+TRACE_FORMATS = {"folded": "text/plain", "spans": "text/plain", "pstats": "application/octet-stream"}
+
+
+def require_profiling():
+    if not PROFILER.enabled:
+        raise HTTPException(problem_status=404, detail="Profiling is disabled")
+
+
+@api.sub("/debug/traces").get()
+async def list_traces() -> List[TraceInfo]:
+    require_profiling()
+    return [
+        TraceInfo(
+            trace_id=trace.trace_id,
+            label=trace.label,
+            status=trace.status,
+            duration_ms=round(trace.duration_ms, 3),
+            started_at=trace.started_at.isoformat(),
+            mode=trace.mode,
+            samples=sum(trace.samples.values()),
+            spans=trace.span_summary(),
+        )
+        for trace in reversed(PROFILER.traces)
+    ]
+
+
+@api.sub("/debug/traces/{trace_id}").get()
+async def download_trace(trace_id: int, format: str = "folded"):
+    """A slow request's trace as folded stacks for a flame graph, or a pstats dump."""
+    require_profiling()
+    trace = PROFILER.get(trace_id)
+    if trace is None:
+        raise HTTPException(problem_status=404, detail="Trace not found")
+    if format not in TRACE_FORMATS:
+        raise HTTPException(problem_status=400, detail=f"Format must be one of {', '.join(TRACE_FORMATS)}")
+
+    if format == "pstats":
+        if trace.pstats is None:
+            raise HTTPException(problem_status=404, detail="Trace was not captured with cProfile")
+        body = trace.pstats
+    else:
+        # cProfile traces have no stack samples, their flame graph is built from spans
+        source = "spans" if format == "spans" or trace.pstats is not None else "samples"
+        body = trace.folded(source).encode()
+
+    suffix = "prof" if format == "pstats" else "folded"
+    return Response(
+        body,
+        media_type=TRACE_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="trace-{trace_id}.{suffix}"'},
+    )
+
+
+DEBUG_ENV = "MINESWEEPER_DEBUG"
+ALLOCATIONS = AllocationTracker()
+# game_id -> (version, measurement), so scrapes only re-measure games that changed
+_GAME_MEMORY: Dict[str, Tuple[int, GameMemory]] = {}
+
+
+def require_debug():
+    if not os.environ.get(DEBUG_ENV):
+        raise HTTPException(problem_status=404, detail="Debug routes are disabled")
+
+
+def measure_game(game_id: str, game: MinesweeperGame) -> GameMemory:
+    # Challenge layouts are shared by every player of the challenge
+    shared = {id(game.layout)} if isinstance(game, ChallengeGame) else set()
+    db = 0
+    if game.db_connected:
+        session = game.db.session
+        db = sys.getsizeof(game.db) + sys.getsizeof(session)
+        db += deep_sizeof(list(session.identity_map.values()))
+    return GameMemory(
+        game_id=game_id[:8],
+        kind=type(game).__name__,
+        bytes=deep_sizeof(game, shared, SKIPPED_ATTRIBUTES | {"_db"}) + db,
+        board=deep_sizeof(game.board, shared),
+        journal=deep_sizeof(game.journal),
+        db=db,
+    )
+
+
+def measure_games() -> Tuple[List[GameMemory], bool]:
+    """A measurement per live game, and whether they live in this process."""
+    stored_sizes = getattr(GAMES, "stored_sizes", None)
+    if stored_sizes is not None:
+        return [
+            GameMemory(game_id[:8], "stored", size, 0, 0, 0)
+            for game_id, size in stored_sizes().items()
+        ], False
+
+    measured = []
+    live = GAMES.game_ids()
+    for game_id in live:
+        try:
+            with GAMES.view(game_id) as game:
+                cached = _GAME_MEMORY.get(game_id)
+                if cached is None or cached[0] != game.version:
+                    cached = _GAME_MEMORY[game_id] = (game.version, measure_game(game_id, game))
+        except UnknownGameError:
+            continue
+        measured.append(cached[1])
+    for game_id in _GAME_MEMORY.keys() - set(live):
+        del _GAME_MEMORY[game_id]
+    return measured, True
+
+
+@api.sub("/debug/memory").get()
+@in_thread
+def memory_report(top: int = 10, allocations: bool = False) -> MemoryReport:
+    """Memory held by live games, assistants, API keys and cached renders.
+
+    With ``allocations=true`` the first call starts tracemalloc and later ones
+    return the lines whose allocations changed most since the previous call.
+    """
+    require_debug()
+    # Diffed first, so the snapshot doesn't include this report's own allocations
+    diff = ALLOCATIONS.diff(top) if allocations else []
+    games, resident = measure_games()
+    assistants = AI_ASSISTANTS.items()
+    return MemoryReport(
+        games=len(games),
+        games_bytes=sum(game.bytes for game in games),
+        games_resident=resident,
+        assistants=len(assistants),
+        # The OpenAI client and its connection pool are shared
+        assistants_bytes=sum(
+            deep_sizeof(assistant, skip=SKIPPED_ATTRIBUTES | {"client"}) for _, assistant in assistants
+        ),
+        api_keys=len(API_KEYS),
+        api_keys_bytes=deep_sizeof(API_KEYS) if isinstance(API_KEYS, dict) else 0,
+        renders=len(BOARD_RENDERS),
+        renders_bytes=BOARD_RENDERS.cached_bytes(),
+        largest_games=sorted(games, key=lambda game: game.bytes, reverse=True)[:max(0, top)],
+        traced_bytes=ALLOCATIONS.traced_memory(),
+        allocations=diff,
+    )
+
+
+@api.sub("/debug/memory/allocations").delete()
+@in_thread
+def stop_allocation_tracing() -> dict:
+    require_debug()
+    ALLOCATIONS.stop()
+    return {"success": True}
+
+
+@api.sub("/debug/admission").get()
+async def admission_report() -> List[AdmissionStats]:
+    """Admitted and rejected requests per rate limited endpoint class."""
+    require_debug()
+    return ADMISSION.report()
+
+
+MAX_EXPORT_BATCH = 10_000
+
+
+@api.sub("/export/{table}").get()
+@in_thread
+def export_rows(table: str, format: str = "ndjson", since: str = "", batch_size: int = 1000):
+    """Stream a table for analysis, the rows finished or rewritten after ``since``.
+
+    ``X-Export-Watermark`` is the ``since`` to pass to get the rows written
+    after this export, empty while the table has none.
+    """
+    require_debug()
+    # SQLAlchemy loads on the first request that needs the database
+    from ..data.export import EXPORT_FORMATS, export_bounds, export_table, get_export_table, parse_watermark
+    from ..data.models import get_engine
+
+    if not 1 <= batch_size <= MAX_EXPORT_BATCH:
+        raise HTTPException(problem_status=400, detail=f"batch_size must be between 1 and {MAX_EXPORT_BATCH}")
+    try:
+        start = parse_watermark(since)
+        engine = get_engine()
+        until = export_bounds(engine, get_export_table(table), start)
+        watermark = start if until is None else until
+        chunks = export_table(engine, table, format, start, watermark, batch_size)
+    except ValueError as e:
+        raise HTTPException(problem_status=400, detail=str(e))
+
+    mark = watermark.isoformat() if watermark else ""
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[format],
+        headers={
+            "X-Export-Watermark": mark,
+            "Content-Disposition": f'attachment; filename="{table}-{mark.replace(":", "")}.{format}"',
+        },
+    )
+
+
+# Idle games are dropped and their sessions recorded as quit. Sessions left
+# unfinished without a live game, e.g. by a restart, are quit once they are
+# ORPHAN_TIMEOUT old. Set MINESWEEPER_IDLE_TIMEOUT=0 to keep games forever.
+IDLE_TIMEOUT_ENV = "MINESWEEPER_IDLE_TIMEOUT"
+IDLE_TIMEOUT = float(os.environ.get(IDLE_TIMEOUT_ENV) or 3600)
+ORPHAN_TIMEOUT = 24 * 3600.0
+SWEEP_INTERVAL = 300.0
+SWEEP_REPORTS: Deque[SweepReport] = deque(maxlen=20)
+# session_id -> monotonic time its API key was first seen without an assistant
+_UNUSED_API_KEYS: Dict[str, float] = {}
+
+
+def sweep_idle_games(idle_timeout: float, orphan_timeout: float) -> Tuple[int, int, int, int]:
+    """Drop idle games and quit their sessions; returns (games, quit, dropped, user_games)."""
+    session_ids = []
+    swept = 0
+    for game_id in GAMES.idle_game_ids(idle_timeout):
+        with GAMES.lock_for(game_id):
+            game = GAMES.get(game_id)
+            if game is None:
+                continue
+            if game.game_state == GameState.PLAYING and game.session_id:
+                session_ids.append(game.session_id)
+            GAMES.delete(game_id)
+            game.close()
+        # Its checkpoint goes with the next flush
+        AUTOSAVE.mark_dirty(game_id)
+        BOARD_RENDERS.forget(game_id)
+        _GAME_MEMORY.pop(game_id, None)
+        swept += 1
+
+    live = set(GAMES.game_ids())
+    orphaned = [game_id for game_id in list(USER_GAMES) if game_id not in live]
+    for game_id in orphaned:
+        USER_GAMES.pop(game_id, None)
+
+    # Sessions of the games still being played are not orphans, however old
+    keep: Set[int] = set()
+    for game_id in live:
+        try:
+            with GAMES.view(game_id) as game:
+                if game.session_id:
+                    keep.add(game.session_id)
+        except UnknownGameError:
+            continue
+
+    db = open_database()
+    try:
+        quit, dropped = db.quit_game_sessions(
+            session_ids,
+            started_before=datetime.utcnow() - timedelta(seconds=orphan_timeout),
+            keep=keep,
+        )
+    finally:
+        db.close()
+    return swept, quit, dropped, len(orphaned)
+
+
+def evict_assistants(sessions: Container[str]) -> int:
+    """Drop idle assistants and those of sessions without an API key; returns how many."""
+    assistants = AI_ASSISTANTS.evict_idle()
+    for session_id, _ in AI_ASSISTANTS.items():
+        if session_id not in sessions:
+            assistants += AI_ASSISTANTS.remove(session_id)
+    return assistants
+
+
+def expire_shared_api_keys(idle_timeout: float) -> Tuple[int, Set[str]]:
+    """Expire the keys of a shared store; returns (keys dropped, sessions left)."""
+    removed = API_KEYS.expire(idle_timeout)
+    return removed, set(API_KEYS)
+
+
+def sweep_api_keys(idle_timeout: float) -> Tuple[int, int]:
+    """Drop idle assistants and API keys unused for ``idle_timeout``; returns (keys, assistants)."""
+    assistants = evict_assistants(API_KEYS)
+
+    now = time.monotonic()
+    removed = 0
+    for session_id in list(API_KEYS):
+        if session_id in AI_ASSISTANTS:
+            _UNUSED_API_KEYS.pop(session_id, None)
+        elif now - _UNUSED_API_KEYS.setdefault(session_id, now) >= idle_timeout:
+            del API_KEYS[session_id]
+            del _UNUSED_API_KEYS[session_id]
+            removed += 1
+    for session_id in _UNUSED_API_KEYS.keys() - API_KEYS.keys():
+        del _UNUSED_API_KEYS[session_id]
+    return removed, assistants
+
+
+async def sweep(idle_timeout: float = IDLE_TIMEOUT, orphan_timeout: float = ORPHAN_TIMEOUT) -> SweepReport:
+    """One maintenance pass; the report is also kept in SWEEP_REPORTS."""
+    start = time.perf_counter()
+    games, sessions, dropped, user_games = await asyncio.to_thread(
+        sweep_idle_games, idle_timeout, orphan_timeout
+    )
+    # Assistants are evicted on the event loop, they close their connections on it
+    if isinstance(API_KEYS, dict):
+        api_keys, assistants = sweep_api_keys(idle_timeout)
+    else:
+        # Shared with the other workers, a key expires once none of them used it
+        api_keys, keyed = await asyncio.to_thread(expire_shared_api_keys, idle_timeout)
+        assistants = evict_assistants(keyed)
+    report = SweepReport(
+        swept_at=datetime.now().isoformat(),
+        games=games,
+        sessions_quit=sessions,
+        sessions_dropped=dropped,
+        user_games=user_games,
+        api_keys=api_keys,
+        assistants=assistants,
+        duration_ms=round((time.perf_counter() - start) * 1000, 3),
+    )
+    SWEEP_REPORTS.append(report)
+    return report
+
+
+async def sweep_periodically(interval: float = SWEEP_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            report = await sweep()
+        except Exception as e:
+            print(f"Sweep failed: {e}", file=sys.stderr)
+            continue
+        if report.games or report.sessions_quit or report.sessions_dropped or report.api_keys or report.assistants:
+            print(
+                f"🧹 Swept {report.games} idle games, quit {report.sessions_quit} sessions "
+                f"and dropped {report.sessions_dropped} never played, "
+                f"dropped {report.api_keys} API keys and {report.assistants} assistants"
+            )
+
+
+@api.sub("/debug/sweeps").get()
+async def sweep_reports() -> List[SweepReport]:
+    """What the latest maintenance passes reclaimed, newest first."""
+    require_debug()
+    return list(reversed(SWEEP_REPORTS))
+
+
+AUTOSAVE_REPORTS: Deque[AutosaveReport] = deque(maxlen=20)
+
+
+async def autosave_periodically():
+    while True:
+        await asyncio.sleep(AUTOSAVE.interval)
+        try:
+            report = await asyncio.to_thread(AUTOSAVE.flush, GAMES, USER_GAMES)
+        except Exception as e:
+            print(f"Autosave failed: {e}", file=sys.stderr)
+            continue
+        if report.written or report.removed:
+            AUTOSAVE_REPORTS.append(report)
+
+
+async def recover_games():
+    restored = await asyncio.to_thread(AUTOSAVE.recover, GAMES)
+    USER_GAMES.update((game_id, username) for game_id, username in restored.items() if username)
+    if restored:
+        print(f"♻️ Recovered {len(restored)} games from their autosave checkpoints")
+
+
+@api.sub("/debug/autosave").get()
+async def autosave_reports() -> List[AutosaveReport]:
+    """The latest autosave flushes that wrote or removed checkpoints, newest first."""
+    require_debug()
+    return list(reversed(AUTOSAVE_REPORTS))
+
+
+async def lifespan(app: Lihil):
+    sweeper = asyncio.create_task(sweep_periodically()) if IDLE_TIMEOUT > 0 else None
+    autosaver = None
+    if AUTOSAVE.enabled:
+        await recover_games()
+        autosaver = asyncio.create_task(autosave_periodically())
+    yield
+    if sweeper is not None:
+        sweeper.cancel()
+    if autosaver is not None:
+        autosaver.cancel()
+        # Graceful shutdown, nothing played since the last flush is lost
+        await asyncio.to_thread(AUTOSAVE.flush, GAMES, USER_GAMES)
+    await close_shared_http_client()
+
+
+def create_minesweeper_app(
+    compression: CompressionSettings | None = COMPRESSION,
+    admission: AdmissionController | None = ADMISSION,
+) -> Lihil:
+    # Read static files and the index page once, requests are served from memory
+    STATIC_ASSETS.load()
+    app = Lihil(root, lifespan=lifespan)
+    # Outermost, so that traced time includes compression; idle unless PROFILER is enabled
+    app.add_middleware(lambda app: ProfilingMiddleware(app, PROFILER))
+    if admission is not None:
+        # Before compression, rejected requests should cost as little as possible
+        app.add_middleware(lambda app: AdmissionMiddleware(app, admission))
+    if compression is not None:
+        app.add_middleware(lambda app: CompressionMiddleware(app, compression))
 
     app.include_routes(api)
     app.include_routes(static_routes)
     return app
 
 
-def start_web_server(host="127.0.0.1", port=5000, debug=False):
+def start_web_server(
+    host="127.0.0.1", port=5000, debug=False, workers=1, game_store=None
+):
     import uvicorn
 
-    app = create_minesweeper_app()
+    game_store = game_store or os.environ.get(GAME_STORE_ENV) or "memory"
+    if workers > 1 and game_store == "memory":
+        raise ValueError(
+            "Running more than one worker requires a shared game store, e.g. --game-store sqlite"
+        )
+    # Workers are separate processes, they pick the store up from the environment
+    os.environ[GAME_STORE_ENV] = game_store
+    if debug:
+        os.environ[DEBUG_ENV] = "1"
+
     print(f"🎮 Starting Minesweeper Web Server...")
     print(f"🌐 Server running at http://{host}:{port}")
     print(f"🚀 Opening browser...")
 
+    if workers > 1:
+        uvicorn.run(
+            "src.web.server:create_minesweeper_app",
+            factory=True,
+            host=host,
+            port=port,
+            workers=workers,
+        )
+        return
+
+    global GAMES, API_KEYS
+    GAMES = create_game_store(game_store)
+    API_KEYS = create_api_key_store(game_store)
+    if game_store == "memory":
+        AUTOSAVE.interval = float(os.environ.get(AUTOSAVE_ENV) or DEFAULT_AUTOSAVE_INTERVAL)
+    app = create_minesweeper_app()
     uvicorn.run(
         app, host=host, port=port
     )  # , log_level="info" if debug else "warning")
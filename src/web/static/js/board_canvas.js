@@ -0,0 +1,303 @@
+// Canvas renderer for boards too large for one DOM element per cell.
+//
+// Cell states live in typed arrays. Only the cells inside the viewport are
+// drawn, and between frames only the cells that changed are redrawn: moves
+// mark their changed cells dirty and the next animation frame paints them.
+// Drag to pan, scroll to zoom around the pointer, right-click to flag.
+
+const CANVAS_HIDDEN = 0;
+const CANVAS_REVEALED = 1;
+const CANVAS_FLAGGED = 2;
+
+const CANVAS_MIN_CELL = 4;
+const CANVAS_MAX_CELL = 48;
+const CANVAS_DRAG_THRESHOLD = 5;
+
+const CANVAS_COLORS = {
+    background: '#f8f9fa',
+    hidden: '#e9ecef',
+    hiddenEdge: '#ced4da',
+    revealed: '#ffffff',
+    revealedEdge: '#e9ecef',
+    flagged: '#ffc107',
+    mine: '#dc3545',
+    mineHit: '#ff5252',
+    pending: 'rgba(102, 126, 234, 0.35)',
+    counts: ['', '#007bff', '#28a745', '#dc3545', '#6f42c1', '#fd7e14', '#20c997', '#6c757d', '#495057'],
+};
+
+class CanvasBoard {
+    constructor(container, size, { onReveal, onFlag }) {
+        this.container = container;
+        this.size = size;
+        this.onReveal = onReveal;
+        this.onFlag = onFlag;
+
+        const cells = size * size;
+        this.states = new Uint8Array(cells);
+        this.counts = new Uint8Array(cells);
+        this.mines = new Uint8Array(cells); // 1 mine, 2 the mine that was hit
+        this.pending = new Uint8Array(cells);
+
+        this.dirty = new Set();
+        this.fullRedraw = true;
+        this.frame = null;
+        this.drag = null;
+
+        this.canvas = document.createElement('canvas');
+        this.canvas.className = 'board-canvas';
+        this.context = this.canvas.getContext('2d');
+        container.appendChild(this.canvas);
+
+        this.resize();
+        // Start with the whole board in view, unless its cells would get too small
+        this.cellSize = Math.max(CANVAS_MIN_CELL, Math.min(24, Math.floor(this.width / size)));
+        this.offsetX = 0;
+        this.offsetY = 0;
+        this.clampOffsets();
+
+        this.listeners = [
+            [this.canvas, 'pointerdown', (e) => this.handlePointerDown(e)],
+            [this.canvas, 'pointermove', (e) => this.handlePointerMove(e)],
+            [this.canvas, 'pointerup', (e) => this.handlePointerUp(e)],
+            [this.canvas, 'contextmenu', (e) => this.handleContextMenu(e)],
+            [this.canvas, 'wheel', (e) => this.handleWheel(e)],
+            [window, 'resize', () => { this.resize(); this.invalidate(); }],
+        ];
+        this.listeners.forEach(([target, type, listener]) => {
+            target.addEventListener(type, listener, type === 'wheel' ? { passive: false } : undefined);
+        });
+
+        this.invalidate();
+    }
+
+    destroy() {
+        this.listeners.forEach(([target, type, listener]) => target.removeEventListener(type, listener));
+        if (this.frame !== null) {
+            cancelAnimationFrame(this.frame);
+        }
+        this.canvas.remove();
+    }
+
+    resize() {
+        const ratio = window.devicePixelRatio || 1;
+        this.width = Math.max(200, this.container.clientWidth);
+        this.height = Math.max(200, Math.min(window.innerHeight * 0.7, this.width));
+        this.canvas.style.width = `${this.width}px`;
+        this.canvas.style.height = `${this.height}px`;
+        this.canvas.width = Math.round(this.width * ratio);
+        this.canvas.height = Math.round(this.height * ratio);
+        this.context.setTransform(ratio, 0, 0, ratio, 0, 0);
+    }
+
+    // Cell state as the game logic asks for it
+    getCell(row, col) {
+        const index = row * this.size + col;
+        const states = ['hidden', 'revealed', 'flagged'];
+        return { state: states[this.states[index]], count: this.counts[index] };
+    }
+
+    renderCell(cellData) {
+        const index = cellData.row * this.size + cellData.col;
+        this.states[index] = cellData.state === 'revealed'
+            ? CANVAS_REVEALED
+            : cellData.state === 'flagged' ? CANVAS_FLAGGED : CANVAS_HIDDEN;
+        this.counts[index] = cellData.state === 'revealed' && !cellData.is_mine ? cellData.adjacent_mines : 0;
+        this.mines[index] = cellData.is_mine ? (cellData.mine_hit ? 2 : 1) : 0;
+        this.pending[index] = 0;
+        this.markDirty(index);
+    }
+
+    setPending(row, col) {
+        const index = row * this.size + col;
+        this.pending[index] = 1;
+        this.markDirty(index);
+    }
+
+    // Optimistic flag toggle, returns whether the cell is now flagged
+    toggleFlag(row, col) {
+        const index = row * this.size + col;
+        this.states[index] = this.states[index] === CANVAS_FLAGGED ? CANVAS_HIDDEN : CANVAS_FLAGGED;
+        this.markDirty(index);
+        return this.states[index] === CANVAS_FLAGGED;
+    }
+
+    markDirty(index) {
+        this.dirty.add(index);
+        this.schedule();
+    }
+
+    invalidate() {
+        this.fullRedraw = true;
+        this.schedule();
+    }
+
+    schedule() {
+        if (this.frame === null) {
+            this.frame = requestAnimationFrame(() => this.draw());
+        }
+    }
+
+    visibleRange() {
+        const size = this.cellSize;
+        return {
+            firstRow: Math.max(0, Math.floor(-this.offsetY / size)),
+            lastRow: Math.min(this.size - 1, Math.floor((this.height - this.offsetY) / size)),
+            firstCol: Math.max(0, Math.floor(-this.offsetX / size)),
+            lastCol: Math.min(this.size - 1, Math.floor((this.width - this.offsetX) / size)),
+        };
+    }
+
+    draw() {
+        this.frame = null;
+        const range = this.visibleRange();
+        const visible = (range.lastRow - range.firstRow + 1) * (range.lastCol - range.firstCol + 1);
+
+        // Repainting everything in view is cheaper than many scattered cells
+        if (this.fullRedraw || this.dirty.size > visible / 2) {
+            const ctx = this.context;
+            ctx.fillStyle = CANVAS_COLORS.background;
+            ctx.fillRect(0, 0, this.width, this.height);
+            for (let row = range.firstRow; row <= range.lastRow; row++) {
+                for (let col = range.firstCol; col <= range.lastCol; col++) {
+                    this.drawCell(row, col);
+                }
+            }
+        } else {
+            this.dirty.forEach(index => {
+                const row = Math.floor(index / this.size);
+                const col = index % this.size;
+                if (row >= range.firstRow && row <= range.lastRow && col >= range.firstCol && col <= range.lastCol) {
+                    this.drawCell(row, col);
+                }
+            });
+        }
+
+        this.dirty.clear();
+        this.fullRedraw = false;
+    }
+
+    drawCell(row, col) {
+        const ctx = this.context;
+        const size = this.cellSize;
+        const index = row * this.size + col;
+        const x = this.offsetX + col * size;
+        const y = this.offsetY + row * size;
+        // Leave a gap between cells once they are big enough to see it
+        const gap = size >= 8 ? 1 : 0;
+        const state = this.states[index];
+
+        ctx.fillStyle = state === CANVAS_REVEALED ? CANVAS_COLORS.revealedEdge : CANVAS_COLORS.hiddenEdge;
+        ctx.fillRect(x, y, size, size);
+
+        let fill = CANVAS_COLORS.hidden;
+        if (state === CANVAS_FLAGGED) {
+            fill = CANVAS_COLORS.flagged;
+        } else if (state === CANVAS_REVEALED) {
+            fill = this.mines[index] === 2 ? CANVAS_COLORS.mineHit
+                : this.mines[index] ? CANVAS_COLORS.mine : CANVAS_COLORS.revealed;
+        }
+        ctx.fillStyle = fill;
+        ctx.fillRect(x, y, size - gap, size - gap);
+
+        if (size >= 12) {
+            let text = '';
+            if (state === CANVAS_FLAGGED) {
+                text = '🚩';
+            } else if (state === CANVAS_REVEALED && this.mines[index]) {
+                text = '💣';
+            } else if (state === CANVAS_REVEALED && this.counts[index]) {
+                text = String(this.counts[index]);
+                ctx.fillStyle = CANVAS_COLORS.counts[this.counts[index]];
+            }
+            if (text) {
+                ctx.font = `bold ${Math.floor(size * 0.6)}px sans-serif`;
+                ctx.textAlign = 'center';
+                ctx.textBaseline = 'middle';
+                ctx.fillText(text, x + size / 2, y + size / 2 + 1);
+            }
+        }
+
+        if (this.pending[index]) {
+            ctx.fillStyle = CANVAS_COLORS.pending;
+            ctx.fillRect(x, y, size - gap, size - gap);
+        }
+    }
+
+    // Keep at least part of the board on screen
+    clampOffsets() {
+        const extent = this.size * this.cellSize;
+        const margin = Math.min(extent, 50);
+        this.offsetX = Math.min(this.width - margin, Math.max(margin - extent, this.offsetX));
+        this.offsetY = Math.min(this.height - margin, Math.max(margin - extent, this.offsetY));
+    }
+
+    cellAt(event) {
+        const rect = this.canvas.getBoundingClientRect();
+        const col = Math.floor((event.clientX - rect.left - this.offsetX) / this.cellSize);
+        const row = Math.floor((event.clientY - rect.top - this.offsetY) / this.cellSize);
+        if (row < 0 || col < 0 || row >= this.size || col >= this.size) return null;
+        return { row, col };
+    }
+
+    handlePointerDown(event) {
+        if (event.button !== 0) return;
+        this.drag = {
+            x: event.clientX,
+            y: event.clientY,
+            offsetX: this.offsetX,
+            offsetY: this.offsetY,
+            moved: false,
+        };
+        this.canvas.setPointerCapture(event.pointerId);
+    }
+
+    handlePointerMove(event) {
+        if (!this.drag) return;
+        const dx = event.clientX - this.drag.x;
+        const dy = event.clientY - this.drag.y;
+        if (!this.drag.moved && Math.hypot(dx, dy) < CANVAS_DRAG_THRESHOLD) return;
+
+        this.drag.moved = true;
+        this.offsetX = this.drag.offsetX + dx;
+        this.offsetY = this.drag.offsetY + dy;
+        this.clampOffsets();
+        this.invalidate();
+    }
+
+    handlePointerUp(event) {
+        const drag = this.drag;
+        this.drag = null;
+        if (!drag || drag.moved) return;
+
+        const cell = this.cellAt(event);
+        if (cell) {
+            this.onReveal(cell.row, cell.col);
+        }
+    }
+
+    handleContextMenu(event) {
+        event.preventDefault();
+        const cell = this.cellAt(event);
+        if (cell) {
+            this.onFlag(cell.row, cell.col);
+        }
+    }
+
+    handleWheel(event) {
+        event.preventDefault();
+        const factor = event.deltaY < 0 ? 1.15 : 1 / 1.15;
+        const cellSize = Math.max(CANVAS_MIN_CELL, Math.min(CANVAS_MAX_CELL, this.cellSize * factor));
+        if (cellSize === this.cellSize) return;
+
+        // Zoom around the pointer: the point under it stays put
+        const rect = this.canvas.getBoundingClientRect();
+        const x = event.clientX - rect.left;
+        const y = event.clientY - rect.top;
+        this.offsetX = x - (x - this.offsetX) * (cellSize / this.cellSize);
+        this.offsetY = y - (y - this.offsetY) * (cellSize / this.cellSize);
+        this.cellSize = cellSize;
+        this.clampOffsets();
+        this.invalidate();
+    }
+}
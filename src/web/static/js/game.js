@@ -1,3 +1,6 @@
+// Boards with more cells than this draw on a canvas instead of one element per cell
+const CANVAS_BOARD_CELLS = 2500;
+
 class MinesweeperWeb {
     constructor() {
         this.gameBoard = document.getElementById('game-board');
@@ -9,6 +12,8 @@ class MinesweeperWeb {
         this.overlayMessage = document.getElementById('overlay-message');
         this.winIcon = document.getElementById('win-icon');
         this.loseIcon = document.getElementById('lose-icon');
+        this.customSizeInput = document.getElementById('custom-size');
+        this.customMinesInput = document.getElementById('custom-mines');
         
         // Login elements
         this.loginSection = document.getElementById('login-section');
@@ -36,10 +41,13 @@ class MinesweeperWeb {
         
         this.gameId = null;
         this.gameState = 'playing';
+        this.resetMoves();
+        this.canvasBoard = null;
         this.startTime = null;
         this.timerInterval = null;
         this.currentUsername = null;
         this.aiSessionId = null;
+        this.savedGamesCursor = null;
         
         this.initializeEventListeners();
         this.showLoginSection();
@@ -60,27 +68,13 @@ class MinesweeperWeb {
             btn.addEventListener('click', (e) => {
                 document.querySelectorAll('.difficulty-btn').forEach(b => b.classList.remove('active'));
                 e.target.classList.add('active');
-                
-                const size = parseInt(e.target.dataset.size);
-                const mines = parseInt(e.target.dataset.mines);
-                this.newGame(size, mines);
+                this.newSelectedGame();
             });
         });
         
         // New game buttons
-        document.getElementById('new-game-btn').addEventListener('click', () => {
-            const activeBtn = document.querySelector('.difficulty-btn.active');
-            const size = parseInt(activeBtn.dataset.size);
-            const mines = parseInt(activeBtn.dataset.mines);
-            this.newGame(size, mines);
-        });
-        
-        document.getElementById('overlay-new-game').addEventListener('click', () => {
-            const activeBtn = document.querySelector('.difficulty-btn.active');
-            const size = parseInt(activeBtn.dataset.size);
-            const mines = parseInt(activeBtn.dataset.mines);
-            this.newGame(size, mines);
-        });
+        document.getElementById('new-game-btn').addEventListener('click', () => this.newSelectedGame());
+        document.getElementById('overlay-new-game').addEventListener('click', () => this.newSelectedGame());
         
         // Save/Load functionality
         document.getElementById('save-game-btn').addEventListener('click', () => this.showSaveModal());
@@ -89,6 +83,7 @@ class MinesweeperWeb {
         
         // Cheat functionality
         document.getElementById('cheat-btn').addEventListener('click', () => this.handleCheat());
+        document.getElementById('auto-clear-btn').addEventListener('click', () => this.handleAutoClear());
         
         // AI Chat functionality
         document.getElementById('ai-chat-btn').addEventListener('click', () => this.showAIChat());
@@ -197,6 +192,22 @@ class MinesweeperWeb {
         }
     }
     
+    // Starts a game with the size of the active difficulty button or the custom inputs
+    newSelectedGame() {
+        const activeBtn = document.querySelector('.difficulty-btn.active');
+        if (activeBtn.dataset.custom) {
+            const size = parseInt(this.customSizeInput.value);
+            const mines = parseInt(this.customMinesInput.value);
+            if (!(size >= 5 && size <= parseInt(this.customSizeInput.max)) || !(mines >= 1 && mines < size * size)) {
+                alert(`Custom games need a size from 5 to ${this.customSizeInput.max} and fewer mines than cells`);
+                return;
+            }
+            this.newGame(size, mines);
+        } else {
+            this.newGame(parseInt(activeBtn.dataset.size), parseInt(activeBtn.dataset.mines));
+        }
+    }
+    
     async newGame(size, mines) {
         if (!this.currentUsername) {
             alert('Please login first');
@@ -215,6 +226,7 @@ class MinesweeperWeb {
             const data = await response.json();
             this.gameId = data.game_id;
             this.gameState = 'playing';
+            this.resetMoves();
             
             this.hideOverlay();
             this.resetTimer();
@@ -245,25 +257,35 @@ class MinesweeperWeb {
         this.loadModal.classList.remove('hidden');
     }
     
-    async loadSavedGamesList() {
+    async loadSavedGamesList(append = false) {
         try {
-            const response = await fetch(`/api/saved_games/${this.currentUsername}`);
+            const params = new URLSearchParams();
+            if (append && this.savedGamesCursor) {
+                params.set('cursor', this.savedGamesCursor);
+            }
+            const response = await fetch(`/api/saved_games/${this.currentUsername}?${params}`);
             if (response.ok) {
-                const savedGames = await response.json();
-                this.renderSavedGamesList(savedGames);
+                const page = await response.json();
+                this.savedGamesCursor = page.next_cursor;
+                this.renderSavedGamesList(page.games, append);
             }
         } catch (error) {
             console.error('Error loading saved games:', error);
         }
     }
     
-    renderSavedGamesList(savedGames) {
-        if (savedGames.length === 0) {
+    renderSavedGamesList(savedGames, append = false) {
+        const loadMoreBtn = this.savedGamesList.querySelector('.load-more-btn');
+        if (loadMoreBtn) {
+            loadMoreBtn.remove();
+        }
+        
+        if (savedGames.length === 0 && !append) {
             this.savedGamesList.innerHTML = '<p class="no-saves">No saved games found</p>';
             return;
         }
         
-        this.savedGamesList.innerHTML = savedGames.map(game => `
+        const items = savedGames.map(game => `
             <div class="saved-game-item">
                 <div class="saved-game-info">
                     <h4>${game.game_name}</h4>
@@ -275,6 +297,19 @@ class MinesweeperWeb {
                 </div>
             </div>
         `).join('');
+        
+        if (append) {
+            this.savedGamesList.insertAdjacentHTML('beforeend', items);
+        } else {
+            this.savedGamesList.innerHTML = items;
+        }
+        
+        if (this.savedGamesCursor) {
+            this.savedGamesList.insertAdjacentHTML(
+                'beforeend',
+                '<button class="load-more-btn" onclick="minesweeperGame.loadSavedGamesList(true)">Load more</button>'
+            );
+        }
     }
     
     async handleSaveGame() {
@@ -324,6 +359,7 @@ class MinesweeperWeb {
                 // Extract all the data we need
                 this.gameId = data.game_id;
                 this.gameState = data.game_state;
+                this.resetMoves();
                 
                 // Calculate board size from the board data
                 const size = data.board.length;
@@ -386,7 +422,23 @@ class MinesweeperWeb {
     }
     
     createBoard(size) {
+        if (this.canvasBoard) {
+            this.canvasBoard.destroy();
+            this.canvasBoard = null;
+        }
         this.gameBoard.innerHTML = '';
+        
+        if (size * size > CANVAS_BOARD_CELLS) {
+            this.gameBoard.classList.add('canvas-mode');
+            this.gameBoard.style.gridTemplateColumns = '';
+            this.canvasBoard = new CanvasBoard(this.gameBoard, size, {
+                onReveal: (row, col) => this.revealAt(row, col),
+                onFlag: (row, col) => this.flagAt(row, col),
+            });
+            return;
+        }
+        
+        this.gameBoard.classList.remove('canvas-mode');
         this.gameBoard.style.gridTemplateColumns = `repeat(${size}, 1fr)`;
         
         for (let row = 0; row < size; row++) {
@@ -404,63 +456,70 @@ class MinesweeperWeb {
         }
     }
     
-    async handleCellClick(event) {
+    cellElement(row, col) {
+        return this.gameBoard.querySelector(`[data-row="${row}"][data-col="${col}"]`);
+    }
+    
+    // {state, count} of a cell as currently shown, whichever renderer shows it
+    cellAt(row, col) {
+        if (this.canvasBoard) {
+            return this.canvasBoard.getCell(row, col);
+        }
+        const cell = this.cellElement(row, col);
+        const state = ['revealed', 'flagged'].find(name => cell.classList.contains(name)) || 'hidden';
+        return { state, count: parseInt(cell.dataset.count || '0') };
+    }
+    
+    handleCellClick(event) {
+        this.revealAt(parseInt(event.target.dataset.row), parseInt(event.target.dataset.col));
+    }
+    
+    handleRightClick(event) {
+        event.preventDefault();
+        this.flagAt(parseInt(event.target.dataset.row), parseInt(event.target.dataset.col));
+    }
+    
+    async revealAt(row, col) {
         if (this.gameState !== 'playing') return;
         
-        const row = parseInt(event.target.dataset.row);
-        const col = parseInt(event.target.dataset.col);
+        const cell = this.cellAt(row, col);
+        
+        // Clicking a revealed number chords it
+        if (cell.count) {
+            await this.handleChord(row, col);
+            return;
+        }
+        
+        if (cell.state !== 'hidden') return;
         
         if (!this.startTime) {
             this.startTimer();
         }
         
-        try {
-            const response = await fetch('/api/reveal_cell', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ game_id: this.gameId, row, col })
-            });
-            
-            const data = await response.json();
-            this.updateBoard(data.board);
-            this.updateStats(data.stats);
-            
-            if (data.game_state !== 'playing') {
-                this.endGame(data.game_state);
-                await this.loadUserStats(); // Refresh stats after game ends
-            }
-            
-        } catch (error) {
-            console.error('Error revealing cell:', error);
+        // Shown as pending until the server's answer renders the cell
+        if (this.canvasBoard) {
+            this.canvasBoard.setPending(row, col);
+        } else {
+            this.cellElement(row, col).classList.add('pending');
         }
+        await this.sendSequencedMove('/api/reveal_cell', row, col);
     }
     
-    async handleRightClick(event) {
-        event.preventDefault();
-        
+    async flagAt(row, col) {
         if (this.gameState !== 'playing') return;
         
-        const row = parseInt(event.target.dataset.row);
-        const col = parseInt(event.target.dataset.col);
+        if (this.cellAt(row, col).state === 'revealed') return;
         
-        try {
-            const response = await fetch('/api/toggle_flag', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ game_id: this.gameId, row, col })
-            });
-            
-            const data = await response.json();
-            this.updateBoard(data.board);
-            this.updateStats(data.stats);
-            
-        } catch (error) {
-            console.error('Error toggling flag:', error);
-        }
+        // Flags can't fail on a hidden cell, show them right away
+        const flagged = this.canvasBoard
+            ? this.canvasBoard.toggleFlag(row, col)
+            : this.cellElement(row, col).classList.toggle('flagged');
+        const flagCount = parseInt(this.flagCountEl.textContent) + (flagged ? 1 : -1);
+        const remaining = parseInt(this.mineCountEl.textContent) - (flagged ? 1 : -1);
+        this.flagCountEl.textContent = flagCount;
+        this.mineCountEl.textContent = remaining;
+        
+        await this.sendSequencedMove('/api/toggle_flag', row, col);
     }
     
     async handleCheat() {
@@ -507,34 +566,175 @@ class MinesweeperWeb {
         }
     }
     
+    async handleChord(row, col) {
+        await this.sendSequencedMove('/api/chord', row, col);
+    }
+    
+    async handleAutoClear() {
+        if (this.gameState !== 'playing' || !this.gameId) return;
+        
+        const error = await this.sendDeltaMove('/api/auto_clear', { game_id: this.gameId });
+        if (error) {
+            alert(`Auto-clear: ${error.detail}`);
+        }
+    }
+    
+    // Moves that answer with only the changed cells; returns the error body if rejected
+    async sendDeltaMove(url, body) {
+        try {
+            const response = await fetch(url, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify(body)
+            });
+            
+            if (!response.ok) {
+                return await response.json();
+            }
+            
+            const data = await response.json();
+            data.changed.forEach(cellData => this.renderCell(cellData));
+            this.updateStats(data.stats);
+            
+            if (data.game_state !== 'playing') {
+                this.endGame(data.game_state);
+                await this.loadUserStats();
+            }
+        } catch (error) {
+            console.error(`Error calling ${url}:`, error);
+        }
+        return null;
+    }
+    
+    resetMoves() {
+        this.moveSeq = 0;
+        // Answers are applied in move order: the last one applied, those that came early
+        this.appliedSeq = 0;
+        this.earlyAnswers = new Map();
+    }
+    
+    // Cell moves carry a per-game sequence number, so they are sent without waiting
+    // for earlier ones: the server applies them in order and at most once, and
+    // answers each with the authoritative board (or only its changed cells)
+    async sendSequencedMove(url, row, col) {
+        const gameId = this.gameId;
+        const seq = ++this.moveSeq;
+        // Large boards take only the changed cells, not the whole board per move
+        const delta = this.canvasBoard !== null;
+        let answer = null;
+        
+        try {
+            const response = await fetch(url, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ game_id: gameId, row, col, seq, delta })
+            });
+            
+            // A new game was started meanwhile
+            if (gameId !== this.gameId) return;
+            
+            if (response.ok) {
+                answer = await response.json();
+            } else {
+                await this.refreshBoard();
+            }
+        } catch (error) {
+            console.error(`Error calling ${url}:`, error);
+            if (gameId !== this.gameId) return;
+            await this.refreshBoard();
+        }
+        
+        if (gameId === this.gameId) {
+            await this.settleMove(seq, answer);
+        }
+    }
+    
+    // Every move settles once, with its answer or null when it failed
+    async settleMove(seq, answer) {
+        this.earlyAnswers.set(seq, answer);
+        while (this.earlyAnswers.has(this.appliedSeq + 1)) {
+            const next = ++this.appliedSeq;
+            const data = this.earlyAnswers.get(next);
+            this.earlyAnswers.delete(next);
+            if (data) {
+                await this.applyMoveAnswer(next, data);
+            }
+        }
+    }
+    
+    async applyMoveAnswer(seq, data) {
+        const superseded = seq !== this.moveSeq && data.game_state === 'playing';
+        
+        if (data.board) {
+            // An older snapshot would undo the optimistic updates of moves still in flight
+            if (superseded) return;
+            this.updateBoard(data.board);
+        } else {
+            // A delta holds only the cells its own move changed, none of them may be lost
+            data.changed.forEach(cellData => this.renderCell(cellData));
+        }
+        if (!superseded) {
+            this.updateStats(data.stats);
+        }
+        
+        if (data.game_state !== 'playing' && this.gameState === 'playing') {
+            this.endGame(data.game_state);
+            await this.loadUserStats(); // Refresh stats after game ends
+        }
+    }
+    
+    async refreshBoard() {
+        try {
+            const response = await fetch(`/api/get_board/${this.gameId}`);
+            if (response.ok) {
+                const data = await response.json();
+                this.updateBoard(data.board);
+                this.updateStats(data.stats);
+            }
+        } catch (error) {
+            console.error('Error refreshing board:', error);
+        }
+    }
+    
     updateBoard(boardData) {
         boardData.forEach(row => {
-            row.forEach(cellData => {
-                const cell = document.querySelector(`[data-row="${cellData.row}"][data-col="${cellData.col}"]`);
-                
-                // Reset classes
-                cell.className = 'cell';
-                cell.textContent = '';
-                cell.removeAttribute('data-count');
-                
-                if (cellData.state === 'revealed') {
-                    cell.classList.add('revealed');
-                    if (cellData.is_mine) {
-                        cell.classList.add('mine');
-                        if (cellData.mine_hit) {
-                            cell.classList.add('mine-hit');
-                        }
-                    } else if (cellData.adjacent_mines > 0) {
-                        cell.textContent = cellData.adjacent_mines;
-                        cell.setAttribute('data-count', cellData.adjacent_mines);
-                    }
-                } else if (cellData.state === 'flagged') {
-                    cell.classList.add('flagged');
-                }
-            });
+            row.forEach(cellData => this.renderCell(cellData));
         });
     }
     
+    renderCell(cellData) {
+        if (this.canvasBoard) {
+            this.canvasBoard.renderCell(cellData);
+            return;
+        }
+        
+        const cell = this.cellElement(cellData.row, cellData.col);
+        
+        // Reset classes
+        cell.className = 'cell';
+        cell.textContent = '';
+        cell.removeAttribute('data-count');
+        
+        if (cellData.state === 'revealed') {
+            cell.classList.add('revealed');
+            if (cellData.is_mine) {
+                cell.classList.add('mine');
+                if (cellData.mine_hit) {
+                    cell.classList.add('mine-hit');
+                }
+            } else if (cellData.adjacent_mines > 0) {
+                cell.textContent = cellData.adjacent_mines;
+                cell.setAttribute('data-count', cellData.adjacent_mines);
+            }
+        } else if (cellData.state === 'flagged') {
+            cell.classList.add('flagged');
+        }
+    }
+    
     updateStats(stats) {
         this.flagCountEl.textContent = stats.flag_count;
         this.mineCountEl.textContent = stats.remaining_mines;
@@ -662,7 +862,7 @@ class MinesweeperWeb {
         const loadingId = this.addChatMessage('Thinking...', 'assistant', true);
         
         try {
-            const response = await fetch('/api/chat', {
+            const response = await fetch('/api/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -674,15 +874,52 @@ class MinesweeperWeb {
                 })
             });
             
-            const data = await response.json();
+            if (!response.ok) {
+                const error = await response.json();
+                this.removeChatMessage(loadingId);
+                this.addChatMessage(`Error: ${error.detail}`, 'assistant');
+                return;
+            }
             
-            // Remove loading message
-            this.removeChatMessage(loadingId);
+            // Render the reply as server-sent events arrive
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let reply = '';
+            let messageId = null;
             
-            if (data.success) {
-                this.addChatMessage(data.response, 'assistant');
-            } else {
-                this.addChatMessage(`Error: ${data.response}`, 'assistant');
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                
+                buffer += decoder.decode(value, { stream: true });
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                
+                for (const event of events) {
+                    if (!event.startsWith('data: ')) continue;
+                    const data = JSON.parse(event.slice(6));
+                    
+                    if (data.error) {
+                        reply = `Error: ${data.error}`;
+                    } else if (data.delta) {
+                        reply += data.delta;
+                    } else {
+                        continue;
+                    }
+                    
+                    if (messageId === null) {
+                        this.removeChatMessage(loadingId);
+                        messageId = this.addChatMessage(reply, 'assistant');
+                    } else {
+                        this.updateChatMessage(messageId, reply);
+                    }
+                }
+            }
+            
+            if (messageId === null) {
+                this.removeChatMessage(loadingId);
+                this.addChatMessage('Error: empty response', 'assistant');
             }
             
         } catch (error) {
@@ -720,6 +957,14 @@ class MinesweeperWeb {
         return messageId;
     }
     
+    updateChatMessage(messageId, message) {
+        const messageEl = document.getElementById(messageId);
+        if (messageEl) {
+            messageEl.querySelector('.message-content').innerHTML = `<strong>AI Assistant:</strong> ${message}`;
+            this.chatMessages.scrollTop = this.chatMessages.scrollHeight;
+        }
+    }
+    
     removeChatMessage(messageId) {
         const messageEl = document.getElementById(messageId);
         if (messageEl) {
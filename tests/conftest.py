@@ -0,0 +1,23 @@
+import pytest
+
+from src.domain.minesweeper import MinesweeperGame
+from src.domain.model import CellState
+
+
+@pytest.fixture
+def make_game():
+    """Build a game with mines at ``mines`` and ``revealed`` already open."""
+
+    def make(size, mines, revealed=()):
+        game = MinesweeperGame(size, 0.1, username=None)
+        for row, col in mines:
+            game.board[row][col].is_mine = True
+        game.mine_count = len(mines)
+        game.first_click = False
+        game._calculate_adjacent_mines()
+        for row, col in revealed:
+            game.board[row][col].state = CellState.REVEALED
+            game.revealed_count += 1
+        return game
+
+    return make
@@ -0,0 +1,138 @@
+import asyncio
+
+from starlette.testclient import TestClient
+
+from src.web.admission import AdmissionController, AdmissionPolicy, ConcurrencyGate, TokenBuckets
+from src.data.game_store import InMemoryGameStore
+from src.web import server
+from src.web.server import create_minesweeper_app
+
+
+def controller(**overrides):
+    policy = dict(
+        paths=("/api/new_game", "/api/new_game_with_user"),
+        rate=0.01,
+        burst=2,
+        concurrency=4,
+        max_queue=4,
+        queue_timeout=1.0,
+    )
+    policy.update(overrides)
+    return AdmissionController({"new_game": AdmissionPolicy(**policy)})
+
+
+def test_client_over_its_rate_gets_429_with_retry_after():
+    admission = controller()
+    with TestClient(create_minesweeper_app(admission=admission)) as client:
+        statuses = [
+            client.post("/api/new_game", json={"size": 9, "mines": 10}).status_code
+            for _ in range(3)
+        ]
+        rejected = client.post("/api/new_game", json={"size": 9, "mines": 10})
+        other_user = client.post(
+            "/api/new_game_with_user", json={"size": 9, "mines": 10, "username": "bob"}
+        )
+
+    assert statuses == [200, 200, 429]
+    assert int(rejected.headers["Retry-After"]) >= 1
+    assert rejected.json()["status"] == 429
+    assert other_user.status_code == 200
+    stats = admission.report()[0]
+    assert (stats.admitted, stats.rate_limited, stats.clients) == (3, 2, 2)
+
+
+def test_other_endpoints_are_not_limited():
+    admission = controller(burst=1)
+    with TestClient(create_minesweeper_app(admission=admission)) as client:
+        game_id = client.post("/api/new_game", json={"size": 9, "mines": 10}).json()["game_id"]
+        responses = [
+            client.post("/api/toggle_flag", json={"game_id": game_id, "row": 0, "col": 0})
+            for _ in range(5)
+        ]
+
+    assert {response.status_code for response in responses} == {200}
+
+
+def test_token_bucket_refills_at_its_rate(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("src.web.admission.time.monotonic", lambda: now[0])
+    buckets = TokenBuckets(rate=2.0, burst=2)
+
+    assert [buckets.take("a"), buckets.take("a")] == [0.0, 0.0]
+    assert buckets.take("a") == 0.5
+    now[0] += 0.5
+    assert buckets.take("a") == 0.0
+
+
+def test_gate_queues_up_to_its_limit_and_hands_slots_over():
+    async def scenario():
+        gate = ConcurrencyGate(limit=1, max_queue=1, queue_timeout=1.0)
+        assert await gate.acquire() is None
+        waiting = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0)
+        assert gate.queued == 1
+        assert await gate.acquire() == "queue_full"
+
+        gate.release()
+        assert await waiting is None
+        assert (gate.active, gate.queued) == (1, 0)
+        gate.release()
+        return gate.active
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_gate_gives_up_after_the_queue_timeout():
+    async def scenario():
+        gate = ConcurrencyGate(limit=1, max_queue=4, queue_timeout=0.01)
+        await gate.acquire()
+        refused = await gate.acquire()
+        return refused, gate.queued
+
+    assert asyncio.run(scenario()) == ("queue_timeout", 0)
+
+
+def test_slot_handed_over_as_the_wait_times_out_is_passed_on(monkeypatch):
+    async def scenario():
+        gate = ConcurrencyGate(limit=1, max_queue=4, queue_timeout=1.0)
+        await gate.acquire()
+
+        async def resolved_then_timed_out(waiter, timeout):
+            gate.release()
+            assert waiter.done()
+            raise asyncio.TimeoutError
+
+        monkeypatch.setattr(asyncio, "wait_for", resolved_then_timed_out)
+        refused = await gate.acquire()
+        monkeypatch.undo()
+        return refused, gate.active, await gate.acquire()
+
+    assert asyncio.run(scenario()) == ("queue_timeout", 0, None)
+
+
+def test_rotating_usernames_does_not_escape_the_address_limit(monkeypatch):
+    monkeypatch.setattr(server, "GAMES", InMemoryGameStore())
+    admission = controller(burst=1)
+    with TestClient(create_minesweeper_app(admission=admission)) as client:
+        statuses = [
+            # The name only keys the bucket, new_game ignores it
+            client.post(
+                "/api/new_game", json={"size": 9, "mines": 10, "username": f"user{i}"}
+            ).status_code
+            for i in range(6)
+        ]
+
+    # One client's burst per name, but the address only holds four clients' worth
+    assert statuses == [200, 200, 200, 200, 429, 429]
+    stats = admission.report()[0]
+    assert (stats.clients, stats.addresses) == (4, 1)
+
+
+def test_new_games_are_capped_in_size(monkeypatch):
+    monkeypatch.setattr(server, "GAMES", InMemoryGameStore())
+    with TestClient(create_minesweeper_app(admission=None)) as client:
+        huge = client.post("/api/new_game", json={"size": 100_000, "mines": 10})
+        no_room = client.post("/api/new_game", json={"size": 3, "mines": 9})
+        largest = client.post("/api/new_game", json={"size": 300, "mines": 10_000})
+
+    assert (huge.status_code, no_room.status_code, largest.status_code) == (400, 400, 200)
@@ -0,0 +1,303 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from starlette.testclient import TestClient
+
+from src.domain.ai_assistant import (
+    AI_ASSISTANTS,
+    RESPONSE_CACHE,
+    AssistantRegistry,
+    MinesweeperAIAssistant,
+    is_hint_question,
+)
+from src.domain.minesweeper import MinesweeperGame
+from src.domain.prompt_encoder import estimate_tokens
+from src.web.server import create_minesweeper_app
+from tests.fake_openai import FakeCompletionsServer
+
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    RESPONSE_CACHE.clear()
+
+
+def make_assistant(fake, http_client):
+    return MinesweeperAIAssistant(
+        "sk-test", base_url=fake.base_url, http_client=http_client
+    )
+
+
+def test_get_assistance_against_stand_in():
+    game = MinesweeperGame(9, 10 / 81, username=None)
+
+    async def ask():
+        async with httpx.AsyncClient() as http_client:
+            assistant = make_assistant(fake, http_client)
+            return assistant, await assistant.get_assistance(game, "Where next?")
+
+    with FakeCompletionsServer() as fake:
+        assistant, reply = asyncio.run(ask())
+
+    assert reply == fake.reply
+    messages = fake.requests[0]["messages"]
+    assert messages[0]["role"] == "system"
+    assert messages[1:] == [{"role": "user", "content": "Where next?"}]
+    assert [m["role"] for m in assistant.conversation_history] == ["user", "assistant"]
+
+
+def test_concurrent_chats_do_not_block_each_other():
+    game = MinesweeperGame(9, 10 / 81, username=None)
+    chats = 8
+
+    async def ask_all():
+        async with httpx.AsyncClient() as http_client:
+            # Timed from here, the first assistant loads the OpenAI client's modules
+            assistants = [make_assistant(fake, http_client) for _ in range(chats)]
+            assistants[0].client.chat.completions
+            start = time.perf_counter()
+            replies = await asyncio.gather(
+                *(a.get_assistance(game, f"Question {i}: explain the rules")
+                  for i, a in enumerate(assistants))
+            )
+            return replies, time.perf_counter() - start
+
+    with FakeCompletionsServer(delay=0.3) as fake:
+        replies, elapsed = asyncio.run(ask_all())
+
+    assert replies == [fake.reply] * chats
+    assert fake.max_in_flight > 1
+    assert elapsed < chats * fake.delay / 2
+
+
+def test_stream_yields_deltas():
+    game = MinesweeperGame(9, 10 / 81, username=None)
+
+    async def stream():
+        async with httpx.AsyncClient() as http_client:
+            assistant = make_assistant(fake, http_client)
+            plan = assistant.plan(game, "Explain the rules")
+            deltas = [delta async for delta in assistant.stream_answer(plan)]
+            return assistant, deltas
+
+    with FakeCompletionsServer(reply="Numbers count adjacent mines") as fake:
+        assistant, deltas = asyncio.run(stream())
+
+    assert len(deltas) == 4
+    assert "".join(deltas).strip() == fake.reply
+    assert assistant.conversation_history[-1]["content"].strip() == fake.reply
+
+
+def test_chat_stream_endpoint(monkeypatch):
+    with FakeCompletionsServer(reply="Open the middle") as fake:
+        monkeypatch.setenv("OPENAI_BASE_URL", fake.base_url)
+        with TestClient(create_minesweeper_app()) as client:
+            game_id = client.post("/api/new_game", json={"size": 9, "mines": 10}).json()["game_id"]
+            session_id = client.post("/api/set_api_key", json={"api_key": "sk-test"}).json()["session_id"]
+
+            response = client.post(
+                "/api/chat/stream",
+                json={"game_id": game_id, "message": "Explain the rules", "session_id": session_id},
+            )
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        json.loads(line[len("data: "):])
+        for line in response.text.splitlines()
+        if line.startswith("data: ")
+    ]
+    assert "".join(e.get("delta", "") for e in events).strip() == "Open the middle"
+    assert events[-1] == {"done": True}
+
+
+def test_removing_the_key_closes_the_assistant(monkeypatch):
+    closed = []
+
+    async def aclose(assistant):
+        closed.append(assistant)
+
+    monkeypatch.setattr(MinesweeperAIAssistant, "aclose", aclose)
+    with TestClient(create_minesweeper_app()) as client:
+        game_id = client.post("/api/new_game", json={"size": 9, "mines": 10}).json()["game_id"]
+        session_id = client.post("/api/set_api_key", json={"api_key": "sk-test"}).json()["session_id"]
+        client.post(
+            "/api/chat",
+            json={"game_id": game_id, "message": "Any hint?", "session_id": session_id},
+        )
+        assert session_id in AI_ASSISTANTS
+
+        removed = client.post("/api/remove_api_key", json={"session_id": session_id}).json()
+        again = client.post("/api/remove_api_key", json={"session_id": session_id}).json()
+
+    assert removed["success"] and not again["success"]
+    assert session_id not in AI_ASSISTANTS
+    assert len(closed) == 1
+
+
+def test_hint_questions_are_routed_locally(make_game):
+    assert is_hint_question("What should I click next?")
+    assert is_hint_question("any HINT??")
+    assert not is_hint_question("Why do numbers count diagonals?")
+    assert is_hint_question("Which cell is safe to open?")
+    assert is_hint_question("what should I do next")
+    for question in (
+        "help me understand the rules",
+        "What should I do to improve?",
+        "Which one is better, corners or edges?",
+        "Is it safe to play this at work?",
+    ):
+        assert not is_hint_question(question), question
+
+    revealed = [(row, col) for row in range(1, 4) for col in range(4)]
+    game = make_game(4, [(0, 1), (0, 3)], revealed)
+
+    async def ask():
+        async with httpx.AsyncClient() as http_client:
+            return await make_assistant(fake, http_client).get_assistance(
+                game, "What should I click next?"
+            )
+
+    with FakeCompletionsServer() as fake:
+        reply = asyncio.run(ask())
+
+    assert "(0, 0)" in reply
+    assert fake.requests == []
+
+
+def test_identical_questions_share_one_model_call():
+    game = MinesweeperGame(9, 10 / 81, username=None)
+
+    async def ask():
+        async with httpx.AsyncClient() as http_client:
+            assistants = [make_assistant(fake, http_client) for _ in range(5)]
+            concurrent = await asyncio.gather(
+                *(a.get_assistance(game, "Explain the rules") for a in assistants)
+            )
+            fresh = make_assistant(fake, http_client)
+            later = await fresh.get_assistance(game, "explain the rules!")
+            return concurrent, later
+
+    with FakeCompletionsServer(delay=0.2) as fake:
+        concurrent, later = asyncio.run(ask())
+
+    assert concurrent == [fake.reply] * 5
+    assert later == fake.reply
+    assert len(fake.requests) == 1
+
+
+def test_replies_are_cached_per_conversation_and_key():
+    game = MinesweeperGame(9, 10 / 81, username=None)
+
+    async def ask():
+        async with httpx.AsyncClient() as http_client:
+            first, second = make_assistant(fake, http_client), make_assistant(fake, http_client)
+            await first.get_assistance(game, "Explain the rules")
+            await second.get_assistance(game, "How do flags work?")
+            # The same follow-up, asked in two different conversations
+            await first.get_assistance(game, "Why?")
+            await second.get_assistance(game, "Why?")
+
+            other_key = MinesweeperAIAssistant(
+                "sk-other", base_url=fake.base_url, http_client=http_client
+            )
+            await other_key.get_assistance(game, "Explain the rules")
+
+            # Streamed and plain answers to one question share a model call
+            streaming, plain = make_assistant(fake, http_client), make_assistant(fake, http_client)
+            plan = streaming.plan(game, "What do the numbers mean?")
+            streamed, answered = await asyncio.gather(
+                collect(streaming.stream_answer(plan)),
+                plain.get_assistance(game, "What do the numbers mean?"),
+            )
+            return streamed, answered
+
+    async def collect(deltas):
+        return "".join([delta async for delta in deltas])
+
+    with FakeCompletionsServer(delay=0.1) as fake:
+        streamed, answered = asyncio.run(ask())
+
+    questions = [request["messages"][-1]["content"] for request in fake.requests]
+    assert questions == [
+        "Explain the rules",
+        "How do flags work?",
+        "Why?",
+        "Why?",
+        "Explain the rules",
+        "What do the numbers mean?",
+    ]
+    assert streamed.strip() == answered.strip() == fake.reply
+
+
+def test_errors_are_not_cached():
+    game = MinesweeperGame(9, 10 / 81, username=None)
+
+    async def ask():
+        async with httpx.AsyncClient() as http_client:
+            assistant = MinesweeperAIAssistant(
+                "sk-test", base_url="http://127.0.0.1:9/v1", http_client=http_client
+            )
+            assistant.client = assistant.client.with_options(max_retries=0)
+            return [
+                await assistant.get_assistance(game, "Explain the rules")
+                for _ in range(2)
+            ]
+
+    replies = asyncio.run(ask())
+    assert all(reply.startswith("Sorry") for reply in replies)
+    assert RESPONSE_CACHE.misses == 2
+    assert RESPONSE_CACHE.hits == 0
+
+
+def test_registry_evicts_least_recently_used():
+    async def fill():
+        registry = AssistantRegistry(max_assistants=2)
+        first = registry.get_or_create("a", "sk-test")
+        registry.get_or_create("b", "sk-test")
+        registry.get_or_create("a", "sk-test")
+        registry.get_or_create("c", "sk-test")
+        await asyncio.sleep(0)
+        return registry, first
+
+    registry, first = asyncio.run(fill())
+    assert "a" in registry and "c" in registry and "b" not in registry
+    assert len(registry) == 2
+    assert registry.evictions == 1
+    assert registry.get_or_create("a", "sk-test") is first
+
+
+def test_registry_drops_idle_assistants():
+    async def fill():
+        registry = AssistantRegistry(idle_ttl=0.05)
+        owned = MinesweeperAIAssistant("sk-test", share_connection_pool=False)
+        registry._assistants["old"] = (time.monotonic(), owned)
+        await asyncio.sleep(0.1)
+        registry.get_or_create("new", "sk-test")
+        await asyncio.sleep(0)
+        return registry, owned
+
+    registry, owned = asyncio.run(fill())
+    assert "old" not in registry and "new" in registry
+    assert owned.client.is_closed()
+
+
+def test_conversation_memory_is_trimmed_and_summarized():
+    game = MinesweeperGame(9, 10 / 81, username=None)
+    assistant = MinesweeperAIAssistant("sk-test", memory_tokens=100, summary_tokens=60)
+
+    for i in range(50):
+        assistant.plan(game, f"Question {i}: " + "why " * 20)
+        assistant._remember("assistant", f"Answer {i}: " + "because " * 20)
+
+    history_tokens = sum(estimate_tokens(m["content"]) for m in assistant.conversation_history)
+    assert history_tokens <= 100
+    assert sum(estimate_tokens(line) for line in assistant.summary_lines) <= 60
+    assert assistant.conversation_history[-1]["content"].startswith("Answer 49")
+
+    messages = assistant.plan(game, "And now?").messages
+    assert messages[1]["role"] == "system"
+    assert messages[1]["content"].startswith("Summary of the earlier conversation")
+    assert "Answer 0:" not in messages[1]["content"]
+    assert messages[-1] == {"role": "user", "content": "And now?"}
@@ -0,0 +1,91 @@
+import pytest
+from starlette.testclient import TestClient
+
+from src.data.game_store import InMemoryGameStore
+from src.data.models import GameCheckpoint, get_engine
+from src.domain.minesweeper import MinesweeperGame
+from src.domain.model import CellState, GameState
+from src.web import server
+from src.web.autosave import Autosaver
+
+
+@pytest.fixture
+def autosaver(tmp_path):
+    return Autosaver(str(tmp_path / "autosave.db"), interval=3600)
+
+
+def checkpoints(autosaver):
+    with get_engine(autosaver.db_path).connect() as conn:
+        return {row.game_id: row for row in conn.execute(GameCheckpoint.__table__.select())}
+
+
+def test_dirty_games_are_written_once_until_they_change(autosaver):
+    store = InMemoryGameStore()
+    store.put("g1", MinesweeperGame(9, 0.1, username=None))
+    store.put("g2", MinesweeperGame(9, 0.1, username=None))
+    for _ in range(3):
+        with store.checkout("g1") as game:
+            game.toggle_flag(0, 0)
+        autosaver.mark_dirty("g1")
+
+    first = autosaver.flush(store, {"g1": "alice"})
+    autosaver.mark_dirty("g1")
+    second = autosaver.flush(store, {})
+
+    assert (first.written, first.unchanged) == (1, 0)
+    assert (second.written, second.unchanged) == (0, 1)
+    saved = checkpoints(autosaver)
+    assert list(saved) == ["g1"]
+    assert (saved["g1"].version, saved["g1"].username) == (3, "alice")
+
+
+def test_finished_and_dropped_games_lose_their_checkpoint(autosaver):
+    store = InMemoryGameStore()
+    for game_id in ("won", "dropped", "playing"):
+        store.put(game_id, MinesweeperGame(9, 0.1, username=None))
+        with store.checkout(game_id) as game:
+            game.toggle_flag(0, 0)
+        autosaver.mark_dirty(game_id)
+    autosaver.flush(store, {})
+
+    with store.checkout("won") as game:
+        game.game_state = GameState.WON
+    store.delete("dropped")
+    autosaver.mark_dirty("won")
+    autosaver.mark_dirty("dropped")
+    report = autosaver.flush(store, {})
+
+    assert report.removed == 2
+    assert list(checkpoints(autosaver)) == ["playing"]
+
+
+def test_recover_puts_checkpointed_games_back(autosaver):
+    store = InMemoryGameStore()
+    store.put("g1", MinesweeperGame(9, 0.1, username=None))
+    with store.checkout("g1") as game:
+        game.toggle_flag(2, 3)
+    autosaver.mark_dirty("g1")
+    autosaver.flush(store, {"g1": "alice"})
+
+    restarted = InMemoryGameStore()
+    restored = Autosaver(autosaver.db_path, interval=3600).recover(restarted)
+
+    assert restored == {"g1": "alice"}
+    assert restarted.get("g1").board[2][3].state == CellState.FLAGGED
+
+
+def test_server_flushes_on_shutdown_and_recovers_on_startup(autosaver, monkeypatch):
+    monkeypatch.setattr(server, "AUTOSAVE", autosaver)
+    monkeypatch.setattr(server, "GAMES", InMemoryGameStore())
+    monkeypatch.setattr(server, "USER_GAMES", {})
+    with TestClient(server.create_minesweeper_app()) as client:
+        game_id = client.post("/api/new_game", json={"size": 9, "mines": 10}).json()["game_id"]
+        client.post("/api/toggle_flag", json={"game_id": game_id, "row": 4, "col": 5})
+
+    assert list(checkpoints(autosaver)) == [game_id]
+
+    monkeypatch.setattr(server, "GAMES", InMemoryGameStore())
+    with TestClient(server.create_minesweeper_app()) as client:
+        state = client.get(f"/api/get_board/{game_id}")
+
+    assert state.status_code == 200
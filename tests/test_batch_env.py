@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src.domain.batch_env import REWARD_INVALID, REWARD_LOSS, BatchMinesweeperEnv
+from src.domain.model import CellState
+
+
+def test_first_reveal_is_safe_and_places_all_mines():
+    env = BatchMinesweeperEnv(64, size=9, mine_count=10, seed=0)
+    env.reset()
+    result = env.step(np.full(64, 4 * 9 + 4))
+
+    assert not result.dones.any()
+    assert (env.mines.sum(axis=(1, 2)) == 10).all()
+    assert not env.mines[:, 4, 4].any()
+    assert (result.observation["numbers"][:, 4, 4] >= 0).all()
+
+
+def test_reveals_match_minesweeper_game(make_game):
+    random.seed(1)
+    env = BatchMinesweeperEnv(1, size=12, mine_count=20, seed=1)
+    for _ in range(20):
+        mines = random.sample([(r, c) for r in range(12) for c in range(12)], 20)
+        game = make_game(12, mines)
+        layout = np.zeros((12, 12), dtype=bool)
+        for row, col in mines:
+            layout[row, col] = True
+        env.load_layout(0, layout)
+
+        for _ in range(10):
+            row, col = random.randrange(12), random.randrange(12)
+            if game.board[row][col].is_mine or game.board[row][col].state != CellState.HIDDEN:
+                continue
+            game.reveal_cell(row, col)
+            result = env.step([row * 12 + col])
+            if result.dones[0]:
+                break
+            revealed = np.array([[cell.state == CellState.REVEALED for cell in r] for r in game.board])
+            assert (env.revealed[0] == revealed).all()
+            assert env.revealed_count[0] == game.revealed_count
+
+
+def test_flags_block_reveals_and_mines_end_the_game():
+    env = BatchMinesweeperEnv(2, size=3, mine_count=1, seed=0)
+    layout = np.zeros((3, 3), dtype=bool)
+    layout[0, 0] = True
+    env.load_layout(0, layout)
+    env.load_layout(1, layout)
+
+    env.step([9 + 8, 9 + 8])  # flag (2, 2) on both
+    result = env.step([8, 0])
+
+    assert result.rewards[0] == REWARD_INVALID
+    assert result.rewards[1] == REWARD_LOSS
+    assert list(result.dones) == [False, True]
+    # The finished board was reset
+    assert result.observation["hidden"][1].all()
+    assert not env.placed[1]
+
+
+def test_winning_resets_the_board():
+    env = BatchMinesweeperEnv(1, size=3, mine_count=1, seed=0)
+    layout = np.zeros((3, 3), dtype=bool)
+    layout[0, 0] = True
+    env.load_layout(0, layout)
+
+    result = env.step([8])
+    assert result.won[0] and result.dones[0]
@@ -0,0 +1,81 @@
+import pickle
+import random
+
+from starlette.testclient import TestClient
+
+from src.domain.challenge import ChallengeGame, get_challenge_layout
+from src.domain.model import CellState, GameState
+from src.web.server import create_minesweeper_app
+
+CHALLENGE = "daily-2025-01-31"
+
+
+def states(game):
+    return [[cell.state for cell in row] for row in game.board]
+
+
+def test_games_share_one_layout():
+    first, second = ChallengeGame(CHALLENGE), ChallengeGame(CHALLENGE)
+
+    assert first.layout is second.layout is get_challenge_layout(CHALLENGE)
+    assert sum(first.layout.mines) == first.mine_count == 40
+    assert states(first) == states(second)
+    assert first.revealed_count > 1  # the start cell is a zero and opens its region
+
+    second.toggle_flag(*next((r, c) for r in range(16) for c in range(16)
+                             if second.board[r][c].state == CellState.HIDDEN))
+    assert states(first) != states(second)
+    assert not first.journal.can_undo
+
+
+def test_reveals_match_minesweeper_game(make_game):
+    random.seed(2)
+    challenge = ChallengeGame(CHALLENGE)
+    layout = challenge.layout
+    mines = [divmod(i, 16) for i, mine in enumerate(layout.mines) if mine]
+    game = make_game(16, mines)
+    game.reveal_cell(*divmod(layout.start, 16))
+    assert states(game) == states(challenge)
+
+    for _ in range(300):
+        row, col = random.randrange(16), random.randrange(16)
+        if game.board[row][col].is_mine:
+            continue
+        if random.random() < 0.3:
+            assert challenge.toggle_flag(row, col) == game.toggle_flag(row, col)
+        else:
+            assert challenge.reveal_cell(row, col) == game.reveal_cell(row, col)
+        assert states(challenge) == states(game)
+        assert challenge.revealed_count == game.revealed_count
+        assert challenge.game_state == game.game_state
+
+
+def test_pickle_keeps_only_the_state_plane(make_game):
+    game = ChallengeGame(CHALLENGE)
+    data = pickle.dumps(game)
+    restored = pickle.loads(data)
+
+    assert restored.layout is game.layout
+    assert states(restored) == states(game)
+    assert len(data) < len(pickle.dumps(make_game(16, [])))
+
+
+def test_challenge_results():
+    with TestClient(create_minesweeper_app()) as client:
+        started = client.post(
+            "/api/challenge/new", json={"username": "challenger", "challenge_id": CHALLENGE}
+        ).json()
+        assert started["challenge_id"] == CHALLENGE
+
+        state = started["game_state"]
+        while state == GameState.PLAYING.value:
+            state = client.post("/api/cheat", json={"game_id": started["game_id"]}).json()["game_state"]
+
+        results = client.get(f"/api/challenge/{CHALLENGE}/results").json()
+        unknown = client.post("/api/challenge/new", json={"challenge_id": "weekly-1"})
+
+    assert state == "won"
+    assert {"username": "challenger", "result": "won"}.items() <= next(
+        r for r in results if r["username"] == "challenger"
+    ).items()
+    assert unknown.status_code == 404
@@ -0,0 +1,50 @@
+import gzip
+
+from starlette.testclient import TestClient
+
+from src.web.compression import CompressionSettings
+from src.web.server import BOARD_RENDERS, create_minesweeper_app
+
+
+def test_choose_follows_q_values_and_availability():
+    settings = CompressionSettings(codings=("br", "gzip"))
+    assert settings.choose("gzip, br") == "br"
+    assert settings.choose("br;q=0.5, gzip") == "gzip"
+    assert settings.choose("zstd, identity") is None
+    assert settings.choose("*") == "br"
+    assert settings.choose("") is None
+
+
+def test_board_responses_are_compressed_once_per_version():
+    BOARD_RENDERS.clear()
+    with TestClient(create_minesweeper_app()) as client:
+        game_id = client.post("/api/new_game", json={"size": 16, "mines": 40}).json()["game_id"]
+        plain = client.get(f"/api/get_board/{game_id}", headers={"Accept-Encoding": "identity"})
+        first = client.get(f"/api/get_board/{game_id}", headers={"Accept-Encoding": "gzip"})
+        misses = BOARD_RENDERS.misses
+        second = client.get(f"/api/get_board/{game_id}", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["vary"] == "Accept-Encoding"
+    assert first.headers["content-encoding"] == "gzip"
+    assert int(first.headers["content-length"]) < len(plain.content) // 5
+    assert first.content == second.content == plain.content  # decoded by the client
+    assert BOARD_RENDERS.misses == misses
+
+
+def test_small_and_streamed_bodies():
+    with TestClient(create_minesweeper_app()) as client:
+        game_id = client.post("/api/new_game", json={"size": 9, "mines": 10}).json()["game_id"]
+        small = client.post(
+            "/api/toggle_flag",
+            json={"game_id": game_id, "row": 0, "col": 0},
+            headers={"Accept-Encoding": "gzip"},
+        )
+        with client.stream(
+            "GET", f"/api/replay/{game_id}", headers={"Accept-Encoding": "gzip"}
+        ) as replay:
+            raw = b"".join(replay.iter_raw())
+
+    assert small.status_code == 200
+    assert replay.headers["content-encoding"] == "gzip"
+    assert b'"type": "position"' in gzip.decompress(raw)
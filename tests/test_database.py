@@ -0,0 +1,151 @@
+import pytest
+from src.data.models import GameDatabase, GameSession
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = GameDatabase(str(tmp_path / "test.db"))
+    yield database
+    database.close()
+
+
+def _save(db, user, name):
+    return db.save_game(
+        user_id=user.id,
+        game_name=name,
+        board_size=9,
+        mine_count=10,
+        difficulty="beginner",
+        game_state="playing",
+        board_data="v2:board",
+        revealed_count=0,
+        flag_count=0,
+        first_click=True,
+    )
+
+
+def test_saved_games_listing_skips_board_data(db):
+    user = db.get_or_create_user("lister")
+    _save(db, user, "first")
+    user_id = user.id
+    db.session.expunge_all()
+
+    (saved_game,) = db.get_user_saved_games(user_id)
+    assert saved_game.game_name == "first"
+    assert "board_data" not in saved_game.__dict__
+
+
+def test_saved_games_cursor_pagination(db):
+    user = db.get_or_create_user("pager")
+    for i in range(5):
+        _save(db, user, f"save-{i}")
+
+    seen = []
+    before = None
+    while True:
+        page = db.get_user_saved_games(user.id, limit=2, before=before)
+        if not page:
+            break
+        seen.extend(sg.game_name for sg in page)
+        before = (page[-1].saved_at, page[-1].id)
+
+    assert seen == [f"save-{i}" for i in reversed(range(5))]
+
+
+def test_quit_game_sessions_updates_only_unfinished_ones(db):
+    user = db.get_or_create_user("quitter")
+    unfinished = db.create_game_session(user.id, 9, 10, "beginner").id
+    db.update_game_session(unfinished, cells_revealed=5)
+    finished = db.create_game_session(user.id, 9, 10, "beginner").id
+    db.finish_game_session(finished, "won", cells_revealed=71, flags_used=10)
+
+    assert db.quit_game_sessions([unfinished, finished]) == (1, 0)
+    db.session.expire_all()
+    assert [(s.result, s.is_completed) for s in db.session.query(GameSession).order_by(GameSession.id)] == [
+        ("quit", True),
+        ("won", True),
+    ]
+
+
+def test_quit_game_sessions_deletes_never_played_ones(db):
+    user = db.get_or_create_user("browser")
+    unplayed = db.create_game_session(user.id, 9, 10, "beginner").id
+    saved = db.create_game_session(user.id, 9, 10, "beginner").id
+    db.save_game_journal(saved, b"", 0)
+
+    assert db.quit_game_sessions([unplayed, saved]) == (1, 1)
+    db.session.expire_all()
+    assert db.session.get(GameSession, unplayed) is None
+    assert db.session.get(GameSession, saved).result == "quit"
+    assert db.get_user_stats(user.id)["quit_games"] == 1
+
+
+def _finished(db, user, difficulty, result, duration, cells):
+    session_id = db.create_game_session(user.id, 9, 10, difficulty).id
+    db.finish_game_session(session_id, result, cells_revealed=cells, flags_used=0)
+    db.update_game_session(session_id, duration_seconds=duration)
+    return session_id
+
+
+def test_stats_are_aggregated_per_difficulty(db):
+    user = db.get_or_create_user("aggregator")
+    _finished(db, user, "beginner", "won", 30.0, 71)
+    _finished(db, user, "beginner", "lost", 10.0, 9)
+    _finished(db, user, "expert", "won", 300.0, 385)
+    db.create_game_session(user.id, 9, 10, "beginner")  # still playing
+
+    stats = db.get_user_stats(user.id)
+
+    assert (stats["total_games"], stats["won_games"], stats["lost_games"]) == (3, 2, 1)
+    assert stats["win_rate"] == 66.67
+    assert stats["best_duration_seconds"] == 30.0
+    assert stats["avg_cells_revealed"] == 155.0
+    beginner, expert = sorted(stats["by_difficulty"], key=lambda row: row["difficulty"])
+    assert beginner == {
+        "difficulty": "beginner",
+        "total_games": 2,
+        "won_games": 1,
+        "lost_games": 1,
+        "quit_games": 0,
+        "win_rate": 50.0,
+        "avg_duration_seconds": 20.0,
+        "best_duration_seconds": 30.0,
+        "avg_cells_revealed": 40.0,
+    }
+    assert expert["best_duration_seconds"] == 300.0
+
+
+def test_quit_games_count_apart_from_win_rate_and_durations(db):
+    user = db.get_or_create_user("abandoner")
+    _finished(db, user, "beginner", "won", 30.0, 71)
+    _finished(db, user, "beginner", "lost", 10.0, 9)
+    # Swept a day after it was left open
+    _finished(db, user, "beginner", "quit", 86400.0, 20)
+
+    stats = db.get_user_stats(user.id)
+
+    assert (stats["total_games"], stats["quit_games"]) == (3, 1)
+    assert stats["win_rate"] == 50.0
+    assert stats["avg_duration_seconds"] == 20.0
+    assert stats["by_difficulty"][0]["avg_duration_seconds"] == 20.0
+    assert stats["by_difficulty"][0]["win_rate"] == 50.0
+
+
+def test_stats_cache_is_invalidated_when_a_game_finishes(db):
+    user = db.get_or_create_user("cached")
+    _finished(db, user, "beginner", "won", 30.0, 71)
+    assert db.get_user_stats(user.id)["total_games"] == 1
+    assert db.get_game_stats()["total_games"] == 1
+
+    # Served from the cache until a game finishes
+    db.update_game_session(1, result="lost")
+    assert db.get_user_stats(user.id)["won_games"] == 1
+
+    _finished(db, user, "beginner", "won", 20.0, 71)
+    assert db.get_user_stats(user.id)["total_games"] == 2
+    assert db.get_game_stats()["won_games"] == 1
+
+    quit = db.create_game_session(user.id, 9, 10, "beginner").id
+    db.update_game_session(quit, cells_revealed=3)
+    db.quit_game_sessions([quit])
+    assert db.get_user_stats(user.id)["quit_games"] == 1
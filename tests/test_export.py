@@ -0,0 +1,94 @@
+import base64
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from starlette.testclient import TestClient
+
+from src.data import models
+from src.data.export import export_bounds, export_table, get_export_table, iter_batches
+from src.data.models import GameDatabase, get_engine
+from src.web import server
+from src.web.server import create_minesweeper_app
+
+START = datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "export.db")
+    db = GameDatabase(path)
+    user = db.get_or_create_user("analyst")
+    for _ in range(6):
+        session = db.create_game_session(user.id, 9, 10, "beginner")
+    # Sessions 1-5 finished a minute apart, in reverse order of their ids; 6 is still played
+    for minute, session_id in enumerate(range(5, 0, -1)):
+        db.update_game_session(
+            session_id, result="won", is_completed=True, end_time=START + timedelta(minutes=minute)
+        )
+    db.save_game_journal(1, b"\x01\x02moves", 2)
+    db.close()
+    return path
+
+
+def test_finished_rows_come_in_batches_after_the_watermark(db_path):
+    engine = get_engine(db_path)
+    sessions = get_export_table("sessions")
+
+    batches = list(iter_batches(engine, sessions, since=START, batch_size=2))
+    assert [[row[0] for row in batch] for batch in batches] == [[4, 3], [2, 1]]
+    assert export_bounds(engine, sessions) == START + timedelta(minutes=4)
+    assert export_bounds(engine, sessions, since=START + timedelta(minutes=4)) is None
+
+
+def test_sessions_finished_after_an_export_are_exported_next_time(db_path):
+    engine = get_engine(db_path)
+    sessions = get_export_table("sessions")
+    watermark = export_bounds(engine, sessions)
+    first = [row[0] for batch in iter_batches(engine, sessions, until=watermark) for row in batch]
+
+    db = GameDatabase(db_path)
+    db.finish_game_session(6, "lost", cells_revealed=3, flags_used=0)
+    db.close()
+    later = [
+        row[0] for batch in iter_batches(engine, sessions, since=watermark, until=export_bounds(engine, sessions))
+        for row in batch
+    ]
+
+    assert first == [5, 4, 3, 2, 1]
+    assert later == [6]
+
+
+def test_ndjson_and_csv_exports(db_path):
+    engine = get_engine(db_path)
+
+    lines = b"".join(export_table(engine, "sessions", "ndjson", since=START + timedelta(minutes=2))).decode()
+    rows = [json.loads(line) for line in lines.splitlines()]
+    assert [row["id"] for row in rows] == [2, 1]
+    assert rows[1]["result"] == "won" and rows[1]["is_completed"] is True
+
+    text = b"".join(export_table(engine, "sessions", "csv", until=START + timedelta(minutes=1))).decode()
+    header, *records = list(csv.reader(io.StringIO(text)))
+    assert header[:3] == ["id", "user_id", "board_size"]
+    assert [record[0] for record in records] == ["5", "4"]
+
+    (journal,) = [json.loads(line) for line in b"".join(export_table(engine, "journals")).splitlines()]
+    assert base64.b64decode(journal["moves"]) == b"\x01\x02moves"
+
+
+def test_export_endpoint_streams_with_a_watermark(db_path, monkeypatch):
+    monkeypatch.setenv(server.DEBUG_ENV, "1")
+    monkeypatch.setattr(models, "get_engine", lambda: get_engine(db_path))
+
+    since = (START + timedelta(minutes=1)).isoformat()
+    with TestClient(create_minesweeper_app()) as client:
+        response = client.get("/api/export/sessions", params={"since": since, "batch_size": 1})
+        invalid = client.get("/api/export/sessions", params={"since": "yesterday"})
+        unknown = client.get("/api/export/users")
+
+    assert response.headers["X-Export-Watermark"] == (START + timedelta(minutes=4)).isoformat()
+    assert response.headers["Content-Type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [3, 2, 1]
+    assert (invalid.status_code, unknown.status_code) == (400, 400)
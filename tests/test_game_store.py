@@ -0,0 +1,194 @@
+import threading
+
+import pytest
+from src.data.game_store import (
+    InMemoryGameStore,
+    SQLiteGameStore,
+    StaleGameError,
+    UnknownGameError,
+    create_api_key_store,
+    create_game_store,
+)
+from src.data.models import GameDatabase, GameSession, get_engine
+from src.domain.minesweeper import MinesweeperGame
+from src.domain.model import CellState, GameState
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "games.db")
+
+
+def test_create_game_store():
+    assert isinstance(create_game_store(None), InMemoryGameStore)
+    assert isinstance(create_game_store("memory"), InMemoryGameStore)
+    with pytest.raises(ValueError):
+        create_game_store("redis://localhost")
+
+
+def test_in_memory_checkout_returns_same_game():
+    store = InMemoryGameStore()
+    store["g1"] = "game"
+
+    with store.checkout("g1") as game:
+        assert game == "game"
+    assert "g1" in store
+    assert len(store) == 1
+
+    with pytest.raises(UnknownGameError):
+        with store.checkout("missing"):
+            pass
+
+
+def test_checkout_serializes_same_game_only():
+    store = InMemoryGameStore()
+    store["g1"] = "game one"
+    store["g2"] = "game two"
+    entered = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def hold_g1():
+        with store.checkout("g1"):
+            entered.set()
+            release.wait(timeout=5)
+            order.append("first")
+
+    def wait_for_g1():
+        with store.checkout("g1"):
+            order.append("second")
+
+    holder = threading.Thread(target=hold_g1)
+    holder.start()
+    entered.wait(timeout=5)
+    waiter = threading.Thread(target=wait_for_g1)
+    waiter.start()
+
+    # Other games are not blocked by the held lock
+    with store.view("g2") as game:
+        assert game == "game two"
+
+    release.set()
+    holder.join(timeout=5)
+    waiter.join(timeout=5)
+    assert order == ["first", "second"]
+
+
+def test_sqlite_store_persists_mutations(db_path):
+    store = SQLiteGameStore(db_path)
+    store["g1"] = MinesweeperGame(5, 0.2, username="store_user", db=GameDatabase(db_path))
+
+    with store.checkout("g1") as game:
+        assert game.toggle_flag(0, 0)
+
+    # A second store on the same file behaves like another worker
+    other_worker = SQLiteGameStore(db_path)
+    game = other_worker["g1"]
+    assert game.get_cell_info(0, 0).state == CellState.FLAGGED
+    assert game.flag_count == 1
+    assert game.user.username == "store_user"
+
+
+def test_sqlite_store_rejects_stale_write(db_path):
+    store = SQLiteGameStore(db_path)
+    store["g1"] = MinesweeperGame(5, 0.2, username=None, db=GameDatabase(db_path))
+
+    with pytest.raises(StaleGameError):
+        with store.checkout("g1") as game:
+            # Another worker writes the game while this one holds a copy
+            with store.checkout("g1") as concurrent:
+                concurrent.toggle_flag(1, 1)
+            game.toggle_flag(0, 0)
+
+    game = store["g1"]
+    assert game.get_cell_info(1, 1).state == CellState.FLAGGED
+    assert game.get_cell_info(0, 0).state == CellState.HIDDEN
+
+
+def test_sqlite_store_delete(db_path):
+    store = SQLiteGameStore(db_path)
+    store["g1"] = MinesweeperGame(5, 0.2, username=None, db=GameDatabase(db_path))
+
+    assert store.game_ids() == ["g1"]
+    del store["g1"]
+    assert "g1" not in store
+    assert store.get("g1") is None
+
+
+def test_sqlite_store_reads_hold_no_connection(db_path):
+    store = SQLiteGameStore(db_path)
+    game = MinesweeperGame(5, 0.2, username="store_user", db=GameDatabase(db_path))
+    store["g1"] = game
+    game.close()
+
+    for _ in range(20):
+        assert store.get("g1").user.username == "store_user"
+        with store.view("g1") as game:
+            assert game.flag_count == 0
+
+    assert get_engine(db_path).pool.checkedout() == 0
+
+
+def test_api_keys_are_shared_between_workers(db_path):
+    assert create_api_key_store("memory") == {}
+    keys = create_api_key_store(f"sqlite:///{db_path}")
+    keys["s1"] = "sk-one"
+    keys["s2"] = "sk-two"
+
+    other_worker = create_api_key_store(f"sqlite:///{db_path}")
+    assert other_worker["s1"] == "sk-one"
+    assert sorted(other_worker) == ["s1", "s2"]
+
+    del other_worker["s2"]
+    assert "s2" not in keys
+    with pytest.raises(KeyError):
+        del keys["s2"]
+
+    # Nothing was used in the last hour, but everything in the last moment
+    assert keys.expire(3600) == 0
+    assert keys.expire(0) == 1
+    assert len(other_worker) == 0
+
+
+def test_locks_are_not_kept_for_missing_games(db_path):
+    for store in (InMemoryGameStore(), SQLiteGameStore(db_path)):
+        for index in range(100):
+            with pytest.raises(UnknownGameError):
+                with store.view(f"missing-{index}"):
+                    pass
+        assert len(store._locks) == 0
+
+        # Still one lock per game while it is in use
+        lock = store.lock_for("g1")
+        with lock:
+            assert store.lock_for("g1") is lock
+
+
+def test_move_that_loses_the_race_records_nothing(db_path):
+    store = SQLiteGameStore(db_path)
+    game = MinesweeperGame(5, 0.2, username="racer", db=GameDatabase(db_path))
+    game.reveal_cell(2, 2)
+    mine = next(
+        (row, col) for row in range(5) for col in range(5) if game.board[row][col].is_mine
+    )
+    store["g1"] = game
+    game.close()
+    other_worker = SQLiteGameStore(db_path)
+
+    with pytest.raises(StaleGameError):
+        with store.checkout("g1") as lost:
+            with other_worker.checkout("g1") as winner:
+                winner.toggle_flag(*mine)
+            lost.reveal_cell(*mine)
+            assert lost.game_state == GameState.LOST
+
+    db = GameDatabase(db_path)
+    session = db.session.get(GameSession, game.session_id)
+    assert (session.is_completed, session.result, session.flags_used) == (False, None, 1)
+
+    with store.checkout("g1") as game:
+        game.toggle_flag(*mine)
+        game.reveal_cell(*mine)
+    db.session.expire_all()
+    assert (session.is_completed, session.result) == (True, "lost")
+    db.close()
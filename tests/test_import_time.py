@@ -0,0 +1,57 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Cumulative import time of the module in microseconds, several times what it
+# takes on a laptop so that only real regressions fail
+BUDGETS = {
+    "src.domain.minesweeper": 150_000,
+    "src.web.server": 1_500_000,
+}
+HEAVY = ("openai", "sqlalchemy", "uvicorn")
+
+
+def import_times(module: str) -> dict:
+    """{module: cumulative µs} from ``python -X importtime``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def loaded(times: dict, package: str) -> bool:
+    return any(name == package or name.startswith(package + ".") for name in times)
+
+
+def test_game_imports_no_heavy_dependencies():
+    times = import_times("src.domain.minesweeper")
+    assert [package for package in HEAVY if loaded(times, package)] == []
+    assert times["src.domain.minesweeper"] < BUDGETS["src.domain.minesweeper"]
+
+
+def test_server_loads_openai_and_sqlalchemy_on_first_use():
+    times = import_times("src.web.server")
+    assert not loaded(times, "openai")
+    assert not loaded(times, "sqlalchemy")
+    assert times["src.web.server"] < BUDGETS["src.web.server"]
+
+
+@pytest.mark.parametrize("module", ["src.domain.ai_assistant", "src.data.game_store"])
+def test_modules_defer_their_heavy_imports(module):
+    times = import_times(module)
+    assert [package for package in HEAVY if loaded(times, package)] == []
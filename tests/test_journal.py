@@ -0,0 +1,127 @@
+import json
+import pickle
+import random
+
+from starlette.testclient import TestClient
+
+from src.domain.journal import KEYFRAME_INTERVAL, JournalSnapshot, MoveJournal
+from src.domain.minesweeper import MinesweeperGame
+from src.domain.model import CellState, GameState
+from src.web.server import GAMES, create_minesweeper_app
+
+
+def position(game):
+    snapshot = JournalSnapshot.from_game(game)
+    return (
+        bytes(snapshot.states), bytes(snapshot.mines), snapshot.revealed_count,
+        snapshot.flag_count, snapshot.game_state, snapshot.first_click,
+    )
+
+
+def snapshot_position(snapshot):
+    return (
+        bytes(snapshot.states), bytes(snapshot.mines), snapshot.revealed_count,
+        snapshot.flag_count, snapshot.game_state, snapshot.first_click,
+    )
+
+
+def play(seed, moves):
+    random.seed(seed)
+    game = MinesweeperGame(12, 0.1, username=None)
+    positions = [position(game)]
+    while len(game.journal) < moves and game.game_state == GameState.PLAYING:
+        row, col = random.randrange(12), random.randrange(12)
+        roll = random.random()
+        if roll < 0.15:
+            played = game.undo()
+        elif roll < 0.75 or game.first_click:
+            played = game.toggle_flag(row, col)
+        else:
+            played = game.reveal_cell(row, col)
+        if played:
+            positions.append(position(game))
+    return game, positions
+
+
+def test_seek_matches_every_recorded_position():
+    game, positions = play(seed=3, moves=3 * KEYFRAME_INTERVAL)
+    assert len(game.journal) == len(positions) - 1 > KEYFRAME_INTERVAL
+
+    for count in list(range(len(positions))) + [KEYFRAME_INTERVAL, 0]:
+        assert snapshot_position(game.journal.snapshot_at(count)) == positions[count]
+
+
+def test_undo_uses_reverse_deltas():
+    game = MinesweeperGame(9, 10 / 81, username=None)
+    empty = position(game)
+    game.reveal_cell(4, 4)
+    after_first = position(game)
+    game.toggle_flag(*next(
+        (r, c) for r in range(9) for c in range(9)
+        if game.board[r][c].state == CellState.HIDDEN
+    ))
+
+    assert game.undo()
+    assert position(game) == after_first
+    assert game.undo()
+    assert position(game) == empty
+    assert not any(cell.is_mine for row in game.board for cell in row)
+    assert not game.undo()
+    assert [entry.action for entry in game.journal.entries()] == ["reveal", "flag", "undo", "undo"]
+
+
+def test_journal_round_trips():
+    game, positions = play(seed=5, moves=80)
+
+    for journal in (MoveJournal.from_bytes(game.journal.to_bytes()), pickle.loads(pickle.dumps(game)).journal):
+        assert len(journal) == len(game.journal)
+        assert journal.can_undo == game.journal.can_undo
+        assert snapshot_position(journal.snapshot_at(len(journal))) == positions[-1]
+    assert len(game.journal.to_bytes()) < 12 * len(game.journal) + 64
+
+
+def test_finished_game_journal_is_persisted_and_replayed():
+    with TestClient(create_minesweeper_app()) as client:
+        game_id = client.post(
+            "/api/new_game_with_user", json={"size": 9, "mines": 10, "username": "journal_player"}
+        ).json()["game_id"]
+        client.post("/api/toggle_flag", json={"game_id": game_id, "row": 0, "col": 0})
+        client.post("/api/toggle_flag", json={"game_id": game_id, "row": 0, "col": 0})
+        client.post("/api/undo", json={"game_id": game_id})
+        live = [json.loads(line) for line in client.get(f"/api/replay/{game_id}").text.splitlines()]
+
+        client.post("/api/undo", json={"game_id": game_id})
+        while True:
+            board = client.post("/api/cheat", json={"game_id": game_id})
+            if board.status_code != 200 or board.json()["game_state"] != "playing":
+                break
+
+        session_id = GAMES[game_id].session_id
+        stored = client.get(f"/api/replay/session/{session_id}")
+
+    assert [line["type"] for line in live] == ["position", "move", "move", "move"]
+    assert live[0]["mines"] is None
+    assert [line["action"] for line in live[1:]] == ["flag", "flag", "undo"]
+
+    lines = [json.loads(line) for line in stored.text.splitlines()]
+    assert lines[-1]["game_state"] == "won"
+    assert len(lines[0]["mines"]) == 10
+
+
+def test_version_1_journals_are_still_readable():
+    from src.domain.journal import _write_varint
+
+    game, positions = play(seed=7, moves=40)
+    journal = game.journal
+    # Re-encode the entries the way version 1 did: two action bits, layout flag 0x04
+    legacy = bytearray(b"\x01")
+    initial = journal.initial.encode()
+    _write_varint(legacy, len(initial))
+    legacy += initial
+    for entry in journal.entries():
+        encoded = bytearray(entry.encode())
+        encoded[0] = (encoded[0] & 0x03) | (0x04 if entry.layout is not None else 0)
+        legacy += encoded
+
+    restored = MoveJournal.from_bytes(bytes(legacy))
+    assert restored.to_bytes() == journal.to_bytes()
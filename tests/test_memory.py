@@ -0,0 +1,63 @@
+import sys
+
+from starlette.testclient import TestClient
+
+from src.memory import AllocationTracker, deep_sizeof
+from src.web import server
+from src.web.server import create_minesweeper_app
+
+
+class Node:
+    def __init__(self, payload, other=None):
+        self.payload = payload
+        self.other = other
+
+
+def test_deep_sizeof_counts_shared_objects_once():
+    payload = b"x" * 1000
+    pair = [Node(payload), Node(payload)]
+    assert deep_sizeof(pair) < 2 * sys.getsizeof(payload)
+    assert deep_sizeof(pair) > sys.getsizeof(payload)
+    assert deep_sizeof(pair, shared={id(payload)}) < sys.getsizeof(payload)
+
+
+def test_deep_sizeof_skips_named_attributes():
+    node = Node(b"", other=b"y" * 1000)
+    assert deep_sizeof(node, skip={"other"}) < 1000 < deep_sizeof(node)
+
+
+def test_allocation_tracker_diffs_between_calls():
+    tracker = AllocationTracker()
+    try:
+        assert tracker.diff() == []
+        kept = [bytearray(1000) for _ in range(100)]
+        diff = tracker.diff(top=5)
+        assert any(entry.size_diff >= 100_000 for entry in diff)
+        assert tracker.traced_memory() > 0
+    finally:
+        tracker.stop()
+    assert tracker.traced_memory() is None
+    del kept
+
+
+def test_memory_report(monkeypatch):
+    measured = []
+    measure_game = server.measure_game
+    monkeypatch.setattr(
+        server, "measure_game", lambda *args: measured.append(args[0]) or measure_game(*args)
+    )
+    with TestClient(create_minesweeper_app()) as client:
+        assert client.get("/api/debug/memory").status_code == 404
+
+        monkeypatch.setenv(server.DEBUG_ENV, "1")
+        small = client.post("/api/new_game", json={"size": 9, "mines": 10}).json()["game_id"]
+        large = client.post("/api/new_game", json={"size": 60, "mines": 400}).json()["game_id"]
+        first = client.get("/api/debug/memory?top=1").json()
+        client.post("/api/toggle_flag", json={"game_id": small, "row": 0, "col": 0})
+        client.get("/api/debug/memory")
+
+    assert first["games"] >= 2
+    assert first["largest_games"][0]["game_id"] == large[:8]
+    assert first["largest_games"][0]["board"] > 0
+    # Only the game that changed is measured again
+    assert measured.count(small) == 2 and measured.count(large) == 1
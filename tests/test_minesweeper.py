@@ -120,4 +120,49 @@ def test_cheat_functionality():
     result2 = game.cheat()
     
     if result2 is not None:  # Only if there are safe cells left
-        assert game.revealed_count > prev_revealed
\ No newline at end of file
+        assert game.revealed_count > prev_revealed
+
+
+def test_chord_reveals_unflagged_neighbors(make_game):
+    # Row 1 reveals a 1 at (1, 0) that touches (0, 0) and (0, 1)
+    game = make_game(4, [(0, 0)], [(1, 0)])
+    assert game.chord(1, 0) is None  # no flags placed yet
+
+    game.toggle_flag(0, 0)
+    changed = game.chord(1, 0)
+    assert set(changed) >= {(0, 1), (1, 1), (2, 0), (2, 1)}
+    assert game.board[0][1].state == CellState.REVEALED
+    assert game.board[0][0].state == CellState.FLAGGED
+
+
+def test_chord_with_wrong_flag_hits_mine(make_game):
+    game = make_game(4, [(0, 0)], [(1, 0)])
+    game.toggle_flag(0, 1)
+
+    changed = game.chord(1, 0)
+    assert (0, 0) in changed
+    assert game.game_state == GameState.LOST
+
+
+def test_auto_clear_is_one_move_and_one_update(monkeypatch, make_game):
+    revealed = [(row, col) for row in range(1, 4) for col in range(4)]
+    game = make_game(4, [(0, 1), (0, 3)], revealed)
+    updates = []
+    monkeypatch.setattr(game, "_update_session_stats", lambda: updates.append(1))
+    moves = len(game.journal)
+
+    changed = game.auto_clear()
+    assert sorted(changed) == [(0, 0), (0, 2)]
+    assert game.game_state == GameState.WON
+    assert len(game.journal) == moves + 1
+    assert game.auto_clear() is None
+
+
+def test_flood_fill_opens_boards_deeper_than_the_recursion_limit():
+    game = MinesweeperGame(300, 0.1, username=None)
+    game.first_click = False
+    game.mine_count = 0
+    assert game.reveal_cell(0, 0)
+
+    assert game.revealed_count == 300 * 300
+    assert game.game_state == GameState.WON
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+
+from starlette.testclient import TestClient
+
+from src.web import server
+from src.web.server import GAMES, create_minesweeper_app
+
+
+def new_game(client):
+    return client.post("/api/new_game", json={"size": 9, "mines": 10}).json()["game_id"]
+
+
+def flag(client, game_id, row, col, seq):
+    return client.post(
+        "/api/toggle_flag", json={"game_id": game_id, "row": row, "col": col, "seq": seq}
+    )
+
+
+def test_retried_move_is_applied_once():
+    with TestClient(create_minesweeper_app()) as client:
+        game_id = new_game(client)
+        first = flag(client, game_id, 0, 0, 1)
+        retry = flag(client, game_id, 0, 0, 1)
+
+    assert first.headers["X-Move-Status"] == "applied"
+    assert retry.headers["X-Move-Status"] == "duplicate"
+    assert retry.headers["X-Move-Seq"] == "1"
+    assert retry.json()["stats"]["flag_count"] == 1
+
+
+def test_moves_are_applied_in_sequence_order():
+    with TestClient(create_minesweeper_app()) as client:
+        game_id = new_game(client)
+        responses = {}
+        late = threading.Thread(
+            target=lambda: responses.setdefault(2, flag(client, game_id, 1, 1, 2))
+        )
+        late.start()
+        time.sleep(0.1)
+        assert 2 not in responses  # waits for move 1
+        responses[1] = flag(client, game_id, 0, 0, 1)
+        late.join()
+
+    assert responses[1].json()["stats"]["flag_count"] == 1
+    assert responses[2].json()["stats"]["flag_count"] == 2
+    assert responses[2].headers["X-Move-Seq"] == "2"
+
+
+def test_lost_move_does_not_block_later_ones(monkeypatch):
+    monkeypatch.setattr(server, "MOVE_ORDER_TIMEOUT", 0.1)
+    with TestClient(create_minesweeper_app()) as client:
+        game_id = new_game(client)
+        late = flag(client, game_id, 1, 1, 2)
+        lost = flag(client, game_id, 0, 0, 1)
+
+    assert late.headers["X-Move-Status"] == "applied"
+    assert lost.headers["X-Move-Status"] == "duplicate"
+    assert lost.json()["stats"]["flag_count"] == 1
+
+
+def test_rejected_sequenced_move_returns_the_board(make_game):
+    with TestClient(create_minesweeper_app()) as client:
+        game_id = new_game(client)
+        GAMES[game_id] = make_game(4, [(0, 0)])
+        flag(client, game_id, 3, 3, 1)
+        rejected = client.post(
+            "/api/reveal_cell", json={"game_id": game_id, "row": 3, "col": 3, "seq": 2}
+        )
+        unsequenced = client.post(
+            "/api/reveal_cell", json={"game_id": game_id, "row": 3, "col": 3}
+        )
+
+    assert rejected.status_code == 200
+    assert rejected.headers["X-Move-Status"] == "rejected"
+    assert rejected.json()["board"][3][3]["state"] == "flagged"
+    assert unsequenced.status_code != 200
+
+
+def test_delta_move_returns_only_changed_cells(make_game):
+    with TestClient(create_minesweeper_app()) as client:
+        game_id = new_game(client)
+        GAMES[game_id] = make_game(4, [(0, 0)])
+        flagged = client.post(
+            "/api/toggle_flag",
+            json={"game_id": game_id, "row": 0, "col": 0, "seq": 1, "delta": True},
+        )
+        revealed = client.post(
+            "/api/reveal_cell",
+            json={"game_id": game_id, "row": 3, "col": 3, "seq": 2, "delta": True},
+        )
+
+    assert flagged.headers["X-Move-Status"] == "applied"
+    assert [(cell["row"], cell["col"], cell["state"]) for cell in flagged.json()["changed"]] == [
+        (0, 0, "flagged")
+    ]
+    assert "board" not in revealed.json()
+    assert len(revealed.json()["changed"]) == 15
+    assert revealed.json()["game_state"] == "won"
+
+
+
+def test_chord_answers_like_the_other_sequenced_moves(make_game):
+    responses = []
+    with TestClient(create_minesweeper_app()) as client:
+        for delta in (False, True):
+            game_id = new_game(client)
+            GAMES[game_id] = make_game(4, [(0, 0), (3, 3)], revealed=[(0, 1)])
+            flag(client, game_id, 0, 0, 1)
+            responses.append(client.post(
+                "/api/chord",
+                json={"game_id": game_id, "row": 0, "col": 1, "seq": 2, "delta": delta},
+            ))
+
+    full, delta = responses
+    assert full.headers["X-Move-Status"] == delta.headers["X-Move-Status"] == "applied"
+    assert full.headers["X-Move-Seq"] == "2"
+    assert full.json()["board"][1][1]["state"] == "revealed"
+    assert "board" not in delta.json()
+    assert (1, 1) in [(cell["row"], cell["col"]) for cell in delta.json()["changed"]]
+
+def test_blocking_handlers_run_off_the_event_loop(monkeypatch):
+    def running_loop():
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+
+    loops = []
+    get_game_stats = server.get_game_stats
+
+    def spy(game):
+        loops.append(running_loop())
+        return get_game_stats(game)
+
+    monkeypatch.setattr(server, "get_game_stats", spy)
+    with TestClient(create_minesweeper_app()) as client:
+        game_id = new_game(client)
+        client.post(
+            "/api/toggle_flag",
+            json={"game_id": game_id, "row": 0, "col": 0, "seq": 1, "delta": True},
+        )
+        client.get(f"/api/get_board/{game_id}")
+
+    # new_game, toggle_flag and get_board each read the stats once
+    assert len(loops) == 3
+    assert loops == [None, None, None]
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+from starlette.testclient import TestClient
+
+from src.data.game_store import InMemoryGameStore
+from src.profiling import PROFILER, Profiler, span, timed
+from src.web import server
+from src.web.server import create_minesweeper_app
+
+
+@pytest.fixture
+def profiler():
+    yield PROFILER
+    PROFILER.configure(None, mode="sample")
+    PROFILER.clear()
+
+
+@timed("countdown")
+def countdown(n):
+    return countdown(n - 1) if n else time.sleep(0.002)
+
+
+def test_spans_record_self_time_and_fold_recursion():
+    profiler = Profiler(slow_ms=0)
+    with profiler.trace("job") as trace:
+        with span("outer"):
+            countdown(5)
+
+    assert set(trace.spans) == {("outer",), ("outer", "countdown")}
+    assert trace.spans[("outer", "countdown")][1] == 1
+    assert trace.spans[("outer", "countdown")][0] >= 2_000_000
+    assert trace.spans[("outer",)][0] < trace.spans[("outer", "countdown")][0]
+    assert "job;outer;countdown " in trace.folded("spans")
+
+
+def test_only_slow_traces_are_kept_in_a_bounded_buffer():
+    profiler = Profiler(slow_ms=1, max_traces=2)
+    for label in ("fast", "slow 1", "slow 2", "slow 3"):
+        with profiler.trace(label):
+            if label != "fast":
+                time.sleep(0.002)
+
+    assert [trace.label for trace in profiler.traces] == ["slow 2", "slow 3"]
+    assert profiler.traced == 4
+    assert profiler.get(1) is None and profiler.get(3).label == "slow 3"
+
+
+def test_debug_endpoints(profiler):
+    with TestClient(create_minesweeper_app()) as client:
+        assert client.get("/api/debug/traces").status_code == 404
+
+        profiler.configure(0, interval=0.0005)
+        client.post("/api/new_game", json={"size": 30, "mines": 100})
+        traces = client.get("/api/debug/traces").json()
+        folded = client.get(f"/api/debug/traces/{traces[0]['trace_id']}")
+        pstats = client.get(f"/api/debug/traces/{traces[0]['trace_id']}?format=pstats")
+
+    assert traces[0]["label"] == "POST /api/new_game"
+    assert traces[0]["status"] == 200
+    assert folded.status_code == 200
+    assert all(line.startswith("POST /api/new_game") for line in folded.text.splitlines())
+    assert pstats.status_code == 404  # sampled, not cProfiled
+
+
+def test_samples_come_from_the_thread_running_the_handler(profiler, monkeypatch):
+    monkeypatch.setattr(server, "GAMES", InMemoryGameStore())
+    with TestClient(create_minesweeper_app()) as client:
+        profiler.configure(0, interval=0.0005)
+        client.post("/api/new_game", json={"size": 200, "mines": 4000})
+        trace = profiler.traces[-1]
+
+    assert trace.samples
+    assert all("concurrent.futures.thread._worker" in stack for stack in trace.samples)
+    assert any("src.web.server.new_game" in stack for stack in trace.samples)
+
+
+def test_traces_share_one_sampler_thread():
+    profiler = Profiler(slow_ms=0, interval=0.0005)
+
+    def traced_sleep(label):
+        with profiler.trace(label) as trace:
+            profiler.call(time.sleep, 0.01)
+        return trace
+
+    assert traced_sleep("first").samples
+    sampler, threads = profiler._sampler, threading.active_count()
+    assert traced_sleep("second").samples
+
+    assert profiler._sampler is sampler
+    assert threading.active_count() == threads
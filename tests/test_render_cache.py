@@ -0,0 +1,75 @@
+import json
+
+import pytest
+from lihil import HTTPException
+from starlette.testclient import TestClient
+
+from src.data.game_store import SQLiteGameStore
+from src.web import server
+from src.web.render_cache import BoardRenderCache
+from src.web.server import BOARD_RENDERS, create_minesweeper_app
+
+
+def test_moves_bump_version(make_game):
+    game = make_game(4, [(0, 0)])
+    version = game.version
+
+    assert game.toggle_flag(3, 3)
+    assert game.version == version + 1
+    assert not game.reveal_cell(3, 3)  # flagged, rejected
+    assert game.version == version + 1
+    assert game.reveal_cell(2, 2)
+    assert game.version == version + 2
+
+
+def test_cache_keeps_latest_version_only():
+    cache = BoardRenderCache(max_games=2)
+    calls = []
+
+    def render(body):
+        return lambda: calls.append(body) or body
+
+    assert cache.get_or_render("a", 1, "json", render(b"1")) == b"1"
+    assert cache.get_or_render("a", 1, "json", render(b"x")) == b"1"
+    assert cache.get_or_render("a", 2, "json", render(b"2")) == b"2"
+    assert cache.get_or_render("a", 1, "json", render(b"old")) == b"old"
+    assert cache.get_or_render("a", 2, "json", render(b"x")) == b"2"
+    assert calls == [b"1", b"2", b"old"]
+
+    cache.get_or_render("b", 1, "json", render(b"b"))
+    cache.get_or_render("c", 1, "json", render(b"c"))
+    assert len(cache) == 2
+
+
+def test_repeated_board_reads_hit_the_cache():
+    BOARD_RENDERS.clear()
+    # Uncompressed, compressed variants are cached separately
+    with TestClient(create_minesweeper_app(), headers={"Accept-Encoding": "identity"}) as client:
+        game_id = client.post("/api/new_game", json={"size": 9, "mines": 10}).json()["game_id"]
+        first = client.get(f"/api/get_board/{game_id}")
+        second = client.get(f"/api/get_board/{game_id}")
+        flagged = client.post("/api/toggle_flag", json={"game_id": game_id, "row": 0, "col": 0})
+
+    assert first.content == second.content
+    assert (BOARD_RENDERS.misses, BOARD_RENDERS.hits) == (2, 1)
+    assert json.loads(flagged.content)["stats"]["flag_count"] == 1
+
+
+def test_move_lost_to_another_worker_leaves_no_cached_board(tmp_path, monkeypatch, make_game):
+    db_path = str(tmp_path / "games.db")
+    monkeypatch.setattr(server, "GAMES", SQLiteGameStore(db_path))
+    other_worker = SQLiteGameStore(db_path)
+    server.GAMES["stale"] = make_game(4, [(0, 0)])
+
+    with pytest.raises(HTTPException):
+        with server.checkout_game("stale") as game:
+            with other_worker.checkout("stale") as winner:
+                winner.toggle_flag(3, 3)
+            game.toggle_flag(2, 2)
+            server.board_response("stale", game)
+
+    with server.view_game("stale") as game:
+        board = json.loads(server.board_response("stale", game).body)["board"]
+    assert board[3][3]["state"] == "flagged"
+    assert board[2][2]["state"] == "hidden"
+    BOARD_RENDERS.forget("stale")
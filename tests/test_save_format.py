@@ -0,0 +1,139 @@
+import json
+
+from src.data.models import GameDatabase, SavedGame
+from src.domain.minesweeper import MinesweeperGame
+from src.domain.model import CellState
+from src.domain.save_format import (
+    decode_board,
+    encode_board,
+    migrate_saved_games,
+    save_format_version,
+)
+
+
+def _played_game(db=None):
+    game = MinesweeperGame(16, 40 / 256, username="saver" if db else None, db=db)
+    game.reveal_cell(8, 8)
+    for row in range(game.size):
+        for col in range(game.size):
+            if game.board[row][col].is_mine:
+                game.toggle_flag(row, col)
+                break
+    return game
+
+
+def _legacy_json(board):
+    return json.dumps(
+        {
+            "board": [
+                [
+                    {
+                        "is_mine": cell.is_mine,
+                        "state": cell.state.value,
+                        "adjacent_mines": cell.adjacent_mines,
+                    }
+                    for cell in row
+                ]
+                for row in board
+            ]
+        }
+    )
+
+
+def _layout(board):
+    return [[(cell.is_mine, cell.state) for cell in row] for row in board]
+
+
+def test_encode_decode_roundtrip():
+    game = _played_game()
+    encoded = encode_board(game.board)
+
+    assert save_format_version(encoded) == 2
+    assert _layout(decode_board(encoded)) == _layout(game.board)
+
+
+def test_compact_format_is_much_smaller():
+    game = _played_game()
+    assert len(encode_board(game.board)) * 10 < len(_legacy_json(game.board))
+
+
+def test_legacy_json_saves_still_decode():
+    game = _played_game()
+    legacy = _legacy_json(game.board)
+
+    assert save_format_version(legacy) == 1
+    assert _layout(decode_board(legacy)) == _layout(game.board)
+
+
+def test_load_game_recomputes_adjacent_mines(tmp_path):
+    db = GameDatabase(str(tmp_path / "saves.db"))
+    game = _played_game(db)
+    assert game.save_game("compact")
+
+    loaded = MinesweeperGame(9, 0.15, username="saver", db=db)
+    assert loaded.load_game("compact")
+    assert [[cell.adjacent_mines for cell in row] for row in loaded.board] == [
+        [cell.adjacent_mines for cell in row] for row in game.board
+    ]
+    assert loaded.get_cell_info(8, 8).state == CellState.REVEALED
+
+
+def test_migrate_saved_games(tmp_path):
+    db = GameDatabase(str(tmp_path / "saves.db"))
+    game = _played_game(db)
+    db.save_game(
+        user_id=game.user.id,
+        game_name="legacy",
+        board_size=game.size,
+        mine_count=game.mine_count,
+        difficulty="intermediate",
+        game_state=game.game_state.value,
+        board_data=_legacy_json(game.board),
+        revealed_count=game.revealed_count,
+        flag_count=game.flag_count,
+        first_click=game.first_click,
+    )
+
+    assert migrate_saved_games(db) == 1
+    assert migrate_saved_games(db) == 0
+
+    saved = db.session.query(SavedGame).filter_by(game_name="legacy").one()
+    assert save_format_version(saved.board_data) == 2
+    assert _layout(decode_board(saved.board_data)) == _layout(game.board)
+
+
+def test_migrate_saved_games_commits_each_batch(tmp_path):
+    db = GameDatabase(str(tmp_path / "saves.db"))
+    game = _played_game(db)
+    user_id = game.user.id
+    for index in range(5):
+        db.save_game(
+            user_id=user_id,
+            game_name=f"legacy-{index}",
+            board_size=game.size,
+            mine_count=game.mine_count,
+            difficulty="intermediate",
+            game_state=game.game_state.value,
+            board_data=_legacy_json(game.board),
+            revealed_count=game.revealed_count,
+            flag_count=game.flag_count,
+            first_click=game.first_click,
+        )
+
+    db.session.expunge_all()
+
+    commits = []
+    original_commit = db.session.commit
+
+    def commit():
+        commits.append(len(db.session.identity_map))
+        original_commit()
+
+    db.session.commit = commit
+    assert migrate_saved_games(db, batch_size=2) == 5
+
+    # Three batches, none holding more than its own saves
+    assert commits == [2, 2, 1]
+    assert len(db.session.identity_map) == 0
+    saved = GameDatabase(db.db_path).get_user_saved_games(user_id)
+    assert {save_format_version(save.board_data) for save in saved} == {2}
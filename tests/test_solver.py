@@ -0,0 +1,72 @@
+from src.domain.minesweeper import MinesweeperGame
+from src.domain.prompt_encoder import (
+    board_sections,
+    encode_grid,
+    estimate_tokens,
+    fit_sections,
+)
+from src.domain.solver import analyze
+
+
+def test_single_constraint_finds_last_mine(make_game):
+    game = make_game(5, [(0, 0)])
+    game.reveal_cell(4, 4)
+
+    analysis = analyze(game)
+    assert analysis.mines == {(0, 0)}
+    assert analysis.safe == set()
+
+
+def test_subset_rule(make_game):
+    revealed = [(row, col) for row in range(1, 4) for col in range(4)]
+    game = make_game(4, [(0, 1), (0, 3)], revealed)
+
+    analysis = analyze(game)
+    assert analysis.safe == {(0, 0), (0, 2)}
+    assert analysis.mines == {(0, 1), (0, 3)}
+    assert analysis.frontier == {(0, 0), (0, 1), (0, 2), (0, 3)}
+
+
+def test_flags_are_not_trusted(make_game):
+    revealed = [(row, col) for row in range(1, 4) for col in range(4)]
+    game = make_game(4, [(0, 1), (0, 3)], revealed)
+    game.toggle_flag(0, 0)
+
+    assert (0, 0) in analyze(game).safe
+
+
+def test_grid_encoding(make_game):
+    game = make_game(3, [(0, 0)], [(1, 1), (2, 2)])
+    game.toggle_flag(0, 0)
+
+    assert encode_grid(game).splitlines() == [
+        "    012",
+        "  0 F##",
+        "  1 #1#",
+        "  2 ##.",
+    ]
+
+
+def test_compact_prompt_is_much_smaller_than_json():
+    game = MinesweeperGame(22, 99 / 484, username=None)
+    game.mine_count = 99
+    game.reveal_cell(11, 11)
+
+    json_size = estimate_tokens(fit_sections(board_sections(game, "json"), None))
+    grid_size = estimate_tokens(fit_sections(board_sections(game, "grid"), None))
+    frontier_size = estimate_tokens(fit_sections(board_sections(game, "frontier"), None))
+
+    assert grid_size * 10 < json_size
+    assert frontier_size * 10 < json_size
+
+
+def test_token_budget_drops_lowest_priority_sections():
+    game = MinesweeperGame(22, 99 / 484, username=None)
+    game.mine_count = 99
+    game.reveal_cell(11, 11)
+    sections = board_sections(game, "grid")
+
+    text = fit_sections(sections, 200)
+    assert estimate_tokens(text) <= 200
+    assert text.startswith("SOLVER FACTS")
+    assert "ALL MINE POSITIONS" not in text
@@ -0,0 +1,44 @@
+from starlette.testclient import TestClient
+
+from src.web.server import STATIC_ASSETS, create_minesweeper_app
+
+
+def make_client():
+    return TestClient(create_minesweeper_app())
+
+
+def test_index_links_hashed_assets():
+    with make_client() as client:
+        response = client.get("/")
+
+    assert response.status_code == 200
+    assert STATIC_ASSETS.url_for("js/game.js") in response.text
+    assert STATIC_ASSETS.url_for("css/style.css") in response.text
+    assert '"/static/js/game.js"' not in response.text
+
+
+def test_hashed_url_is_immutable_and_compressed():
+    with make_client() as client:
+        url = STATIC_ASSETS.url_for("js/game.js")
+        response = client.get(url, headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert "immutable" in response.headers["cache-control"]
+    assert response.content == STATIC_ASSETS.assets["js/game.js"].body
+
+
+def test_etag_revalidation_returns_304():
+    with make_client() as client:
+        first = client.get("/static/css/style.css", headers={"Accept-Encoding": "identity"})
+        second = client.get(
+            "/static/css/style.css",
+            headers={"Accept-Encoding": "identity", "If-None-Match": first.headers["etag"]},
+        )
+        missing = client.get("/static/css/missing.css")
+
+    assert first.headers["cache-control"] == "no-cache"
+    assert "content-encoding" not in first.headers
+    assert second.status_code == 304
+    assert second.content == b""
+    assert missing.status_code == 404
@@ -0,0 +1,28 @@
+from starlette.testclient import TestClient
+
+from src.data.models import GameDatabase, GameSession
+from src.web import server
+from src.web.server import create_minesweeper_app
+
+
+def test_stats_endpoints_read_without_creating_sessions(tmp_path, monkeypatch):
+    path = str(tmp_path / "stats.db")
+    monkeypatch.setattr(server, "open_database", lambda: GameDatabase(path))
+    db = GameDatabase(path)
+    user = db.get_or_create_user("reader")
+    session_id = db.create_game_session(user.id, 16, 40, "intermediate").id
+    db.finish_game_session(session_id, "won", cells_revealed=216, flags_used=40)
+    db.close()
+
+    with TestClient(create_minesweeper_app()) as client:
+        user_stats = client.get("/api/user_stats/reader").json()
+        unknown = client.get("/api/user_stats/nobody").json()
+        global_stats = client.get("/api/stats").json()
+
+    assert user_stats["won_games"] == 1
+    assert user_stats["by_difficulty"][0]["difficulty"] == "intermediate"
+    assert unknown["total_games"] == 0 and unknown["by_difficulty"] == []
+    assert global_stats["total_games"] == 1
+    db = GameDatabase(path)
+    assert db.session.query(GameSession).count() == 1
+    db.close()
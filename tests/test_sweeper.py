@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from starlette.testclient import TestClient
+
+from src.data.game_store import InMemoryGameStore
+from src.data.models import GameDatabase, GameSession
+from src.domain.minesweeper import MinesweeperGame
+from src.domain.save_format import encode_board
+from src.web import server
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "sweep.db")
+    monkeypatch.setattr(server, "open_database", lambda: GameDatabase(path))
+    return path
+
+
+@pytest.fixture
+def games(monkeypatch):
+    store = InMemoryGameStore()
+    monkeypatch.setattr(server, "GAMES", store)
+    monkeypatch.setattr(server, "USER_GAMES", {})
+    monkeypatch.setattr(server, "API_KEYS", {})
+    return store
+
+
+def add_game(store, game_id, session_id=None, idle_for=0.0):
+    game = MinesweeperGame(9, 0.1, username=None)
+    game.session_id = session_id
+    store.put(game_id, game)
+    store._touched[game_id] -= idle_for
+    return game
+
+
+def test_idle_games_are_dropped_and_their_sessions_quit(games, db_path):
+    db = GameDatabase(db_path)
+    user = db.get_or_create_user("idler")
+    idle_session = db.create_game_session(user.id, 9, 10, "beginner").id
+    db.update_game_session(idle_session, cells_revealed=4)
+    active_session = db.create_game_session(user.id, 9, 10, "beginner").id
+    db.close()
+
+    add_game(games, "idle", idle_session, idle_for=120)
+    add_game(games, "active", active_session)
+    server.USER_GAMES.update({"idle": "idler", "active": "idler", "gone": "idler"})
+
+    report = asyncio.run(server.sweep(idle_timeout=60, orphan_timeout=3600))
+
+    assert games.game_ids() == ["active"]
+    assert set(server.USER_GAMES) == {"active"}
+    assert (report.games, report.sessions_quit, report.sessions_dropped, report.user_games) == (1, 1, 0, 2)
+    assert server.SWEEP_REPORTS[-1] is report
+
+    db = GameDatabase(db_path)
+    results = {s.id: (s.result, s.is_completed) for s in db.session.query(GameSession)}
+    db.close()
+    assert results == {idle_session: ("quit", True), active_session: (None, False)}
+
+
+def test_orphaned_sessions_are_quit_but_live_ones_kept(games, db_path):
+    db = GameDatabase(db_path)
+    user = db.get_or_create_user("restarted")
+    orphan = db.create_game_session(user.id, 9, 10, "beginner").id
+    db.update_game_session(orphan, cells_revealed=4)
+    never_played = db.create_game_session(user.id, 9, 10, "beginner").id
+    live = db.create_game_session(user.id, 9, 10, "beginner").id
+    db.close()
+    add_game(games, "live", live)
+
+    report = asyncio.run(server.sweep(idle_timeout=60, orphan_timeout=0))
+
+    assert (report.sessions_quit, report.sessions_dropped) == (1, 1)
+    db = GameDatabase(db_path)
+    assert db.session.get(GameSession, orphan).result == "quit"
+    assert db.session.get(GameSession, never_played) is None
+    assert db.session.get(GameSession, live).is_completed is False
+    db.close()
+
+
+def test_api_keys_without_an_assistant_expire(games, db_path):
+    server.API_KEYS["fresh"] = "sk-test"
+    assert server.sweep_api_keys(idle_timeout=60) == (0, 0)
+    assert "fresh" in server.API_KEYS
+
+    assert server.sweep_api_keys(idle_timeout=0) == (1, 0)
+    assert server.API_KEYS == {}
+    assert server._UNUSED_API_KEYS == {}
+
+
+def test_loading_and_deleting_saves_records_no_unplayed_sessions(games, db_path):
+    db = GameDatabase(db_path)
+    user = db.get_or_create_user("saver")
+    board = encode_board(MinesweeperGame(9, 0.1, username=None).board)
+    for name in ("first", "second"):
+        db.save_game(user.id, name, 9, 8, "custom", "playing", board, 0, 0, True)
+    db.close()
+
+    with TestClient(server.create_minesweeper_app()) as client:
+        loaded = client.post("/api/load_game", json={"username": "saver", "game_name": "first"})
+        missing = client.post("/api/load_game", json={"username": "saver", "game_name": "nope"})
+        deleted = client.post("/api/delete_saved_game", json={"username": "saver", "game_name": "second"})
+
+    assert (loaded.status_code, missing.status_code, deleted.status_code) == (200, 404, 200)
+    db = GameDatabase(db_path)
+    # Only the resumed game has a session
+    assert db.session.query(GameSession).count() == 1
+    db.close()